@@ -1,9 +1,11 @@
 import asyncio
+from functools import cached_property
 
-import aiohttp
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import Resource
 
+from app.connectors.google import build_google_service
+from app.connectors.http import get_aiohttp_session
 from app.exceptions.exception import InferenceError
 from app.models.integrations.calendar import (
     CalendarCreateEventRequest,
@@ -13,10 +15,12 @@ from app.models.integrations.calendar import (
     CalendarUpdateEventRequest,
     Timezone,
 )
+from app.utils.tracing import traced_client
 
 TOKEN_URI = "https://oauth2.googleapis.com/token"
 
 
+@traced_client
 class GoogleCalendarClient:
 
     def __init__(
@@ -29,15 +33,20 @@ class GoogleCalendarClient:
             client_secret=client_secret,
             token_uri=TOKEN_URI,
         )
-        self.service = build("calendar", "v3", credentials=self.credentials)
-        self.session = aiohttp.ClientSession()
+        self.session = get_aiohttp_session()
         self.base_url = (
             "https://www.googleapis.com/calendar/v3/calendars/primary/events"
         )
         self.headers = {"Authorization": f"Bearer {access_token}"}
 
+    @cached_property
+    def service(self) -> Resource:
+        """Built on first use, inside the executor thread of the first request that needs it, so construction never blocks the event loop"""
+        return build_google_service("calendar", "v3", credentials=self.credentials)
+
     async def close(self):
-        await self.session.close()
+        # The session is shared by every client for the lifetime of the app and is closed on shutdown
+        pass
 
     async def create_event(self, request: CalendarCreateEventRequest) -> CalendarEvent:
         try:
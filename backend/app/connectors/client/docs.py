@@ -1,8 +1,12 @@
+from functools import cached_property
+
 import aiohttp
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import Resource
 from googleapiclient.errors import HttpError
 
+from app.connectors.google import build_google_service
+from app.connectors.http import get_aiohttp_session
 from app.exceptions.exception import InferenceError
 from app.models.integrations.docs import (
     Docs,
@@ -10,10 +14,12 @@ from app.models.integrations.docs import (
     DocsGetRequest,
     DocsUpdateRequest,
 )
+from app.utils.tracing import traced_client
 
 TOKEN_URI = "https://oauth2.googleapis.com/token"
 
 
+@traced_client
 class GoogleDocsClient:
     def __init__(
         self, access_token: str, refresh_token: str, client_id: str, client_secret: str
@@ -25,13 +31,18 @@ class GoogleDocsClient:
             client_secret=client_secret,
             token_uri=TOKEN_URI,
         )
-        self.service = build("docs", "v1", credentials=self.credentials)
-        self.session = aiohttp.ClientSession()
+        self.session = get_aiohttp_session()
         self.base_url = "https://docs.googleapis.com/v1/documents"
         self.headers = {"Authorization": f"Bearer {access_token}"}
 
+    @cached_property
+    def service(self) -> Resource:
+        """Built on first use, since most code paths call the REST API directly"""
+        return build_google_service("docs", "v1", credentials=self.credentials)
+
     async def close(self):
-        await self.session.close()
+        # The session is shared by every client for the lifetime of the app and is closed on shutdown
+        pass
 
     async def create_document(self, request: DocsCreateRequest) -> Docs:
         try:
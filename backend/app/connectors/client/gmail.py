@@ -1,11 +1,31 @@
 import asyncio
 import base64
+import json
+import logging
+import os
+import random
+import re
+import uuid
+from collections import deque
 from email.mime.text import MIMEText
+from email.parser import BytesParser
+from email.policy import default
+from functools import cached_property
+from typing import Any, AsyncIterator, Optional
+from urllib.parse import quote, urlencode
 
 import aiohttp
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import Resource
 
+from app.connectors.client.gmail_cache import (
+    GmailMessageCache,
+    account_cache_key,
+    get_message_cache,
+    remove_cached_label,
+)
+from app.connectors.google import build_google_service
+from app.connectors.http import get_aiohttp_session
 from app.exceptions.exception import InferenceError
 from app.models.integrations.gmail import (
     Gmail,
@@ -13,10 +33,40 @@ from app.models.integrations.gmail import (
     GmailMarkAsReadRequest,
     GmailSendEmailRequest,
 )
+from app.utils.tracing import traced_client
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
 
 TOKEN_URI = "https://oauth2.googleapis.com/token"
+GMAIL_API_URL = "https://gmail.googleapis.com"
+GMAIL_USERS_PATH = "/gmail/v1/users/me"
+GMAIL_MESSAGES_PATH = f"{GMAIL_USERS_PATH}/messages"
+GMAIL_BATCH_PATH = "/batch/gmail/v1"
+# messages.list returns at most 500 ids per page
+GMAIL_LIST_PAGE_SIZE = min(int(os.environ.get("GMAIL_LIST_PAGE_SIZE", 100)), 500)
+GMAIL_QUERY_RESULT_CAP = int(os.environ.get("GMAIL_QUERY_RESULT_CAP", 100))
+# Gmail rejects batches of more than 100 calls and recommends at most 50
+GMAIL_BATCH_SIZE = int(os.environ.get("GMAIL_BATCH_SIZE", 50))
+# messages/batchModify accepts at most 1000 ids per call
+GMAIL_MODIFY_BATCH_SIZE = min(
+    int(os.environ.get("GMAIL_MODIFY_BATCH_SIZE", 1000)), 1000
+)
+GMAIL_MAX_CONCURRENT_BATCHES = int(os.environ.get("GMAIL_MAX_CONCURRENT_BATCHES", 2))
+GMAIL_MAX_RETRIES = int(os.environ.get("GMAIL_MAX_RETRIES", 3))
+GMAIL_RETRY_BACKOFF = float(os.environ.get("GMAIL_RETRY_BACKOFF", 0.5))
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+# Field masks, so that Gmail only serialises what _to_gmail reads
+FULL_MESSAGE_FIELDS = (
+    "id,labelIds,payload(mimeType,headers(name,value),body/data,parts)"
+)
+METADATA_HEADERS = ["From", "Subject"]
+METADATA_MESSAGE_FIELDS = "id,labelIds,payload/headers(name,value)"
 
 
+@traced_client
 class GmailClient:
 
     def __init__(
@@ -29,13 +79,24 @@ class GmailClient:
             client_secret=client_secret,
             token_uri=TOKEN_URI,
         )
-        self.service = build("gmail", "v1", credentials=self.credentials)
-        self.session = aiohttp.ClientSession()
-        self.base_url = "https://gmail.googleapis.com/gmail/v1/users/me/messages"
+        self.session = get_aiohttp_session()
+        self.users_url = f"{GMAIL_API_URL}{GMAIL_USERS_PATH}"
+        self.base_url = f"{GMAIL_API_URL}{GMAIL_MESSAGES_PATH}"
+        self.cache_key = account_cache_key(
+            client_id=client_id, refresh_token=refresh_token, access_token=access_token
+        )
+        self.batch_url = f"{GMAIL_API_URL}{GMAIL_BATCH_PATH}"
         self.headers = {"Authorization": f"Bearer {access_token}"}
+        self._batch_semaphore = asyncio.Semaphore(GMAIL_MAX_CONCURRENT_BATCHES)
+
+    @cached_property
+    def service(self) -> Resource:
+        """Built on first use, since most code paths call the REST API directly"""
+        return build_google_service("gmail", "v1", credentials=self.credentials)
 
     async def close(self):
-        await self.session.close()
+        # The session is shared by every client for the lifetime of the app and is closed on shutdown
+        pass
 
     async def fetch_message(self, session, url):
         async with session.get(url, headers=self.headers) as response:
@@ -58,112 +119,416 @@ class GmailClient:
                 response_data = await response.json()
                 sent_message_id = response_data["id"]
 
-            emails = await self.get_emails(
-                request=GmailFilterEmailsRequest(
-                    message_ids=[sent_message_id], query=None
-                )
+            # Echo the sent email from what was sent rather than fetching it back. The address of the account is known once its cache is validated
+            cache: GmailMessageCache = await self._get_message_cache()
+            sent_email = Gmail(
+                id=sent_message_id,
+                labelIds=response_data.get("labelIds", ["SENT"]),
+                sender=cache.email_address or "",
+                subject=request.subject,
+                body=request.body,
             )
-            return emails[0]
+            cache.put(sent_email)
+            return sent_email
 
         except Exception as e:
             raise InferenceError("Error sending email via GmailClient: %s" % str(e))
 
     async def mark_as_read(self, request: GmailMarkAsReadRequest) -> list[Gmail]:
-        emails_to_update: list[Gmail] = await self.get_emails(request=request)
-        updated_emails: list[Gmail] = []
-        for email in emails_to_update:
-            async with self.session.post(
-                f"{self.base_url}/{email.id}/modify",
-                headers=self.headers,
-                json={"removeLabelIds": ["UNREAD"]},
-            ) as response:
-                await response.json()  # Ensure the request completes
-            email.labelIds.remove("UNREAD")
-            updated_emails.append(email)
-        return updated_emails
+        """Removes the UNREAD label from the requested emails and returns them. Only their headers are downloaded, in one batched format=metadata fetch"""
+        emails: list[Gmail] = await self.get_emails(request=request, include_body=False)
+        if not emails:
+            return []
+        message_ids: list[str] = list(dict.fromkeys(email.id for email in emails))
+        try:
+            await self._batch_modify(
+                message_ids=message_ids, remove_label_ids=["UNREAD"]
+            )
+        except Exception as e:
+            raise InferenceError(f"Error marking emails as read via GmailClient: {e}")
+        remove_cached_label(
+            key=self.cache_key, message_ids=message_ids, label_id="UNREAD"
+        )
+        for email in emails:
+            if "UNREAD" in email.labelIds:
+                email.labelIds.remove("UNREAD")
+        return emails
+
+    async def _batch_modify(
+        self,
+        message_ids: list[str],
+        add_label_ids: Optional[list[str]] = None,
+        remove_label_ids: Optional[list[str]] = None,
+    ):
+        """Applies the label changes with one messages/batchModify call per GMAIL_MODIFY_BATCH_SIZE ids"""
+        chunks: list[list[str]] = [
+            message_ids[i : i + GMAIL_MODIFY_BATCH_SIZE]
+            for i in range(0, len(message_ids), GMAIL_MODIFY_BATCH_SIZE)
+        ]
+        await asyncio.gather(
+            *[
+                self._post_with_retries(
+                    url=f"{self.base_url}/batchModify",
+                    payload={
+                        "ids": chunk,
+                        "addLabelIds": add_label_ids or [],
+                        "removeLabelIds": remove_label_ids or [],
+                    },
+                )
+                for chunk in chunks
+            ]
+        )
+
+    async def _post_with_retries(self, url: str, payload: dict) -> Optional[dict]:
+        """POSTs the JSON body, retrying rate limited and failed requests with backoff, and returns the JSON response if there is one"""
+        for attempt in range(GMAIL_MAX_RETRIES + 1):
+            try:
+                async with self._batch_semaphore:
+                    async with self.session.post(
+                        url, headers=self.headers, json=payload
+                    ) as response:
+                        status: Optional[int] = response.status
+                        # batchModify answers 204 with an empty body
+                        body: dict = (
+                            await response.json(content_type=None)
+                            if status != 204
+                            else {}
+                        ) or {}
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, body = None, {"error": {"message": str(e)}}
+            if status is not None and status < 300:
+                return body
+            if status is not None and not _is_retryable(status=status, body=body):
+                raise InferenceError(f"Gmail request failed: {_error_message(body)}")
+            if attempt == GMAIL_MAX_RETRIES:
+                raise InferenceError(
+                    f"Gmail request failed after {GMAIL_MAX_RETRIES} retries: {_error_message(body)}"
+                )
+            # Full jitter, so that concurrent requests do not retry in lockstep
+            delay: float = random.uniform(0, GMAIL_RETRY_BACKOFF * 2**attempt)
+            log.warning(
+                f"Gmail request failed ({_error_message(body)}). Retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+        return None
 
-    async def get_emails(self, request: GmailFilterEmailsRequest) -> list[Gmail]:
+    async def get_emails(
+        self, request: GmailFilterEmailsRequest, include_body: bool = True
+    ) -> list[Gmail]:
+        """Returns the requested emails. Without include_body, only the headers are downloaded and the body of every email is left empty"""
         try:
-            gmail_lst: list[Gmail] = []
-            async with aiohttp.ClientSession() as session:
-                if request.message_ids:
-                    tasks = [
-                        self.fetch_message(
-                            session,
-                            f"https://www.googleapis.com/gmail/v1/users/me/messages/{message_id}",
-                        )
-                        for message_id in request.message_ids
-                    ]
-                    responses = await asyncio.gather(*tasks)
-                    for full_msg in responses:
-                        headers = full_msg["payload"]["headers"]
-                        gmail_lst.append(
-                            Gmail(
-                                id=full_msg["id"],
-                                labelIds=full_msg["labelIds"],
-                                sender=next(
-                                    (
-                                        header["value"]
-                                        for header in headers
-                                        if header["name"].lower() == "from"
-                                    ),
-                                    "",
-                                ),
-                                subject=next(
-                                    (
-                                        header["value"]
-                                        for header in headers
-                                        if header["name"].lower() == "subject"
-                                    ),
-                                    "",
-                                ),
-                                body=_get_message_body(full_msg["payload"]),
-                            )
-                        )
-                elif request.query:
-                    url = f"https://www.googleapis.com/gmail/v1/users/me/messages?q={request.query}"
-                    messages = await self.fetch_message(session, url)
-
-                    tasks = [
-                        self.fetch_message(
-                            session,
-                            f"https://www.googleapis.com/gmail/v1/users/me/messages/{message['id']}",
-                        )
-                        for message in messages.get("messages", [])
-                    ]
-                    responses = await asyncio.gather(*tasks)
-                    for full_msg in responses:
-                        headers = full_msg["payload"]["headers"]
-                        gmail_lst.append(
-                            Gmail(
-                                id=full_msg["id"],
-                                labelIds=full_msg["labelIds"],
-                                sender=next(
-                                    (
-                                        header["value"]
-                                        for header in headers
-                                        if header["name"].lower() == "from"
-                                    ),
-                                    "",
-                                ),
-                                subject=next(
-                                    (
-                                        header["value"]
-                                        for header in headers
-                                        if header["name"].lower() == "subject"
-                                    ),
-                                    "",
-                                ),
-                                body=_get_message_body(full_msg["payload"]),
-                            )
-                        )
-            return gmail_lst
+            if request.message_ids:
+                message_ids: list[str] = request.message_ids
+            elif request.query:
+                return [
+                    email
+                    async for email in self.iterate_emails(
+                        query=request.query, include_body=include_body
+                    )
+                ]
+            else:
+                return []
+            return await self._fetch_messages(
+                message_ids=message_ids, include_body=include_body
+            )
         except Exception as e:
             print(
                 f"Error getting emails via GmailClient: {e}"
             )  # Print the error for debugging
             raise InferenceError(f"Error getting emails via GmailClient: {e}")
 
+    async def iterate_emails(
+        self,
+        query: str,
+        page_size: int = GMAIL_LIST_PAGE_SIZE,
+        limit: Optional[int] = GMAIL_QUERY_RESULT_CAP,
+        include_body: bool = True,
+    ) -> AsyncIterator[Gmail]:
+        """Yields the emails matching the query, following nextPageToken until there are no more pages or limit emails have been listed. The messages of each page are fetched while the next page is listed"""
+        fetches: deque[asyncio.Task] = deque()
+        try:
+            async for message_ids in self._iterate_message_ids(
+                query=query, page_size=page_size, limit=limit
+            ):
+                fetches.append(
+                    asyncio.create_task(
+                        self._fetch_messages(
+                            message_ids=message_ids, include_body=include_body
+                        )
+                    )
+                )
+                # Yield the pages that have already arrived, and wait for the oldest one once too many are outstanding
+                while fetches and (
+                    fetches[0].done() or len(fetches) > GMAIL_MAX_CONCURRENT_BATCHES
+                ):
+                    for email in await fetches.popleft():
+                        yield email
+            while fetches:
+                for email in await fetches.popleft():
+                    yield email
+        finally:
+            # The caller stopped iterating early or a page failed
+            for fetch in fetches:
+                fetch.cancel()
+
+    async def _iterate_message_ids(
+        self, query: str, page_size: int, limit: Optional[int]
+    ) -> AsyncIterator[list[str]]:
+        """Yields the message ids of each page of messages.list for the query"""
+        page_token: Optional[str] = None
+        listed: int = 0
+        while True:
+            params: dict[str, Any] = {
+                "q": query,
+                "maxResults": (
+                    page_size if limit is None else min(page_size, limit - listed)
+                ),
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            async with self.session.get(
+                self.base_url, headers=self.headers, params=params
+            ) as response:
+                page: dict = await response.json()
+            if "error" in page:
+                raise InferenceError(
+                    f"Error listing Gmail messages: {_error_message(page)}"
+                )
+            message_ids: list[str] = [
+                message["id"] for message in page.get("messages", [])
+            ]
+            if message_ids:
+                yield message_ids
+            listed += len(message_ids)
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return
+            if limit is not None and listed >= limit:
+                log.warning(
+                    f"Gmail query matched more than {limit} messages, truncating"
+                )
+                return
+
+    async def _get_message_cache(self) -> GmailMessageCache:
+        return await get_message_cache(
+            key=self.cache_key,
+            session=self.session,
+            users_url=self.users_url,
+            headers=self.headers,
+        )
+
+    async def _fetch_messages(
+        self, message_ids: list[str], include_body: bool
+    ) -> list[Gmail]:
+        """Returns the emails in the order given, from the message cache of the account where possible.
+
+        The rest are fetched through the batch endpoint, with GMAIL_BATCH_SIZE messages per request and at most GMAIL_MAX_CONCURRENT_BATCHES requests in flight.
+        """
+        cache: GmailMessageCache = await self._get_message_cache()
+        emails_by_id: dict[str, Gmail] = {}
+        for message_id in dict.fromkeys(message_ids):
+            email: Optional[Gmail] = cache.get(message_id)
+            if email is not None:
+                emails_by_id[message_id] = (
+                    email if include_body else email.model_copy(update={"body": ""})
+                )
+        missing_ids: list[str] = [
+            message_id
+            for message_id in dict.fromkeys(message_ids)
+            if message_id not in emails_by_id
+        ]
+        chunks: list[list[str]] = [
+            missing_ids[i : i + GMAIL_BATCH_SIZE]
+            for i in range(0, len(missing_ids), GMAIL_BATCH_SIZE)
+        ]
+        history_id: Optional[str] = cache.history_id
+        for chunk_messages in await asyncio.gather(
+            *[
+                self._fetch_message_chunk(message_ids=chunk, include_body=include_body)
+                for chunk in chunks
+            ]
+        ):
+            for message_id, message in chunk_messages.items():
+                emails_by_id[message_id] = _to_gmail(message)
+                # Emails fetched while the cache was being validated may predate changes the cache has already moved past
+                if include_body and cache.history_id == history_id:
+                    cache.put(emails_by_id[message_id])
+        return [emails_by_id[message_id] for message_id in message_ids]
+
+    async def _fetch_message_chunk(
+        self, message_ids: list[str], include_body: bool
+    ) -> dict[str, dict]:
+        messages: dict[str, dict] = {}
+        pending: list[str] = message_ids
+        for attempt in range(GMAIL_MAX_RETRIES + 1):
+            try:
+                async with self._batch_semaphore:
+                    responses: dict[str, tuple[Optional[int], dict]] = (
+                        await self._post_batch(
+                            message_ids=pending, include_body=include_body
+                        )
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                responses = {
+                    message_id: (None, {"error": {"message": str(e)}})
+                    for message_id in pending
+                }
+
+            retry: list[str] = []
+            for message_id in pending:
+                status, body = responses.get(
+                    message_id,
+                    (None, {"error": {"message": "Missing from batch response"}}),
+                )
+                if status == 200:
+                    messages[message_id] = body
+                elif status is None or _is_retryable(status=status, body=body):
+                    retry.append(message_id)
+                else:
+                    raise InferenceError(
+                        f"Error fetching Gmail message {message_id}: {_error_message(body)}"
+                    )
+            if not retry:
+                return messages
+            if attempt == GMAIL_MAX_RETRIES:
+                raise InferenceError(
+                    f"Error fetching {len(retry)} Gmail messages after {GMAIL_MAX_RETRIES} retries: "
+                    f"{_error_message(responses.get(retry[0], (None, {}))[1])}"
+                )
+            # Full jitter, so that concurrent batches do not retry in lockstep
+            delay: float = random.uniform(0, GMAIL_RETRY_BACKOFF * 2**attempt)
+            log.warning(
+                f"Gmail batch left {len(retry)} of {len(pending)} messages unfetched. Retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+            pending = retry
+        return messages
+
+    async def _post_batch(
+        self, message_ids: list[str], include_body: bool
+    ) -> dict[str, tuple[Optional[int], dict]]:
+        """Sends one multipart/mixed batch request of GET messages/{id} calls and returns the status and JSON body of each message"""
+        query: str = urlencode(
+            (
+                {"format": "full", "fields": FULL_MESSAGE_FIELDS}
+                if include_body
+                else [
+                    ("format", "metadata"),
+                    *[("metadataHeaders", header) for header in METADATA_HEADERS],
+                    ("fields", METADATA_MESSAGE_FIELDS),
+                ]
+            ),
+            safe=",/()",
+        )
+        boundary: str = f"batch_{uuid.uuid4().hex}"
+        body: str = (
+            "".join(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <item{index}>\r\n\r\n"
+                f"GET {GMAIL_MESSAGES_PATH}/{quote(message_id, safe='')}?{query}\r\n\r\n"
+                for index, message_id in enumerate(message_ids)
+            )
+            + f"--{boundary}--\r\n"
+        )
+        async with self.session.post(
+            self.batch_url,
+            headers={
+                **self.headers,
+                "Content-Type": f"multipart/mixed; boundary={boundary}",
+            },
+            data=body.encode(),
+        ) as response:
+            content: bytes = await response.read()
+            if response.status != 200:
+                # The batch failed as a whole, e.g. rate limited or unauthorised
+                try:
+                    error_body: dict = json.loads(content)
+                except ValueError:
+                    error_body = {
+                        "error": {"message": content.decode(errors="replace")}
+                    }
+                return {
+                    message_id: (response.status, error_body)
+                    for message_id in message_ids
+                }
+            parts: list[tuple[str, int, dict]] = _parse_batch_response(
+                content_type=response.headers.get("Content-Type", ""), content=content
+            )
+        responses: dict[str, tuple[Optional[int], dict]] = {}
+        for content_id, status, part_body in parts:
+            index: Optional[int] = _content_id_index(content_id)
+            if index is not None and index < len(message_ids):
+                responses[message_ids[index]] = (status, part_body)
+        return responses
+
+
+def _to_gmail(message: dict) -> Gmail:
+    headers: list[dict] = message.get("payload", {}).get("headers", [])
+    return Gmail(
+        id=message["id"],
+        labelIds=message.get("labelIds", []),
+        sender=next(
+            (header["value"] for header in headers if header["name"].lower() == "from"),
+            "",
+        ),
+        subject=next(
+            (
+                header["value"]
+                for header in headers
+                if header["name"].lower() == "subject"
+            ),
+            "",
+        ),
+        body=(
+            _get_message_body(message["payload"])
+            if "mimeType" in message.get("payload", {})
+            else ""
+        ),
+    )
+
+
+def _parse_batch_response(
+    content_type: str, content: bytes
+) -> list[tuple[str, int, dict]]:
+    """Splits a multipart/mixed batch response into the Content-ID, HTTP status and JSON body of each part"""
+    multipart = BytesParser(policy=default).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + content
+    )
+    parts: list[tuple[str, int, dict]] = []
+    for part in multipart.iter_parts():
+        http_response: str = part.get_payload(decode=True).decode(errors="replace")
+        # An embedded HTTP response: status line and headers, a blank line, then the JSON body
+        sections: list[str] = re.split(r"\r?\n\r?\n", http_response.strip(), maxsplit=1)
+        status_line: str = sections[0].splitlines()[0]
+        json_body: str = sections[1] if len(sections) > 1 else ""
+        try:
+            body: dict = json.loads(json_body) if json_body.strip() else {}
+        except ValueError:
+            body = {"error": {"message": json_body.strip()}}
+        parts.append((part.get("Content-ID", ""), int(status_line.split()[1]), body))
+    return parts
+
+
+def _content_id_index(content_id: str) -> Optional[int]:
+    """Maps the Content-ID <response-item3> of a batch response part back to 3"""
+    match = re.search(r"item(\d+)>?$", content_id.strip())
+    return int(match.group(1)) if match else None
+
+
+def _is_retryable(status: int, body: dict) -> bool:
+    if status in RETRYABLE_STATUSES:
+        return True
+    # Gmail reports per-user quota exhaustion as 403 rather than 429
+    reasons: set[str] = {
+        error.get("reason") for error in body.get("error", {}).get("errors", [])
+    }
+    return status == 403 and bool(reasons & RATE_LIMIT_REASONS)
+
+
+def _error_message(body: dict) -> str:
+    return body.get("error", {}).get("message", str(body))
+
 
 def _get_message_body(payload):
     """
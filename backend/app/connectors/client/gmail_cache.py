@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import aiohttp
+
+from app.models.integrations.gmail import Gmail
+from app.utils.cache import TTLCache
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+# Each account keeps at most max bytes of parsed emails. The cache is checked against the mailbox history at most once per validation interval,
+# so emails changed elsewhere may be served stale for up to that long. Idle accounts are evicted after the ttl
+GMAIL_CACHE_MAX_BYTES = int(os.environ.get("GMAIL_CACHE_MAX_BYTES", 4 * 1024 * 1024))
+GMAIL_CACHE_MAX_ACCOUNTS = int(os.environ.get("GMAIL_CACHE_MAX_ACCOUNTS", 64))
+GMAIL_CACHE_TTL = float(os.environ.get("GMAIL_CACHE_TTL", 3600))
+GMAIL_CACHE_VALIDATION_INTERVAL = float(
+    os.environ.get("GMAIL_CACHE_VALIDATION_INTERVAL", 10)
+)
+GMAIL_HISTORY_PAGE_SIZE = 500  # Maximum page size allowed by history.list
+
+
+class GmailMessageCache:
+    """Parsed emails of one Gmail account, evicted least recently used first once their total size exceeds max_bytes, and valid as of history_id"""
+
+    def __init__(self, max_bytes: int = GMAIL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size_bytes: int = 0
+        self.email_address: Optional[str] = None
+        # Every cached email reflects all mailbox changes up to this history id
+        self.history_id: Optional[str] = None
+        self.validated_at: float = 0.0
+        self.lock = asyncio.Lock()
+        self._emails: OrderedDict[str, tuple[Gmail, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._emails)
+
+    @property
+    def needs_validation(self) -> bool:
+        return (
+            self.history_id is None
+            or time.monotonic() - self.validated_at > GMAIL_CACHE_VALIDATION_INTERVAL
+        )
+
+    def get(self, message_id: str) -> Optional[Gmail]:
+        entry: Optional[tuple[Gmail, int]] = self._emails.get(message_id)
+        if entry is None:
+            _metrics["gmail_cache_misses_total"] += 1
+            return None
+        _metrics["gmail_cache_hits_total"] += 1
+        self._emails.move_to_end(message_id)
+        # Copied, so that callers cannot modify the cached email
+        return entry[0].model_copy(deep=True)
+
+    def put(self, email: Gmail):
+        self.evict([email.id])
+        size: int = len(email.model_dump_json())
+        if size > self.max_bytes:
+            return
+        self._emails[email.id] = (email.model_copy(deep=True), size)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._emails.popitem(last=False)
+            self.size_bytes -= evicted_size
+            _metrics["gmail_cache_evictions_total"] += 1
+
+    def evict(self, message_ids: list[str]):
+        for message_id in message_ids:
+            entry: Optional[tuple[Gmail, int]] = self._emails.pop(message_id, None)
+            if entry is not None:
+                self.size_bytes -= entry[1]
+
+    def remove_label(self, message_ids: list[str], label_id: str):
+        for message_id in message_ids:
+            entry: Optional[tuple[Gmail, int]] = self._emails.get(message_id)
+            if entry is not None and label_id in entry[0].labelIds:
+                entry[0].labelIds.remove(label_id)
+
+    def clear(self):
+        self._emails.clear()
+        self.size_bytes = 0
+        self.history_id = None
+
+
+_metrics: dict[str, float] = {
+    "gmail_cache_hits_total": 0,
+    "gmail_cache_misses_total": 0,
+    "gmail_cache_evictions_total": 0,
+    "gmail_cache_validations_total": 0,
+}
+
+gmail_message_cache = TTLCache(max_size=GMAIL_CACHE_MAX_ACCOUNTS, ttl=GMAIL_CACHE_TTL)
+
+
+def account_cache_key(
+    client_id: str, refresh_token: Optional[str], access_token: str
+) -> str:
+    """Keyed by the refresh token rather than the access token, so that the cache of an account survives access token refreshes"""
+    return hashlib.sha256(
+        f"{client_id}:{refresh_token or access_token}".encode()
+    ).hexdigest()
+
+
+def remove_cached_label(key: str, message_ids: list[str], label_id: str):
+    """Applies a label removal made by this process to the cached emails of the account, so that they are not served stale until the next validation"""
+    cache: Optional[GmailMessageCache] = gmail_message_cache.get(key)
+    if cache is not None:
+        cache.remove_label(message_ids=message_ids, label_id=label_id)
+
+
+async def get_message_cache(
+    key: str,
+    session: aiohttp.ClientSession,
+    users_url: str,
+    headers: dict[str, str],
+) -> GmailMessageCache:
+    """Returns the message cache of the account, first evicting the emails changed since its history id if it is older than the validation interval.
+
+    A new cache starts from the current history id of the mailbox, which is read before any email is fetched into it.
+    """
+    cache: Optional[GmailMessageCache] = gmail_message_cache.get(key)
+    if cache is None:
+        cache = GmailMessageCache()
+        gmail_message_cache.set(key, cache)
+    if not cache.needs_validation:
+        return cache
+
+    async with cache.lock:
+        # Another coroutine may have validated the cache while this one was waiting
+        if cache.needs_validation:
+            await _validate_message_cache(
+                cache=cache, session=session, users_url=users_url, headers=headers
+            )
+    return cache
+
+
+async def _validate_message_cache(
+    cache: GmailMessageCache,
+    session: aiohttp.ClientSession,
+    users_url: str,
+    headers: dict[str, str],
+):
+    started_at: float = time.monotonic()
+    _metrics["gmail_cache_validations_total"] += 1
+    if cache.history_id is not None:
+        changed: Optional[set[str]] = await _list_changed_message_ids(
+            cache=cache, session=session, users_url=users_url, headers=headers
+        )
+        if changed is not None:
+            cache.evict(list(changed))
+            cache.validated_at = started_at
+            log.info(f"Evicted {len(changed)} changed emails from the Gmail cache")
+            return
+        # The history id is too old for history.list, so every cached email may be stale
+        log.info("Gmail history expired, clearing the message cache")
+        cache.clear()
+
+    async with session.get(f"{users_url}/profile", headers=headers) as response:
+        profile: dict = await response.json()
+    if "historyId" not in profile:
+        raise Exception(profile.get("error", profile))
+    cache.email_address = profile.get("emailAddress")
+    cache.history_id = profile["historyId"]
+    cache.validated_at = started_at
+
+
+async def _list_changed_message_ids(
+    cache: GmailMessageCache,
+    session: aiohttp.ClientSession,
+    users_url: str,
+    headers: dict[str, str],
+) -> Optional[set[str]]:
+    """Returns the ids of the messages changed since the history id of the cache and advances it, or None if the history id has expired"""
+    changed: set[str] = set()
+    page_token: Optional[str] = None
+    latest_history_id: Optional[str] = None
+    while True:
+        params: dict[str, Any] = {
+            "startHistoryId": cache.history_id,
+            "maxResults": GMAIL_HISTORY_PAGE_SIZE,
+            "fields": "history(messages/id),nextPageToken,historyId",
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        async with session.get(
+            f"{users_url}/history", headers=headers, params=params
+        ) as response:
+            if response.status == 404:
+                return None
+            page: dict = await response.json()
+        if "error" in page:
+            raise Exception(page["error"])
+        for record in page.get("history", []):
+            changed.update(message["id"] for message in record.get("messages", []))
+        latest_history_id = page.get("historyId", latest_history_id)
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            break
+    if latest_history_id is not None:
+        cache.history_id = latest_history_id
+    return changed
+
+
+def get_gmail_cache_metrics() -> dict[str, float]:
+    caches: list[GmailMessageCache] = gmail_message_cache.values()
+    return {
+        **_metrics,
+        "gmail_cache_accounts": len(caches),
+        "gmail_cache_emails": sum(len(cache) for cache in caches),
+        "gmail_cache_bytes": sum(cache.size_bytes for cache in caches),
+    }
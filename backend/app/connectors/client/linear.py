@@ -1,13 +1,38 @@
 import asyncio
 import logging
+import os
+import random
+import time
 from collections import defaultdict
-from typing import Optional
+from typing import AsyncIterator, Callable, Mapping, Optional
 
-import httpx
+import aiohttp
 from gql import Client, gql
-from gql.transport.aiohttp import AIOHTTPTransport
+from gql.transport.exceptions import TransportQueryError, TransportServerError
 from pydantic import BaseModel
 
+from app.connectors.client.linear_index import (
+    LinearIssueIndex,
+    get_issue_index,
+    record_issues,
+    remove_issues,
+)
+from app.connectors.client.linear_metadata import (
+    LinearWorkspaceMetadata,
+    get_workspace_metadata,
+    refresh_workspace_metadata,
+)
+from app.connectors.client.linear_mirror import (
+    get_mirrored_issues,
+    refresh_mirror,
+    remove_mirrored_issues,
+)
+from app.connectors.client.linear_schema import get_linear_schema
+from app.connectors.http import (
+    SharedConnectorAIOHTTPTransport,
+    get_httpx_client,
+    response_headers_context,
+)
 from app.models.integrations.linear import (
     Label,
     LinearCreateIssueRequest,
@@ -16,6 +41,7 @@ from app.models.integrations.linear import (
     LinearGetIssuesRequest,
     LinearIssue,
     LinearIssueQuery,
+    LinearIssueUpdateResult,
     LinearUpdateIssuesAssigneeRequest,
     LinearUpdateIssuesCycleRequest,
     LinearUpdateIssuesDescriptionRequest,
@@ -30,7 +56,8 @@ from app.models.integrations.linear import (
     Title,
     User,
 )
-from app.utils.levenshtein import get_most_similar_string
+from app.utils.levenshtein import FuzzyIndex
+from app.utils.tracing import traced_client
 
 logging.getLogger("gql").setLevel(logging.WARNING)
 logging.getLogger("gql.transport.requests").setLevel(logging.WARNING)
@@ -39,28 +66,215 @@ logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
 LINEAR_API_URL = "https://api.linear.app/graphql"
-
-
+# Number of aliased operations sent in a single GraphQL document by execute_batch
+LINEAR_BATCH_SIZE = int(os.environ.get("LINEAR_BATCH_SIZE", 25))
+# Issues fetched per request when paginating (at most 250, the maximum allowed by the Linear API) and the maximum number of issues returned by a filter query
+LINEAR_ISSUE_PAGE_SIZE = min(int(os.environ.get("LINEAR_ISSUE_PAGE_SIZE", 100)), 250)
+LINEAR_ISSUE_RESULT_CAP = int(os.environ.get("LINEAR_ISSUE_RESULT_CAP", 500))
+# Batch documents in flight at once per client, and retries (with exponential backoff) of documents that failed as a whole, e.g. when rate limited
+LINEAR_MAX_CONCURRENT_BATCHES = int(os.environ.get("LINEAR_MAX_CONCURRENT_BATCHES", 4))
+LINEAR_MAX_RETRIES = int(os.environ.get("LINEAR_MAX_RETRIES", 3))
+LINEAR_RETRY_BACKOFF = float(os.environ.get("LINEAR_RETRY_BACKOFF", 0.5))
+# Requests are held back until the rate-limit window resets once fewer than this many requests remain in it
+LINEAR_RATE_LIMIT_RESERVE = int(os.environ.get("LINEAR_RATE_LIMIT_RESERVE", 5))
+BATCH_ALIAS_PREFIX = "op"
+
+LINEAR_ISSUE_FIELDS = """
+    id
+    number
+    title
+    description
+    priority
+    estimate
+    state { name }
+    assignee { name }
+    creator { name }
+    labels { nodes { name } }
+    createdAt
+    updatedAt
+    dueDate
+    cycle { number }
+    project { name }
+    comments { nodes { body user { name } } }
+    url
+"""
+# Projection for callers that only need to identify issues, e.g. before updating or deleting them
+LINEAR_ISSUE_SUMMARY_FIELDS = """
+    id
+    number
+    title
+    url
+"""
+
+
+@traced_client
 class LinearClient:
     def __init__(self, access_token: str):
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {access_token}",
         }
-        transport = AIOHTTPTransport(
+        transport = SharedConnectorAIOHTTPTransport(
             url=LINEAR_API_URL,
             headers=self.headers,
         )
-        self.client = Client(transport=transport, fetch_schema_from_transport=True)
+        # The schema is shared across clients (see get_linear_schema) instead of being introspected by every client
+        self.client = Client(transport=transport, fetch_schema_from_transport=False)
+        self.session = None
+        self._connect_lock = asyncio.Lock()
+        self._batch_semaphore = asyncio.Semaphore(LINEAR_MAX_CONCURRENT_BATCHES)
+        self._rate_limit_lock = asyncio.Lock()
+        self._rate_limit_reset_at: float = 0.0  # Epoch seconds
 
     async def close(self):
-        await self.client.transport.close()
+        if self.session is not None:
+            await self.client.close_async()
+            self.session = None
+
+    async def execute(self, document, variable_values: Optional[dict] = None) -> dict:
+        """Executes a gql document on the client's persistent session. Documents are validated locally against the shared Linear schema"""
+        if self.session is None:
+            async with self._connect_lock:
+                if self.session is None:
+                    self.client.schema = await get_linear_schema(
+                        url=LINEAR_API_URL, headers=self.headers
+                    )
+                    self.session = await self.client.connect_async()
+        await self._wait_for_rate_limit()
+        response_headers: list = []
+        token = response_headers_context.set(response_headers)
+        try:
+            return await self.session.execute(document, variable_values=variable_values)
+        finally:
+            response_headers_context.reset(token)
+            if response_headers:
+                async with self._rate_limit_lock:
+                    self._update_rate_limit(headers=response_headers[-1])
+
+    async def _wait_for_rate_limit(self):
+        delay: float = self._rate_limit_reset_at - time.time()
+        if delay > 0:
+            log.info(f"Linear rate limit almost exhausted. Waiting {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _update_rate_limit(self, headers: Mapping[str, str]):
+        """Reads the rate-limit headers of one response, e.g. X-RateLimit-Requests-Remaining and X-RateLimit-Requests-Reset (epoch milliseconds).
+        Must be called under _rate_limit_lock, as the concurrent documents of a batch all report into the same budget
+        """
+        remaining: Optional[str] = headers.get("X-RateLimit-Requests-Remaining")
+        reset: Optional[str] = headers.get("X-RateLimit-Requests-Reset")
+        if remaining is None or reset is None:
+            return
+        if int(remaining) <= LINEAR_RATE_LIMIT_RESERVE:
+            self._rate_limit_reset_at = max(
+                self._rate_limit_reset_at, int(reset) / 1000
+            )
 
-    async def query_grapql(self, query):
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                LINEAR_API_URL, json={"query": query}, headers=self.headers
+    async def execute_batch(
+        self,
+        operation_type: str,
+        field: str,
+        arguments: dict[str, str],
+        selection: str,
+        variables: list[dict],
+    ) -> list[tuple[Optional[dict], Optional[str]]]:
+        """Runs the same field once per entry of variables, composing the calls into aliased documents of up to LINEAR_BATCH_SIZE fields.
+
+        At most LINEAR_MAX_CONCURRENT_BATCHES documents are in flight at once, and documents that fail as a whole are retried with backoff.
+        arguments maps each argument of the field to its GraphQL type. Returns a (data, error) pair per entry, in the order of variables.
+        """
+        chunks: list[list[dict]] = [
+            variables[start : start + LINEAR_BATCH_SIZE]
+            for start in range(0, len(variables), LINEAR_BATCH_SIZE)
+        ]
+        chunk_results = await asyncio.gather(
+            *[
+                self._execute_aliased_chunk(
+                    operation_type=operation_type,
+                    field=field,
+                    arguments=arguments,
+                    selection=selection,
+                    chunk=chunk,
+                )
+                for chunk in chunks
+            ]
+        )
+        return [result for chunk_result in chunk_results for result in chunk_result]
+
+    async def _execute_aliased_chunk(
+        self,
+        operation_type: str,
+        field: str,
+        arguments: dict[str, str],
+        selection: str,
+        chunk: list[dict],
+    ) -> list[tuple[Optional[dict], Optional[str]]]:
+        document = gql(
+            _build_aliased_document(
+                operation_type=operation_type,
+                field=field,
+                arguments=arguments,
+                selection=selection,
+                count=len(chunk),
+            )
+        )
+        variable_values: dict = {
+            f"{argument}{index}": entry[argument]
+            for index, entry in enumerate(chunk)
+            for argument in arguments
+        }
+        data: dict = {}
+        errors: list[dict] = []
+        for attempt in range(LINEAR_MAX_RETRIES + 1):
+            retryable: bool = False
+            try:
+                async with self._batch_semaphore:
+                    data = await self.execute(document, variable_values=variable_values)
+                errors = []
+            except TransportQueryError as e:
+                # Partial failures still carry the data of the aliases that succeeded
+                data = e.data or {}
+                errors = e.errors or [{"message": str(e)}]
+                retryable = not data and _is_rate_limited(errors)
+            except (
+                TransportServerError,
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+            ) as e:
+                data = {}
+                errors = [{"message": str(e)}]
+                retryable = True
+            if not retryable or attempt == LINEAR_MAX_RETRIES:
+                break
+            # Full jitter, so that concurrent documents do not retry in lockstep
+            delay: float = random.uniform(0, LINEAR_RETRY_BACKOFF * 2**attempt)
+            log.warning(
+                f"Linear {field} batch failed ({errors[0].get('message')}). Retrying in {delay:.2f}s"
             )
+            await asyncio.sleep(delay)
+
+        errors_by_alias: dict[Optional[str], list[str]] = defaultdict(list)
+        for error in errors:
+            path: list = error.get("path") or [None]
+            errors_by_alias[path[0]].append(error.get("message", str(error)))
+
+        results: list[tuple[Optional[dict], Optional[str]]] = []
+        for index in range(len(chunk)):
+            alias: str = f"{BATCH_ALIAS_PREFIX}{index}"
+            alias_data: Optional[dict] = data.get(alias)
+            alias_errors: list[str] = errors_by_alias.get(alias, [])
+            if alias_data is None and not alias_errors:
+                # Errors without a path (e.g. rate limiting) apply to the whole document
+                alias_errors = errors_by_alias.get(None, []) or [
+                    f"No result returned for {field}"
+                ]
+            results.append((alias_data, "; ".join(alias_errors) or None))
+        return results
+
+    async def query_grapql(self, query):
+        r = await get_httpx_client().post(
+            LINEAR_API_URL, json={"query": query}, headers=self.headers
+        )
 
         response = r.json()
 
@@ -69,59 +283,70 @@ class LinearClient:
 
         return response
 
-    async def query_basic_resource(self, resource: str, subfields: str):
-
-        resource_response = await self.query_grapql(
-            f"""
-                query Resource {{
-                    {resource} {{
-                        nodes {{
-                            {subfields}
+    async def query_basic_resource(
+        self,
+        resource: str,
+        subfields: str,
+        page_size: int = LINEAR_ISSUE_PAGE_SIZE,
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """Returns the nodes of every page of the resource, up to limit nodes"""
+        nodes: list[dict] = []
+        cursor: Optional[str] = None
+        while True:
+            first: int = (
+                page_size if limit is None else min(page_size, limit - len(nodes))
+            )
+            after: str = f', after: "{cursor}"' if cursor else ""
+            resource_response = await self.query_grapql(
+                f"""
+                    query Resource {{
+                        {resource}(first: {first}{after}) {{
+                            nodes {{
+                                {subfields}
+                            }}
+                            pageInfo {{ hasNextPage endCursor }}
                         }}
                     }}
-                }}
-            """
-        )
+                """
+            )
+            page: dict = resource_response["data"][resource]
+            nodes.extend(page["nodes"])
+            if not page["pageInfo"]["hasNextPage"]:
+                return nodes
+            if limit is not None and len(nodes) >= limit:
+                return nodes
+            cursor = page["pageInfo"]["endCursor"]
 
-        return resource_response["data"][resource]["nodes"]
+    async def workspace_metadata(self) -> LinearWorkspaceMetadata:
+        return await get_workspace_metadata(url=LINEAR_API_URL, headers=self.headers)
 
     async def teams(self) -> list[Team]:
-        teams_dict: list[dict] = await self.query_basic_resource(
-            resource="teams", subfields="id,name"
-        )
-        return [Team.model_validate(team) for team in teams_dict]
+        return list((await self.workspace_metadata()).teams)
 
     async def states(self) -> list[State]:
-        states_dict: list[dict] = await self.query_basic_resource(
-            resource="workflowStates", subfields="name"
-        )
-        return [State(state["name"]) for state in states_dict]
+        return [State(state) for state in (await self.workspace_metadata()).states]
 
     async def projects(self) -> list[Project]:
-        projects_dict: list[dict] = await self.query_basic_resource(
-            resource="projects", subfields="name"
-        )
-        return [Project.model_validate(project) for project in projects_dict]
+        return [
+            Project(name=project)
+            for project in (await self.workspace_metadata()).projects
+        ]
 
     async def users(self) -> list[User]:
-        users_dict: list[dict] = await self.query_basic_resource(
-            resource="users", subfields="name"
-        )
-        return [User.model_validate(user) for user in users_dict]
+        return [User(name=user) for user in (await self.workspace_metadata()).users]
 
     async def labels(self) -> list[Label]:
-        labels_dict: list[dict] = await self.query_basic_resource(
-            resource="issueLabels", subfields="name"
-        )
-        return [Label.model_validate(label) for label in labels_dict]
+        return [Label(name=label) for label in (await self.workspace_metadata()).labels]
 
     async def titles(self) -> list[Title]:
-        titles_dict: list[dict] = await self.query_basic_resource(
-            resource="issues", subfields="title"
-        )
-        return [Title.model_validate(title) for title in titles_dict]
+        return [
+            Title(title=title) for title in (await self.issue_index()).titles.values()
+        ]
+
+    async def issue_index(self) -> LinearIssueIndex:
+        return await get_issue_index(url=LINEAR_API_URL, headers=self.headers)
 
-    # TODO: Add support for best match
     async def create_issue(self, request: LinearCreateIssueRequest) -> LinearIssue:
         MUTATION_NAME = "issueCreate"
 
@@ -197,95 +422,99 @@ class LinearClient:
             k: v for k, v in variables["input"].items() if v is not None
         }
 
-        result = await self.client.execute_async(mutation, variable_values=variables)
-        return LinearIssue.model_validate(
+        result = await self.execute(mutation, variable_values=variables)
+        created_issue: LinearIssue = LinearIssue.model_validate(
             await _flatten_linear_response_issue(result[MUTATION_NAME]["issue"])
         )
+        record_issues(headers=self.headers, issues=[created_issue])
+        refresh_mirror(url=LINEAR_API_URL, headers=self.headers)
+        return created_issue
 
-    async def get_issues(self, request: LinearGetIssuesRequest) -> list[LinearIssue]:
-        if request.issue_ids:
-            QUERY_OBJ_NAME: str = "issue"
-            query = gql(
-                f"""
-                query GetIssue($id: String!) {{
-                    {QUERY_OBJ_NAME}(id: $id) {{
-                        id
-                        number
-                        title
-                        description
-                        priority
-                        estimate
-                        state {{ name }}
-                        assignee {{ name }}
-                        creator {{ name }}
-                        labels {{ nodes {{ name }} }}
-                        createdAt
-                        updatedAt
-                        dueDate
-                        cycle {{ number }}
-                        project {{ name }}
-                        comments {{ nodes {{ body user {{ name }} }} }}
-                        url
-                    }}
-                }}
-            """
-            )
-            get_issue_tasks = [
-                asyncio.create_task(
-                    self.client.execute_async(query, variable_values={"id": issue_id})
-                )
-                for issue_id in request.issue_ids
-            ]
-            get_issue_results = await asyncio.gather(*get_issue_tasks)
-
-            flatten_issue_tasks = [
-                asyncio.create_task(
-                    _flatten_linear_response_issue(result[QUERY_OBJ_NAME])
-                )
-                for result in get_issue_results
-            ]
-            flattened_issue_results = await asyncio.gather(*flatten_issue_tasks)
+    async def get_issues(
+        self, request: LinearGetIssuesRequest, fields: str = LINEAR_ISSUE_FIELDS
+    ) -> list[LinearIssue]:
+        """Returns the issues matching the request. fields selects the projection of each issue, and fields that are not selected are None.
 
-            return flattened_issue_results
+        Read requests are answered from the local mirror when it is enabled and synced, in which case every field is returned.
+        """
+        if not request.issue_ids:
+            request.query = await self._repair_issue_query(query=request.query)
 
-        request.query = await self._repair_issue_query(query=request.query)
-        return await self._get_issues_with_boolean_clause(issue_query=request.query)
+        # Updates and deletes always resolve their targets against Linear itself
+        if isinstance(request, LinearGetIssuesRequest):
+            mirrored_issues: Optional[list[LinearIssue]] = await get_mirrored_issues(
+                url=LINEAR_API_URL,
+                headers=self.headers,
+                request=request,
+                limit=LINEAR_ISSUE_RESULT_CAP,
+            )
+            if mirrored_issues is not None:
+                return mirrored_issues
 
-    async def get_zero_match_issue_query_parameters(
-        self, query: LinearIssueQuery
-    ) -> dict[str, list[BaseModel]]:
-        """Returns a dictionary where the keys are the parameters provided in the issue query and the values are the parameter values that did not have any matches with any items"""
+        if request.issue_ids:
+            return await self._get_issues_by_ids(
+                issue_ids=request.issue_ids, fields=fields
+            )
+        return await self._get_issues_with_boolean_clause(
+            issue_query=request.query, fields=fields
+        )
 
-        QUERY_OBJ_GROUP = "issues"
-        QUERY_OBJ_LIST = "nodes"
-        test_query = gql(
+    async def _get_issues_by_ids(
+        self, issue_ids: list[str], fields: str = LINEAR_ISSUE_FIELDS
+    ) -> list[LinearIssue]:
+        """Fetches the issues with one issues(filter: {id: {in: [...]}}) query per LINEAR_ISSUE_PAGE_SIZE ids, in the order of issue_ids"""
+        QUERY_OBJ_GROUP: str = "issues"
+        QUERY_OBJ_LIST: str = "nodes"
+        query = gql(
             f"""
-            query TestFilter($filter: IssueFilter) {{
-                {QUERY_OBJ_GROUP}(filter: $filter) {{
+            query GetIssuesByIds($ids: [ID!], $first: Int) {{
+                {QUERY_OBJ_GROUP}(filter: {{ id: {{ in: $ids }} }}, first: $first) {{
                     {QUERY_OBJ_LIST} {{
-                        id
+                        {fields}
                     }}
                 }}
             }}
             """
         )
+        unique_ids: list[str] = list(dict.fromkeys(issue_ids))
+        chunks: list[list[str]] = [
+            unique_ids[start : start + LINEAR_ISSUE_PAGE_SIZE]
+            for start in range(0, len(unique_ids), LINEAR_ISSUE_PAGE_SIZE)
+        ]
+        results: list[dict] = await asyncio.gather(
+            *[
+                self.execute(query, variable_values={"ids": chunk, "first": len(chunk)})
+                for chunk in chunks
+            ]
+        )
+        issues_by_id: dict[str, dict] = {
+            issue["id"]: issue
+            for result in results
+            for issue in result[QUERY_OBJ_GROUP][QUERY_OBJ_LIST]
+        }
+        return await asyncio.gather(
+            *[
+                _flatten_linear_response_issue(issues_by_id[issue_id])
+                for issue_id in unique_ids
+                if issue_id in issues_by_id
+            ]
+        )
 
-        async def is_parameter_valid(filter_clause: dict) -> bool:
-            """Returns True if the filter clause matches with at least one item and False otherwise"""
-            test_variables = {"filter": {"and": [filter_clause]}}
-            test_result = await self.client.execute_async(
-                test_query, variable_values=test_variables
-            )
-            if test_result[QUERY_OBJ_GROUP][
-                QUERY_OBJ_LIST
-            ]:  # Parameter is valid if there is at least one item that matches the parameter
-                return True
-            return False
+    async def get_zero_match_issue_query_parameters(
+        self, query: LinearIssueQuery
+    ) -> dict[str, list[BaseModel]]:
+        """Returns a dictionary where the keys are the parameters provided in the issue query and the values are the parameter values that did not have any matches with any items.
 
+        Values are checked against the local issue index and workspace metadata instead of sending a probe query per value.
+        """
+        index, metadata = await asyncio.gather(
+            self.issue_index(), self.workspace_metadata()
+        )
         zero_match_parameters = defaultdict(list[BaseModel])
+        # Names missing from a collection cut off at the page limit may still exist, so those misses are confirmed with a filtered lookup
+        unconfirmed: list[tuple[str, BaseModel, str, str]] = []
         query_dict = query.model_dump()
 
-        tasks = []
         for param, value_lst in query_dict.items():
             if not value_lst:  # No need to test if the parameter is not provided
                 continue
@@ -294,79 +523,89 @@ class LinearClient:
             for value in value_lst:
                 match param:
                     case "title":
-                        filter_clause = {"title": {"contains": value}}
-                    case "assignee":
-                        filter_clause = {"assignee": {"name": {"eq": value}}}
-                    case "creator":
-                        filter_clause = {"creator": {"name": {"eq": value}}}
+                        if not index.has_title_containing(value):
+                            zero_match_parameters[param].append(Title(title=value))
+                        continue
+                    case "assignee" | "creator":
+                        names, target, model = metadata.users, "users", User
                     case "project":
-                        filter_clause = {"project": {"name": {"eq": value}}}
+                        names, target, model = metadata.projects, "projects", Project
                     case "labels":
-                        filter_clause = {"labels": {"some": {"name": {"in": value}}}}
+                        names, target, model = metadata.labels, "issueLabels", Label
                     case _:
                         log.info(
                             f"{param} is not supported for query repair, skipping..."
                         )
                         continue
-                tasks.append(
-                    (
-                        param,
-                        value,
-                        asyncio.create_task(is_parameter_valid(filter_clause)),
-                    )
-                )
-
-        results = await asyncio.gather(*[task[2] for task in tasks])
-        for (param, value, _), result in zip(tasks, results):
-            if not result:
-                match param:
-                    case "title":
-                        zero_match_parameters[param].append(Title(title=value))
-                    case "assignee" | "creator":
-                        zero_match_parameters[param].append(User(name=value))
-                    case "project":
-                        zero_match_parameters[param].append(Project(name=value))
-                    case "labels":
-                        zero_match_parameters[param].append(Label(name=value))
-                    case _:
-                        raise ValueError(f"Unknown parameter: {param}")
+                if value in names:
+                    continue
+                if metadata.is_complete(target):
+                    zero_match_parameters[param].append(model(name=value))
+                else:
+                    unconfirmed.append((param, model(name=value), target, value))
+
+        found_ids: list[Optional[str]] = await asyncio.gather(
+            *[
+                self.get_id_by_filter(target=target, field="name", value=value)
+                for _, _, target, value in unconfirmed
+            ]
+        )
+        for (param, model_value, _, _), found_id in zip(unconfirmed, found_ids):
+            if found_id is None:
+                zero_match_parameters[param].append(model_value)
 
         return zero_match_parameters
 
-    async def _get_issues_with_boolean_clause(
-        self, issue_query: LinearIssueQuery
-    ) -> list[LinearIssue]:
-        variables = {}
+    async def iterate_issues(
+        self,
+        issue_filter: Optional[dict],
+        fields: str = LINEAR_ISSUE_FIELDS,
+        page_size: int = LINEAR_ISSUE_PAGE_SIZE,
+        limit: Optional[int] = LINEAR_ISSUE_RESULT_CAP,
+    ) -> AsyncIterator[LinearIssue]:
+        """Yields the issues matching the filter, following the pageInfo cursor until there are no more pages or limit issues have been yielded"""
         QUERY_OBJ_GROUP: str = "issues"
         QUERY_OBJ_LIST: str = "nodes"
-        boolean_clause: str = "and" if issue_query.use_and_clause else "or"
         query = gql(
             f"""
-            query GetIssues($filter: IssueFilter) {{
-                {QUERY_OBJ_GROUP}(filter: $filter) {{
-                    {QUERY_OBJ_LIST}{{
-                        id
-                        number
-                        title
-                        description
-                        priority
-                        estimate
-                        state {{ name }}
-                        assignee {{ name }}
-                        creator {{ name }}
-                        labels {{ nodes {{ name }} }}
-                        createdAt
-                        updatedAt
-                        dueDate
-                        cycle {{ number }}
-                        project {{ name }}
-                        comments {{ nodes {{ body user {{ name }} }} }}
-                        url
+            query GetIssuesPage($filter: IssueFilter, $first: Int, $after: String) {{
+                {QUERY_OBJ_GROUP}(filter: $filter, first: $first, after: $after) {{
+                    {QUERY_OBJ_LIST} {{
+                        {fields}
                     }}
+                    pageInfo {{ hasNextPage endCursor }}
                 }}
             }}
             """
         )
+        cursor: Optional[str] = None
+        yielded: int = 0
+        while True:
+            first: int = page_size if limit is None else min(page_size, limit - yielded)
+            result: dict = await self.execute(
+                query,
+                variable_values={
+                    "filter": issue_filter,
+                    "first": first,
+                    "after": cursor,
+                },
+            )
+            page: dict = result[QUERY_OBJ_GROUP]
+            for issue in page[QUERY_OBJ_LIST]:
+                yield await _flatten_linear_response_issue(issue)
+                yielded += 1
+            if not page["pageInfo"]["hasNextPage"]:
+                return
+            if limit is not None and yielded >= limit:
+                log.warning(f"Issue query matched more than {limit} issues, truncating")
+                return
+            cursor = page["pageInfo"]["endCursor"]
+
+    async def _get_issues_with_boolean_clause(
+        self, issue_query: LinearIssueQuery, fields: str = LINEAR_ISSUE_FIELDS
+    ) -> list[LinearIssue]:
+        variables = {}
+        boolean_clause: str = "and" if issue_query.use_and_clause else "or"
         variables["filter"] = {boolean_clause: []}
 
         if issue_query.title:
@@ -417,86 +656,120 @@ class LinearClient:
             variables["filter"][boolean_clause].extend(
                 [{"estimate": {"eq": _estimate}} for _estimate in issue_query.estimate]
             )
-        get_issue_results = await self.client.execute_async(
-            query, variable_values=variables
-        )
-        flatten_issue_tasks = [
-            asyncio.create_task(_flatten_linear_response_issue(result))
-            for result in get_issue_results[QUERY_OBJ_GROUP][QUERY_OBJ_LIST]
+        return [
+            issue
+            async for issue in self.iterate_issues(
+                issue_filter=variables["filter"], fields=fields
+            )
         ]
-        flattened_issue_results: list[LinearIssue] = await asyncio.gather(
-            *flatten_issue_tasks
-        )
-
-        return flattened_issue_results
 
     async def update_issues(
         self, request: LinearFilterIssuesRequest
-    ) -> list[LinearIssue]:
-        variables = {}
+    ) -> list[LinearIssueUpdateResult]:
+        """Applies the update of the request to every matching issue, returning the outcome of each issue so that one failure does not fail the others.
 
+        The update is resolved once and dispatched as immutable per-issue payloads through execute_batch, which bounds concurrency and retries rate-limited batches.
+        """
         # We dont need to repair the query if we using issue_ids as the filter condition
         if not request.issue_ids:
             request.query = await self._repair_issue_query(query=request.query)
-        issues_to_update = await self.get_issues(request=request)
-
-        mutation_name: str = "issueUpdate"
-        mutation = _get_update_mutation(mutation_name=mutation_name)
-
-        update_issue_tasks = []
-        for issue in issues_to_update:
-            variables["id"] = issue.id
-            variables["update"] = {}
-            if isinstance(request, LinearUpdateIssuesStateRequest):
-                variables["update"]["stateId"] = await self.get_state_id_by_name(
-                    state=request.updated_state
-                )
-            elif isinstance(request, LinearUpdateIssuesAssigneeRequest):
-                variables["update"]["assigneeId"] = await self.get_id_by_name(
-                    name=request.updated_assignee, target="users"
-                )
-            elif isinstance(request, LinearUpdateIssuesTitleRequest):
-                variables["update"]["title"] = request.updated_title
-            elif isinstance(request, LinearUpdateIssuesDescriptionRequest):
-                variables["update"]["description"] = request.updated_description
-            elif isinstance(request, LinearUpdateIssuesLabelsRequest):
-                variables["update"]["labelIds"] = [
-                    await self.get_label_id_by_name(name=label)
+        issues_to_update = await self.get_issues(request=request, fields="id")
+
+        # The update is the same for every issue, so ids are resolved once
+        update: dict = {}
+        if isinstance(request, LinearUpdateIssuesStateRequest):
+            update["stateId"] = await self.get_state_id_by_name(
+                state=request.updated_state
+            )
+        elif isinstance(request, LinearUpdateIssuesAssigneeRequest):
+            update["assigneeId"] = await self.get_id_by_name(
+                name=request.updated_assignee, target="users"
+            )
+        elif isinstance(request, LinearUpdateIssuesTitleRequest):
+            update["title"] = request.updated_title
+        elif isinstance(request, LinearUpdateIssuesDescriptionRequest):
+            update["description"] = request.updated_description
+        elif isinstance(request, LinearUpdateIssuesLabelsRequest):
+            label_ids: list[Optional[str]] = await asyncio.gather(
+                *[
+                    self.get_label_id_by_name(name=label)
                     for label in request.updated_labels
                 ]
-            elif isinstance(request, LinearUpdateIssuesCycleRequest):
-                variables["update"]["cycleId"] = await self.get_id_by_number(
-                    number=request.updated_cycle, target="cycles"
+            )
+            update["labelIds"] = [
+                label_id for label_id in label_ids if label_id is not None
+            ] or None
+        elif isinstance(request, LinearUpdateIssuesCycleRequest):
+            update["cycleId"] = await self.get_id_by_number(
+                number=request.updated_cycle, target="cycles"
+            )
+        elif isinstance(request, LinearUpdateIssuesProjectRequest):
+            update["projectId"] = await self.get_id_by_name(
+                name=request.updated_project, target="projects"
+            )
+        elif isinstance(request, LinearUpdateIssuesEstimateRequest):
+            update["estimate"] = request.updated_estimate
+        else:
+            raise ValueError(f"Unsupported request type: {type(request)}")
+
+        # Ids that could not be resolved would be sent as explicit nulls and clear the field, so they are left out like in create_issue
+        update = {k: v for k, v in update.items() if v is not None}
+        if not update:
+            log.warning(
+                f"Nothing to update for {type(request).__name__}: the requested value could not be resolved"
+            )
+            return [
+                LinearIssueUpdateResult(
+                    issue_id=issue.id,
+                    success=False,
+                    error="The requested value does not exist in the workspace",
                 )
-            elif isinstance(request, LinearUpdateIssuesProjectRequest):
-                variables["update"]["projectId"] = await self.get_id_by_name(
-                    name=request.updated_project, target="projects"
+                for issue in issues_to_update
+            ]
+
+        update_issue_results = await self.execute_batch(
+            operation_type="mutation",
+            field="issueUpdate",
+            arguments={"id": "String!", "input": "IssueUpdateInput!"},
+            selection=f"success issue {{ {LINEAR_ISSUE_FIELDS} }}",
+            variables=[
+                {"id": issue.id, "input": dict(update)} for issue in issues_to_update
+            ],
+        )
+
+        results: list[LinearIssueUpdateResult] = []
+        for issue, (data, error) in zip(issues_to_update, update_issue_results):
+            if error or not data or not data.get("success") or not data.get("issue"):
+                results.append(
+                    LinearIssueUpdateResult(
+                        issue_id=issue.id,
+                        success=False,
+                        error=error or "Linear did not apply the update",
+                    )
                 )
-            elif isinstance(request, LinearUpdateIssuesEstimateRequest):
-                variables["update"]["estimate"] = request.updated_estimate
-            else:
-                raise ValueError(f"Unsupported request type: {type(request)}")
-
-            update_issue_tasks.append(
-                asyncio.create_task(
-                    self.client.execute_async(mutation, variable_values=variables)
+                continue
+            results.append(
+                LinearIssueUpdateResult(
+                    issue_id=issue.id,
+                    success=True,
+                    issue=await _flatten_linear_response_issue(data["issue"]),
                 )
             )
 
-        update_issue_results = await asyncio.gather(*update_issue_tasks)
-
-        flatten_issue_tasks = [
-            asyncio.create_task(
-                _flatten_linear_response_issue(result[mutation_name]["issue"])
-            )
-            for result in update_issue_results
+        failed: list[LinearIssueUpdateResult] = [
+            result for result in results if not result.success
         ]
-
-        flatten_issue_results: list[LinearIssue] = await asyncio.gather(
-            *flatten_issue_tasks
+        if failed:
+            log.warning(
+                f"Failed to update {len(failed)} of {len(results)} Linear issues: "
+                + ", ".join(f"{result.issue_id}: {result.error}" for result in failed)
+            )
+        record_issues(
+            headers=self.headers,
+            issues=[result.issue for result in results if result.success],
         )
-
-        return flatten_issue_results
+        refresh_mirror(url=LINEAR_API_URL, headers=self.headers)
+        return results
 
     async def delete_issues(
         self, request: LinearDeleteIssuesRequest
@@ -505,27 +778,28 @@ class LinearClient:
         # We dont need to repair the query if we using issue_ids as the filter condition
         if not request.issue_ids:
             request.query = await self._repair_issue_query(query=request.query)
-        issues_to_delete = await self.get_issues(request=request)
-
-        MUTATION_NAME: str = "issueDelete"
-        mutation = gql(
-            f"""
-            mutation DeleteIssue($id: String!) {{
-                {MUTATION_NAME}(id: $id) {{
-                    success
-                }}
-            }}
-            """
+        issues_to_delete = await self.get_issues(
+            request=request, fields=LINEAR_ISSUE_SUMMARY_FIELDS
         )
 
-        delete_issue_tasks = [
-            asyncio.create_task(
-                self.client.execute_async(mutation, variable_values={"id": issue.id})
-            )
-            for issue in issues_to_delete
-        ]
-
-        await asyncio.gather(*delete_issue_tasks)
+        delete_issue_results = await self.execute_batch(
+            operation_type="mutation",
+            field="issueDelete",
+            arguments={"id": "String!"},
+            selection="success",
+            variables=[{"id": issue.id} for issue in issues_to_delete],
+        )
+        _raise_batch_errors(
+            operation="delete",
+            issue_ids=[issue.id for issue in issues_to_delete],
+            results=delete_issue_results,
+        )
+        remove_issues(
+            headers=self.headers, issue_ids=[issue.id for issue in issues_to_delete]
+        )
+        await remove_mirrored_issues(
+            headers=self.headers, issue_ids=[issue.id for issue in issues_to_delete]
+        )
 
         return issues_to_delete
 
@@ -536,122 +810,94 @@ class LinearClient:
         if not name:
             return None
 
-        query = f"""
-        query GetIdByName($name: String!) {{
-            {target}(filter: {{ name: {{ eq: $name }} }}) {{
-                nodes {{
-                    id
-                }}
-            }}
-        }}
-        """
-
-        variables = {"name": name}
-        payload = {"query": query, "variables": variables}
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                LINEAR_API_URL, json=payload, headers=self.headers
-            )
-
-        result = response.json()
-        users = result.get("data", {}).get(target, {}).get("nodes", [])
-
-        if users:
-            return users[0]["id"]
+        def lookup(metadata: LinearWorkspaceMetadata) -> Optional[str]:
+            match target:
+                case "users":
+                    return metadata.users.get(name)
+                case "projects":
+                    return metadata.projects.get(name)
+                case "issueLabels":
+                    return metadata.labels.get(name)
+                case "teams":
+                    return next(
+                        (team.id for team in metadata.teams if team.name == name), None
+                    )
+                case _:
+                    raise ValueError(f"Unsupported target: {target}")
 
-        return None
+        entity_id, metadata = await self._resolve_id(lookup=lookup)
+        if entity_id is None and not metadata.is_complete(target):
+            return await self.get_id_by_filter(target=target, field="name", value=name)
+        return entity_id
 
     async def get_id_by_number(
         self, number: Optional[int], target: str
     ) -> Optional[str]:
         if not number:
             return None
-
-        query = f"""
-        query GetIdByNumber($number: Float!) {{
-            {target}(filter: {{ number: {{ eq: $number }} }}) {{
-                nodes {{
-                    id
-                }}
-            }}
-        }}
-        """
-
-        variables = {"number": number}
-        payload = {"query": query, "variables": variables}
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                LINEAR_API_URL, json=payload, headers=self.headers
+        if target != "cycles":
+            raise ValueError(f"Unsupported target: {target}")
+        entity_id, metadata = await self._resolve_id(
+            lookup=lambda metadata: metadata.cycles.get(int(number))
+        )
+        if entity_id is None and not metadata.is_complete(target):
+            return await self.get_id_by_filter(
+                target=target, field="number", value=number
             )
-
-        result = response.json()
-        cycles = result.get("data", {}).get(target, {}).get("nodes", [])
-
-        if cycles:
-            return cycles[0]["id"]
-        return None
+        return entity_id
 
     async def get_state_id_by_name(self, state: Optional[State]) -> Optional[str]:
         if not state:
             return None
-
-        name: str = state.value
-        query = """
-        query GetStateIdByName {
-            workflowStates {
-                nodes {
-                    id
-                    name
-                }
-            }
-        }
-        """
-
-        payload = {"query": query}
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                LINEAR_API_URL, json=payload, headers=self.headers
+        entity_id, metadata = await self._resolve_id(
+            lookup=lambda metadata: metadata.states.get(state.value)
+        )
+        if entity_id is None and not metadata.is_complete("workflowStates"):
+            return await self.get_id_by_filter(
+                target="workflowStates", field="name", value=state.value
             )
-
-        result = response.json()
-        states = result.get("data", {}).get("workflowStates", {}).get("nodes", [])
-
-        for workflow_state in states:
-            if workflow_state["name"] == name:
-                return workflow_state["id"]
-
-        return None
-
-    async def get_label_id_by_name(self, name: Optional[str]) -> Optional[str]:
-        if not name:
-            return None
-        query = """
-        query GetLabelIdByName($name: String!) {
-            issueLabels(filter: { name: { eq: $name } }) {
-                nodes {
-                    id
-                    name
-                }
-            }
-        }
-        """
-
-        variables = {"name": name}
-        payload = {"query": query, "variables": variables}
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                LINEAR_API_URL, json=payload, headers=self.headers
+        return entity_id
+
+    async def _resolve_id(
+        self, lookup: Callable[[LinearWorkspaceMetadata], Optional[str]]
+    ) -> tuple[Optional[str], LinearWorkspaceMetadata]:
+        """Looks up an id in the cached workspace metadata. On a miss the metadata is refetched once, so that entities created since it was cached resolve"""
+        metadata: LinearWorkspaceMetadata = await self.workspace_metadata()
+        entity_id: Optional[str] = lookup(metadata)
+        if entity_id is None:
+            metadata = await refresh_workspace_metadata(
+                url=LINEAR_API_URL, headers=self.headers, stale=metadata
             )
+            entity_id = lookup(metadata)
+        return entity_id, metadata
 
-        result = response.json()
-        labels = result.get("data", {}).get("issueLabels", {}).get("nodes", [])
-
-        if labels:
-            return labels[0]["id"]
+    async def get_label_id_by_name(self, name: Optional[str]) -> Optional[str]:
+        return await self.get_id_by_name(name=name, target="issueLabels")
 
-        return None
+    async def get_id_by_filter(
+        self, target: str, field: str, value: str | int
+    ) -> Optional[str]:
+        """Looks up the first entity whose field equals the value. Only needed for collections too long to be held in the workspace metadata"""
+        value_type: str = "Float!" if isinstance(value, int) else "String!"
+        response = await get_httpx_client().post(
+            LINEAR_API_URL,
+            json={
+                "query": f"""
+                    query GetIdByFilter($value: {value_type}) {{
+                        {target}(filter: {{ {field}: {{ eq: $value }} }}, first: 1) {{
+                            nodes {{ id }}
+                        }}
+                    }}
+                """,
+                "variables": {"value": value},
+            },
+            headers=self.headers,
+        )
+        result: dict = response.json()
+        if "errors" in result:
+            raise Exception(result["errors"])
+        nodes: list[dict] = result["data"][target]["nodes"]
+        return nodes[0]["id"] if nodes else None
 
     ###
     ### Repair
@@ -662,59 +908,48 @@ class LinearClient:
         """Repairs the query parameters by returning the most likely candidate"""
         if not query:
             return None
-        zero_match_parameters_task = asyncio.create_task(
-            self.get_zero_match_issue_query_parameters(query=query)
+        # Served from the local issue index and workspace metadata, without a probe query per value
+        zero_match_parameters = await self.get_zero_match_issue_query_parameters(
+            query=query
         )
-        possible_titles_task = asyncio.create_task(self.titles())
-        possible_users_task = asyncio.create_task(self.users())
-        possible_projects_task = asyncio.create_task(self.projects())
-        possible_labels_task = asyncio.create_task(self.labels())
-        zero_match_parameters, titles, users, projects, labels = await asyncio.gather(
-            zero_match_parameters_task,
-            possible_titles_task,
-            possible_users_task,
-            possible_projects_task,
-            possible_labels_task,
+        if not zero_match_parameters:
+            return query
+        index, metadata = await asyncio.gather(
+            self.issue_index(), self.workspace_metadata()
         )
-        possible_titles: list[str] = [_title.title for _title in titles]
-        possible_users: list[str] = [_user.name for _user in users]
-        possible_projects: list[str] = [_project.name for _project in projects]
-        possible_labels: list[str] = [_label.name for _label in labels]
+        # The fuzzy indexes are cached alongside the index and metadata. Parameters repaired against the same candidates are grouped,
+        # so that every value of a group (e.g. assignees and creators) is scored in a single pass rather than one scan per value
+        matcher_groups: list[tuple[FuzzyIndex, list[str]]] = [
+            (index.title_matcher, ["title"]),
+            (metadata.user_matcher, ["assignee", "creator"]),
+            (metadata.project_matcher, ["project"]),
+            (metadata.label_matcher, ["labels"]),
+        ]
+        supported_params: set[str] = {
+            param for _, params in matcher_groups for param in params
+        }
+        targets: dict[str, list[str]] = {}
         for param, value_lst in zero_match_parameters.items():
-            for value in value_lst:
-                match param:
-                    case "title":
-                        best_match_title: str = get_most_similar_string(
-                            target=value.title, candidates=possible_titles
-                        )
-                        query.title.append(best_match_title)
-                        query.title.remove(value.title)
-                    case "assignee":
-                        best_match_assignee: str = get_most_similar_string(
-                            target=value.name, candidates=possible_users
-                        )
-                        query.assignee.append(best_match_assignee)
-                        query.assignee.remove(value.name)
-                    case "creator":
-                        best_match_creator: str = get_most_similar_string(
-                            target=value.name, candidates=possible_users
-                        )
-                        query.creator.append(best_match_creator)
-                        query.creator.remove(value.name)
-                    case "project":
-                        best_match_project: str = get_most_similar_string(
-                            target=value.name, candidates=possible_projects
-                        )
-                        query.project.append(best_match_project)
-                        query.project.remove(value.name)
-                    case "labels":
-                        best_match_labels: str = get_most_similar_string(
-                            target=value.name, candidates=possible_labels
-                        )
-                        query.labels.append(best_match_labels)
-                        query.labels.remove(value.name)
-                    case _:
-                        raise ValueError(f"Unknown parameter: {param}")
+            if param not in supported_params:
+                raise ValueError(f"Unknown parameter: {param}")
+            targets[param] = [
+                value.title if param == "title" else value.name for value in value_lst
+            ]
+
+        for matcher, params in matcher_groups:
+            group_targets: list[str] = [
+                target for param in params for target in targets.get(param, [])
+            ]
+            if not group_targets:
+                continue
+            best_matches: dict[str, Optional[str]] = dict(
+                zip(group_targets, matcher.best_match_many(group_targets))
+            )
+            for param in params:
+                query_values: list = getattr(query, param)
+                for target in targets.get(param, []):
+                    query_values.append(best_matches[target])
+                    query_values.remove(target)
 
         return query
 
@@ -738,36 +973,52 @@ async def _flatten_linear_response_issue(issue: dict) -> LinearIssue:
     if "creator" in issue and issue["creator"]:
         issue["creator"] = issue["creator"]["name"]
 
-    return LinearIssue.model_validate(issue)
-
-
-def _get_update_mutation(mutation_name: str) -> str:
-    mutation = gql(
-        f"""
-        mutation UpdateIssueState($id: String!, $update: IssueUpdateInput!) {{
-            {mutation_name}(id: $id, input: $update) {{
-                success
-                issue {{
-                    id
-                    number
-                    title
-                    description
-                    priority
-                    estimate
-                    state {{ name }}
-                    assignee {{ name }}
-                    creator {{ name }}
-                    labels {{ nodes {{ name }} }}
-                    createdAt
-                    updatedAt
-                    dueDate
-                    cycle {{ number }}
-                    project {{ name }}
-                    comments {{ nodes {{ body user {{ name }} }} }}
-                    url
-                }}
-            }}
-        }}
-        """
+    # Fields outside the selected projection are returned as None
+    return LinearIssue.model_validate(
+        {field: None for field in LinearIssue.model_fields} | issue
+    )
+
+
+def _build_aliased_document(
+    operation_type: str,
+    field: str,
+    arguments: dict[str, str],
+    selection: str,
+    count: int,
+) -> str:
+    """Composes count aliased calls of field into a single document, e.g. op0: issueDelete(id: $id0) { success } op1: issueDelete(id: $id1) { success }"""
+    variable_definitions: str = ", ".join(
+        f"${argument}{index}: {argument_type}"
+        for index in range(count)
+        for argument, argument_type in arguments.items()
     )
-    return mutation
+    fields: str = "\n".join(
+        f"{BATCH_ALIAS_PREFIX}{index}: {field}("
+        + ", ".join(f"{argument}: ${argument}{index}" for argument in arguments)
+        + f") {{ {selection} }}"
+        for index in range(count)
+    )
+    return f"{operation_type} Batch{field[0].upper()}{field[1:]}({variable_definitions}) {{\n{fields}\n}}"
+
+
+def _is_rate_limited(errors: list[dict]) -> bool:
+    return any(
+        (error.get("extensions") or {}).get("code") == "RATELIMITED" for error in errors
+    )
+
+
+def _raise_batch_errors(
+    operation: str,
+    issue_ids: list[str],
+    results: list[tuple[Optional[dict], Optional[str]]],
+):
+    failures: list[str] = [
+        f"{issue_id}: {error}"
+        for issue_id, (_, error) in zip(issue_ids, results)
+        if error
+    ]
+    if failures:
+        raise Exception(
+            f"Failed to {operation} {len(failures)} of {len(issue_ids)} issues: "
+            + ", ".join(failures)
+        )
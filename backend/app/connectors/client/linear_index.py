@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from app.connectors.client.linear_metadata import workspace_cache_key
+from app.connectors.http import get_httpx_client
+from app.models.integrations.linear import LinearIssue
+from app.utils.cache import TTLCache
+from app.utils.levenshtein import MATCH_THRESHOLDS, FuzzyIndex, MatchEntity
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+# The index is incrementally synced at most once per interval. Idle workspaces are evicted after the ttl
+LINEAR_INDEX_SYNC_INTERVAL = float(os.environ.get("LINEAR_INDEX_SYNC_INTERVAL", 30))
+LINEAR_INDEX_TTL = float(os.environ.get("LINEAR_INDEX_TTL", 3600))
+LINEAR_INDEX_CACHE_MAX_SIZE = int(os.environ.get("LINEAR_INDEX_CACHE_MAX_SIZE", 64))
+LINEAR_INDEX_PAGE_SIZE = 250  # Maximum page size allowed by the Linear API
+
+ISSUE_TITLES_QUERY = """
+query IssueTitles($filter: IssueFilter, $first: Int, $after: String) {
+    issues(filter: $filter, first: $first, after: $after, orderBy: updatedAt) {
+        nodes { id title updatedAt }
+        pageInfo { hasNextPage endCursor }
+    }
+}
+"""
+
+
+class LinearIssueIndex:
+    """Local copy of the id and title of every issue in a workspace, kept up to date through the updatedAt cursor"""
+
+    def __init__(self):
+        self.titles: dict[str, str] = {}
+        self.synced_until: Optional[str] = None  # Latest updatedAt seen
+        self.synced_at: float = 0.0
+        self.lock = asyncio.Lock()
+        self._title_matcher: Optional[FuzzyIndex] = None
+
+    @property
+    def needs_sync(self) -> bool:
+        return time.monotonic() - self.synced_at > LINEAR_INDEX_SYNC_INTERVAL
+
+    @property
+    def title_matcher(self) -> FuzzyIndex:
+        """Fuzzy index over the titles, rebuilt on first use after the titles change"""
+        if self._title_matcher is None:
+            self._title_matcher = FuzzyIndex(
+                self.titles.values(), threshold=MATCH_THRESHOLDS[MatchEntity.TITLE]
+            )
+        return self._title_matcher
+
+    def apply(self, issues: list[dict], advance_cursor: bool = True):
+        for issue in issues:
+            if issue.get("id") is None or issue.get("title") is None:
+                continue
+            if self.titles.get(issue["id"]) != issue["title"]:
+                self._title_matcher = None
+            self.titles[issue["id"]] = issue["title"]
+            if not advance_cursor:
+                continue
+            updated_at: Optional[str] = issue.get("updatedAt")
+            # ISO 8601 timestamps in the same timezone compare correctly as strings
+            if updated_at and (not self.synced_until or updated_at > self.synced_until):
+                self.synced_until = updated_at
+
+    def remove(self, issue_ids: list[str]):
+        for issue_id in issue_ids:
+            if self.titles.pop(issue_id, None) is not None:
+                self._title_matcher = None
+
+    def has_title_containing(self, value: str) -> bool:
+        return any(value in title for title in self.titles.values())
+
+
+# Keyed the same way as the workspace metadata cache
+issue_index_cache = TTLCache(max_size=LINEAR_INDEX_CACHE_MAX_SIZE, ttl=LINEAR_INDEX_TTL)
+
+
+async def get_issue_index(url: str, headers: dict[str, str]) -> LinearIssueIndex:
+    """Returns the issue index of the workspace, first fetching the issues updated since the last sync if it is older than the sync interval.
+
+    Only the first call for a workspace pages through every issue. Later calls only transfer the issues that changed, so lookups do not grow with the workspace.
+    """
+    key: str = workspace_cache_key(headers)
+    index: Optional[LinearIssueIndex] = issue_index_cache.get(key)
+    if index is None:
+        index = LinearIssueIndex()
+        issue_index_cache.set(key, index)
+    if not index.needs_sync:
+        return index
+
+    async with index.lock:
+        # Another coroutine may have synced the index while this one was waiting
+        if index.needs_sync:
+            await _sync_issue_index(index=index, url=url, headers=headers)
+    return index
+
+
+def record_issues(headers: dict[str, str], issues: list[LinearIssue]):
+    """Applies issues created or updated by this process to the index, so that it does not have to wait for the next sync.
+
+    The cursor is left alone, since changes made elsewhere before these issues may not have been synced yet.
+    """
+    index: Optional[LinearIssueIndex] = issue_index_cache.get(
+        workspace_cache_key(headers)
+    )
+    if index is not None:
+        index.apply([issue.model_dump() for issue in issues], advance_cursor=False)
+
+
+def remove_issues(headers: dict[str, str], issue_ids: list[str]):
+    """Removes deleted issues from the index. Deletions are not visible through the updatedAt cursor"""
+    index: Optional[LinearIssueIndex] = issue_index_cache.get(
+        workspace_cache_key(headers)
+    )
+    if index is not None:
+        index.remove(issue_ids)
+
+
+async def _sync_issue_index(index: LinearIssueIndex, url: str, headers: dict[str, str]):
+    started_at: float = time.monotonic()
+    issue_filter: Optional[dict] = (
+        {"updatedAt": {"gte": index.synced_until}} if index.synced_until else None
+    )
+    cursor: Optional[str] = None
+    synced: int = 0
+    while True:
+        response = await get_httpx_client().post(
+            url,
+            json={
+                "query": ISSUE_TITLES_QUERY,
+                "variables": {
+                    "filter": issue_filter,
+                    "first": LINEAR_INDEX_PAGE_SIZE,
+                    "after": cursor,
+                },
+            },
+            headers=headers,
+        )
+        result: dict = response.json()
+        if "errors" in result:
+            raise Exception(result["errors"])
+        page: dict = result["data"]["issues"]
+        index.apply(page["nodes"])
+        synced += len(page["nodes"])
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        cursor = page["pageInfo"]["endCursor"]
+    index.synced_at = started_at
+    log.info(f"Synced {synced} issues into the Linear issue index")
@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from functools import cached_property
+from typing import Optional
+
+from app.connectors.http import get_httpx_client
+from app.models.integrations.linear import Team
+from app.utils.cache import TTLCache
+from app.utils.levenshtein import MATCH_THRESHOLDS, FuzzyIndex, MatchEntity
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+# Metadata younger than the ttl is served as is. Older metadata is still served for up to the stale ttl while it is refreshed in the background
+LINEAR_METADATA_TTL = float(os.environ.get("LINEAR_METADATA_TTL", 300))
+LINEAR_METADATA_STALE_TTL = float(os.environ.get("LINEAR_METADATA_STALE_TTL", 3600))
+LINEAR_METADATA_CACHE_MAX_SIZE = int(
+    os.environ.get("LINEAR_METADATA_CACHE_MAX_SIZE", 256)
+)
+LINEAR_METADATA_PAGE_SIZE = 250  # Maximum page size allowed by the Linear API
+# Collections longer than this many pages are cut off, and names missing from them are looked up with a filtered query instead
+LINEAR_METADATA_MAX_PAGES = int(os.environ.get("LINEAR_METADATA_MAX_PAGES", 20))
+
+# The node fields fetched for each collection
+METADATA_CONNECTIONS: dict[str, str] = {
+    "workflowStates": "id name",
+    "users": "id name",
+    "issueLabels": "id name",
+    "projects": "id name",
+    "cycles": "id number",
+    "teams": "id name",
+}
+
+
+def _connection_page(connection: str, after: str = "") -> str:
+    fields: str = METADATA_CONNECTIONS[connection]
+    return f"{connection}(first: {LINEAR_METADATA_PAGE_SIZE}{after}) {{ nodes {{ {fields} }} pageInfo {{ hasNextPage endCursor }} }}"
+
+
+# The first page of every collection is fetched in a single query, and only the longer collections are paged further
+WORKSPACE_METADATA_QUERY = (
+    "query WorkspaceMetadata {\n"
+    + "\n".join(f"    {_connection_page(c)}" for c in METADATA_CONNECTIONS)
+    + "\n}"
+)
+
+
+class LinearWorkspaceMetadata:
+    """Name to id maps of the workspace entities that issues refer to"""
+
+    def __init__(self, data: dict, truncated: frozenset[str] = frozenset()):
+        self.fetched_at: float = time.monotonic()
+        # Collections cut off at LINEAR_METADATA_MAX_PAGES, in which a missing name does not mean that the entity does not exist
+        self.truncated: frozenset[str] = truncated
+        self.states: dict[str, str] = _name_to_id(data["workflowStates"]["nodes"])
+        self.users: dict[str, str] = _name_to_id(data["users"]["nodes"])
+        self.labels: dict[str, str] = _name_to_id(data["issueLabels"]["nodes"])
+        self.projects: dict[str, str] = _name_to_id(data["projects"]["nodes"])
+        self.cycles: dict[int, str] = {}
+        for cycle in data["cycles"]["nodes"]:
+            self.cycles.setdefault(int(cycle["number"]), cycle["id"])
+        self.teams: list[Team] = [
+            Team.model_validate(team) for team in data["teams"]["nodes"]
+        ]
+
+    def is_complete(self, connection: str) -> bool:
+        return connection not in self.truncated
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.monotonic() - self.fetched_at < LINEAR_METADATA_TTL
+
+    # Metadata is replaced rather than mutated, so each fuzzy index is built at most once per fetch
+    @cached_property
+    def user_matcher(self) -> FuzzyIndex:
+        return FuzzyIndex(self.users, threshold=MATCH_THRESHOLDS[MatchEntity.USER])
+
+    @cached_property
+    def project_matcher(self) -> FuzzyIndex:
+        return FuzzyIndex(
+            self.projects, threshold=MATCH_THRESHOLDS[MatchEntity.PROJECT]
+        )
+
+    @cached_property
+    def label_matcher(self) -> FuzzyIndex:
+        return FuzzyIndex(self.labels, threshold=MATCH_THRESHOLDS[MatchEntity.LABEL])
+
+
+# Keyed by a hash of the access token, so that every workspace (and user) only sees the entities its token can access
+workspace_metadata_cache = TTLCache(
+    max_size=LINEAR_METADATA_CACHE_MAX_SIZE, ttl=LINEAR_METADATA_STALE_TTL
+)
+_pending_fetches: dict[str, asyncio.Task] = {}
+
+
+async def get_workspace_metadata(
+    url: str, headers: dict[str, str]
+) -> LinearWorkspaceMetadata:
+    """Returns the cached metadata of the workspace, fetching it in a single query on a miss and revalidating it in the background once it is stale"""
+    key: str = workspace_cache_key(headers)
+    metadata: Optional[LinearWorkspaceMetadata] = workspace_metadata_cache.get(key)
+    if metadata is not None:
+        if not metadata.is_fresh and key not in _pending_fetches:
+            log.info("Linear workspace metadata is stale. Revalidating in background.")
+            _start_fetch(key=key, url=url, headers=headers)
+        return metadata
+
+    # Concurrent misses for the same workspace share a single fetch
+    task: asyncio.Task = _pending_fetches.get(key) or _start_fetch(
+        key=key, url=url, headers=headers
+    )
+    return await asyncio.shield(task)
+
+
+def invalidate_workspace_metadata(headers: dict[str, str]):
+    workspace_metadata_cache.invalidate(workspace_cache_key(headers))
+
+
+async def refresh_workspace_metadata(
+    url: str, headers: dict[str, str], stale: LinearWorkspaceMetadata
+) -> LinearWorkspaceMetadata:
+    """Refetches the metadata after a name failed to resolve against it, since the entity may have been created after it was cached.
+
+    Callers that missed against the same metadata share one refetch, and callers whose metadata was already replaced get the newer one without a refetch.
+    """
+    key: str = workspace_cache_key(headers)
+    metadata: Optional[LinearWorkspaceMetadata] = workspace_metadata_cache.get(key)
+    if metadata is not None and metadata is not stale:
+        return metadata
+
+    log.info("Name not found in the Linear workspace metadata. Refetching it.")
+    workspace_metadata_cache.invalidate(key)
+    task: asyncio.Task = _pending_fetches.get(key) or _start_fetch(
+        key=key, url=url, headers=headers
+    )
+    return await asyncio.shield(task)
+
+
+def _start_fetch(key: str, url: str, headers: dict[str, str]) -> asyncio.Task:
+    task: asyncio.Task = asyncio.create_task(
+        _fetch_workspace_metadata(key=key, url=url, headers=headers)
+    )
+    _pending_fetches[key] = task
+    task.add_done_callback(lambda done: _on_fetch_done(key=key, task=done))
+    return task
+
+
+def _on_fetch_done(key: str, task: asyncio.Task):
+    _pending_fetches.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        log.error(f"Error fetching Linear workspace metadata: {task.exception()}")
+
+
+async def _fetch_workspace_metadata(
+    key: str, url: str, headers: dict[str, str]
+) -> LinearWorkspaceMetadata:
+    data: dict = await _post_metadata_query(
+        url=url, headers=headers, query=WORKSPACE_METADATA_QUERY
+    )
+    truncated: list[bool] = await asyncio.gather(
+        *[
+            _fetch_remaining_pages(
+                url=url, headers=headers, connection=connection, page=data[connection]
+            )
+            for connection in METADATA_CONNECTIONS
+        ]
+    )
+    metadata = LinearWorkspaceMetadata(
+        data=data,
+        truncated=frozenset(
+            connection
+            for connection, is_truncated in zip(METADATA_CONNECTIONS, truncated)
+            if is_truncated
+        ),
+    )
+    workspace_metadata_cache.set(key, metadata)
+    return metadata
+
+
+async def _fetch_remaining_pages(
+    url: str, headers: dict[str, str], connection: str, page: dict
+) -> bool:
+    """Appends the nodes of the remaining pages of the collection to its first page, and returns whether it was cut off at the page limit"""
+    pages: int = 1
+    while page["pageInfo"]["hasNextPage"]:
+        if pages >= LINEAR_METADATA_MAX_PAGES:
+            log.warning(
+                f"Linear {connection} exceed {LINEAR_METADATA_MAX_PAGES} pages, looking up the rest by name"
+            )
+            return True
+        next_page: dict = (
+            await _post_metadata_query(
+                url=url,
+                headers=headers,
+                query=f"query WorkspaceMetadataPage($after: String) {{ {_connection_page(connection, after=', after: $after')} }}",
+                variables={"after": page["pageInfo"]["endCursor"]},
+            )
+        )[connection]
+        page["nodes"].extend(next_page["nodes"])
+        page["pageInfo"] = next_page["pageInfo"]
+        pages += 1
+    return False
+
+
+async def _post_metadata_query(
+    url: str, headers: dict[str, str], query: str, variables: Optional[dict] = None
+) -> dict:
+    response = await get_httpx_client().post(
+        url, json={"query": query, "variables": variables or {}}, headers=headers
+    )
+    result: dict = response.json()
+    if "errors" in result:
+        raise Exception(result["errors"])
+    return result["data"]
+
+
+def workspace_cache_key(headers: dict[str, str]) -> str:
+    return hashlib.sha256(headers["Authorization"].encode()).hexdigest()
+
+
+def _name_to_id(nodes: list[dict]) -> dict[str, str]:
+    # Keep the first entity of each name, matching the previous lookups which returned the first match
+    name_to_id: dict[str, str] = {}
+    for node in nodes:
+        name_to_id.setdefault(node["name"], node["id"])
+    return name_to_id
+
+
+def get_workspace_metadata_metrics() -> dict[str, float]:
+    return {
+        "linear_metadata_cache_hits_total": workspace_metadata_cache.hits,
+        "linear_metadata_cache_misses_total": workspace_metadata_cache.misses,
+        "linear_metadata_cache_entries": len(workspace_metadata_cache),
+    }
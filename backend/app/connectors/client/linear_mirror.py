@@ -0,0 +1,664 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, cast, func, or_, select, text, true, update
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.connectors.client.linear_metadata import workspace_cache_key
+from app.connectors.http import get_httpx_client
+from app.connectors.native.stores.linear import (
+    LinearEntityORM,
+    LinearIssueORM,
+    LinearSyncState,
+    LinearSyncStateORM,
+)
+from app.connectors.orm import Orm
+from app.models.integrations.linear import (
+    LinearGetIssuesRequest,
+    LinearIssue,
+    LinearIssueQuery,
+)
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+# The mirror needs the tables of migrations/002_linear_mirror.sql. It is stored in the main database unless a separate url is given
+LINEAR_MIRROR_ENABLED = (
+    os.environ.get("LINEAR_MIRROR_ENABLED", "false").lower() == "true"
+)
+LINEAR_MIRROR_DATABASE_URL = os.environ.get("LINEAR_MIRROR_DATABASE_URL")
+# Reads trigger a background incremental sync once the last one is older than the interval. With webhooks configured, this only catches missed events
+LINEAR_MIRROR_SYNC_INTERVAL = float(os.environ.get("LINEAR_MIRROR_SYNC_INTERVAL", 300))
+LINEAR_MIRROR_PAGE_SIZE = 100
+# Webhooks are signed with this secret. Events older than the tolerance are rejected as replays, unless it is 0
+LINEAR_WEBHOOK_SECRET = os.environ.get("LINEAR_WEBHOOK_SECRET")
+LINEAR_WEBHOOK_TOLERANCE = float(os.environ.get("LINEAR_WEBHOOK_TOLERANCE", 60))
+
+MIRROR_METADATA_QUERY = f"""
+query MirrorMetadata {{
+    organization {{ id }}
+    teams(first: 250) {{ nodes {{ id }} }}
+    workflowStates(first: 250) {{ nodes {{ id name }} }}
+    users(first: 250) {{ nodes {{ id name }} }}
+    issueLabels(first: 250) {{ nodes {{ id name }} }}
+    projects(first: 250) {{ nodes {{ id name }} }}
+    cycles(first: 250) {{ nodes {{ id number }} }}
+}}
+"""
+
+MIRROR_ISSUES_QUERY = """
+query MirrorIssues($filter: IssueFilter, $first: Int, $after: String) {
+    issues(filter: $filter, first: $first, after: $after, orderBy: updatedAt) {
+        nodes {
+            id
+            number
+            title
+            description
+            priority
+            estimate
+            state { name }
+            assignee { name }
+            creator { name }
+            labels { nodes { name } }
+            createdAt
+            updatedAt
+            dueDate
+            cycle { number }
+            project { name }
+            comments { nodes { body user { name } } }
+            url
+            team { id }
+        }
+        pageInfo { hasNextPage endCursor }
+    }
+}
+"""
+
+# Webhook entity types mirrored into linear_entity, and the issue column that holds their name
+ENTITY_KINDS: dict[str, str] = {
+    "WorkflowState": "state",
+    "IssueLabel": "label",
+    "User": "user",
+    "Project": "project",
+    "Cycle": "cycle",
+}
+ENTITY_ISSUE_COLUMNS: dict[str, list[str]] = {
+    "state": ["state"],
+    "user": ["assignee", "creator"],
+    "project": ["project"],
+}
+
+# Upserts never replace an issue with an older version of itself, e.g. a webhook delivered after a newer sync
+NOT_OLDER_THAN_STORED = text(
+    "linear_issue.updated_at IS NULL OR excluded.updated_at IS NULL OR linear_issue.updated_at <= excluded.updated_at"
+)
+
+_orm: Optional[Orm] = None
+_pending_syncs: dict[str, asyncio.Task] = {}
+_metrics: dict[str, float] = {
+    "linear_mirror_reads_total": 0,
+    "linear_mirror_fallbacks_total": 0,
+    "linear_mirror_synced_issues_total": 0,
+    "linear_mirror_webhooks_total": 0,
+}
+
+
+def _get_orm() -> Orm:
+    # Created on first use, so that importing the Linear client does not require a database
+    global _orm
+    if _orm is None:
+        _orm = Orm(url=LINEAR_MIRROR_DATABASE_URL)
+    return _orm
+
+
+async def get_mirrored_issues(
+    url: str,
+    headers: dict[str, str],
+    request: LinearGetIssuesRequest,
+    limit: Optional[int],
+) -> Optional[list[LinearIssue]]:
+    """Answers a read request from the local mirror, or returns None if the caller should query Linear instead.
+
+    The mirror cannot answer until the first sync of the token has completed (which is then started in the background), and empty or incomplete results also fall back to Linear,
+    since they may be caused by changes that have not reached the mirror yet.
+    """
+    if not LINEAR_MIRROR_ENABLED:
+        return None
+    workspace: str = workspace_cache_key(headers)
+    state: Optional[LinearSyncState] = await get_sync_state(workspace)
+    if state is None or state.synced_at is None:
+        _start_sync(workspace=workspace, url=url, headers=headers)
+        _metrics["linear_mirror_fallbacks_total"] += 1
+        return None
+    if datetime.now(timezone.utc) - state.synced_at > timedelta(
+        seconds=LINEAR_MIRROR_SYNC_INTERVAL
+    ):
+        _start_sync(workspace=workspace, url=url, headers=headers)
+
+    issues: list[LinearIssue] = await _query_issues(
+        state=state, request=request, limit=limit
+    )
+    incomplete: bool = bool(request.issue_ids) and len(issues) < len(
+        set(request.issue_ids)
+    )
+    if not issues or incomplete:
+        _metrics["linear_mirror_fallbacks_total"] += 1
+        return None
+    _metrics["linear_mirror_reads_total"] += 1
+    return issues
+
+
+def refresh_mirror(url: str, headers: dict[str, str]):
+    """Starts a background incremental sync, e.g. after this process changed issues, so that the change does not wait for a webhook or the sync interval"""
+    if LINEAR_MIRROR_ENABLED:
+        _start_sync(workspace=workspace_cache_key(headers), url=url, headers=headers)
+
+
+async def remove_mirrored_issues(headers: dict[str, str], issue_ids: list[str]):
+    """Removes deleted issues from the mirror. Deletions are not visible through the updatedAt cursor"""
+    if not LINEAR_MIRROR_ENABLED or not issue_ids:
+        return
+    state: Optional[LinearSyncState] = await get_sync_state(
+        workspace_cache_key(headers)
+    )
+    if state is not None:
+        await _delete_issues(organization_id=state.organization_id, issue_ids=issue_ids)
+
+
+async def get_sync_state(workspace: str) -> Optional[LinearSyncState]:
+    return await _get_orm().get_one(
+        orm_model=LinearSyncStateORM,
+        pydantic_model=LinearSyncState,
+        filters={"column": "workspace", "operator": "=", "value": workspace},
+    )
+
+
+###
+### Queries
+###
+async def _query_issues(
+    state: LinearSyncState, request: LinearGetIssuesRequest, limit: Optional[int]
+) -> list[LinearIssue]:
+    # Issues are shared by the organization, but each token only sees the teams it can access
+    statement = select(LinearIssueORM).where(
+        LinearIssueORM.organization_id == state.organization_id,
+        LinearIssueORM.team_id.in_(state.team_ids),
+    )
+    if request.issue_ids:
+        statement = statement.where(LinearIssueORM.id.in_(request.issue_ids))
+    else:
+        statement = (
+            statement.where(_build_query_condition(request.query))
+            .order_by(LinearIssueORM.updated_at.desc())
+            .limit(limit)
+        )
+
+    async with _get_orm().session() as session:
+        rows: list[LinearIssueORM] = (await session.execute(statement)).scalars().all()
+
+    issues: list[LinearIssue] = [_to_linear_issue(row) for row in rows]
+    if request.issue_ids:
+        # Same order as the ids, like the query by ids against Linear
+        positions: dict[str, int] = {
+            issue_id: position
+            for position, issue_id in reversed(list(enumerate(request.issue_ids)))
+        }
+        issues.sort(key=lambda issue: positions[issue.id])
+    return issues
+
+
+def _build_query_condition(query: Optional[LinearIssueQuery]):
+    """Translates the issue query into a condition with the same semantics as the Linear filter built by LinearClient._get_issues_with_boolean_clause"""
+    if query is None:
+        return true()
+    conditions: list = []
+    conditions.extend(
+        LinearIssueORM.title.contains(title, autoescape=True)
+        for title in query.title or []
+    )
+    conditions.extend(
+        LinearIssueORM.assignee == assignee for assignee in query.assignee or []
+    )
+    conditions.extend(
+        LinearIssueORM.creator == creator for creator in query.creator or []
+    )
+    conditions.extend(
+        LinearIssueORM.project == project for project in query.project or []
+    )
+    conditions.extend(
+        LinearIssueORM.labels.contains([label]) for label in query.labels or []
+    )
+    conditions.extend(LinearIssueORM.state == str(state) for state in query.state or [])
+    conditions.extend(LinearIssueORM.number == number for number in query.number or [])
+    conditions.extend(LinearIssueORM.cycle == cycle for cycle in query.cycle or [])
+    conditions.extend(
+        LinearIssueORM.estimate == estimate for estimate in query.estimate or []
+    )
+    if not conditions:
+        return true()
+    return and_(*conditions) if query.use_and_clause else or_(*conditions)
+
+
+def _to_linear_issue(row: LinearIssueORM) -> LinearIssue:
+    return LinearIssue(
+        id=row.id,
+        number=row.number,
+        title=row.title,
+        description=row.description,
+        priority=row.priority,
+        estimate=row.estimate,
+        state=row.state,
+        assignee=row.assignee,
+        creator=row.creator,
+        labels=list(row.labels or []),
+        createdAt=row.created_at,
+        updatedAt=row.updated_at,
+        dueDate=row.due_date,
+        cycle=row.cycle,
+        project=row.project,
+        comments=row.comments,
+        url=row.url,
+    )
+
+
+###
+### Sync
+###
+def _start_sync(workspace: str, url: str, headers: dict[str, str]) -> asyncio.Task:
+    # Concurrent triggers for the same token share a single sync
+    if workspace in _pending_syncs:
+        return _pending_syncs[workspace]
+    task: asyncio.Task = asyncio.create_task(sync_workspace(url=url, headers=headers))
+    _pending_syncs[workspace] = task
+    task.add_done_callback(lambda done: _on_sync_done(workspace=workspace, task=done))
+    return task
+
+
+def _on_sync_done(workspace: str, task: asyncio.Task):
+    _pending_syncs.pop(workspace, None)
+    if not task.cancelled() and task.exception() is not None:
+        log.error(f"Error syncing the Linear mirror: {task.exception()}")
+
+
+async def sync_workspace(url: str, headers: dict[str, str]) -> LinearSyncState:
+    """Mirrors the entities of the token's workspace and every issue updated since the last sync of the token.
+
+    The first sync pages through every issue. Later syncs only transfer the issues whose updatedAt moved past the cursor.
+    """
+    started_at: datetime = datetime.now(timezone.utc)
+    workspace: str = workspace_cache_key(headers)
+    orm: Orm = _get_orm()
+
+    metadata: dict = await _post(url=url, headers=headers, query=MIRROR_METADATA_QUERY)
+    organization_id: str = metadata["organization"]["id"]
+    entities: list[dict] = [
+        {
+            "organization_id": organization_id,
+            "kind": kind,
+            "id": node["id"],
+            "name": str(node["name"] if kind != "cycle" else node["number"]),
+        }
+        for kind, key in [
+            ("state", "workflowStates"),
+            ("user", "users"),
+            ("label", "issueLabels"),
+            ("project", "projects"),
+            ("cycle", "cycles"),
+        ]
+        for node in metadata[key]["nodes"]
+    ]
+    await orm.upsert(
+        orm_model=LinearEntityORM,
+        data=entities,
+        index_elements=["organization_id", "kind", "id"],
+    )
+
+    previous: Optional[LinearSyncState] = await get_sync_state(workspace)
+    synced_until: Optional[str] = previous.synced_until if previous else None
+    issue_filter: Optional[dict] = (
+        {"updatedAt": {"gte": synced_until}} if synced_until else None
+    )
+    cursor: Optional[str] = None
+    synced: int = 0
+    while True:
+        page: dict = (
+            await _post(
+                url=url,
+                headers=headers,
+                query=MIRROR_ISSUES_QUERY,
+                variables={
+                    "filter": issue_filter,
+                    "first": LINEAR_MIRROR_PAGE_SIZE,
+                    "after": cursor,
+                },
+            )
+        )["issues"]
+        rows: list[dict] = [
+            _issue_row_from_node(organization_id=organization_id, node=node)
+            for node in page["nodes"]
+        ]
+        await orm.upsert(
+            orm_model=LinearIssueORM,
+            data=rows,
+            index_elements=["organization_id", "id"],
+            where=NOT_OLDER_THAN_STORED,
+        )
+        for row in rows:
+            # ISO 8601 timestamps in the same timezone compare correctly as strings
+            if row["updated_at"] and (
+                not synced_until or row["updated_at"] > synced_until
+            ):
+                synced_until = row["updated_at"]
+        synced += len(rows)
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        cursor = page["pageInfo"]["endCursor"]
+
+    state = LinearSyncState(
+        workspace=workspace,
+        organization_id=organization_id,
+        team_ids=[team["id"] for team in metadata["teams"]["nodes"]],
+        synced_until=synced_until,
+        synced_at=started_at,
+    )
+    await orm.upsert(
+        orm_model=LinearSyncStateORM,
+        data=[state.model_dump()],
+        index_elements=["workspace"],
+    )
+    _metrics["linear_mirror_synced_issues_total"] += synced
+    log.info(f"Synced {synced} issues into the Linear mirror")
+    return state
+
+
+async def _post(
+    url: str, headers: dict[str, str], query: str, variables: Optional[dict] = None
+) -> dict:
+    response = await get_httpx_client().post(
+        url, json={"query": query, "variables": variables or {}}, headers=headers
+    )
+    result: dict = response.json()
+    if "errors" in result:
+        raise Exception(result["errors"])
+    return result["data"]
+
+
+def _issue_row_from_node(organization_id: str, node: dict) -> dict:
+    return {
+        "organization_id": organization_id,
+        "id": node["id"],
+        "team_id": (node.get("team") or {}).get("id"),
+        "number": node.get("number"),
+        "title": node.get("title"),
+        "description": node.get("description"),
+        "priority": node.get("priority"),
+        "estimate": node.get("estimate"),
+        "state": (node.get("state") or {}).get("name"),
+        "assignee": (node.get("assignee") or {}).get("name"),
+        "creator": (node.get("creator") or {}).get("name"),
+        "labels": [label["name"] for label in node["labels"]["nodes"]],
+        "cycle": (node.get("cycle") or {}).get("number"),
+        "project": (node.get("project") or {}).get("name"),
+        "comments": [
+            {
+                "message": comment["body"],
+                "user": (comment.get("user") or {}).get("name"),
+            }
+            for comment in node["comments"]["nodes"]
+        ],
+        "url": node.get("url"),
+        "due_date": node.get("dueDate"),
+        "created_at": node.get("createdAt"),
+        "updated_at": node.get("updatedAt"),
+    }
+
+
+###
+### Webhooks
+###
+def verify_webhook_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Checks the Linear-Signature header, the hex HMAC-SHA256 of the raw body keyed with the webhook secret"""
+    if not LINEAR_WEBHOOK_SECRET or not signature:
+        return False
+    expected: str = hmac.new(
+        LINEAR_WEBHOOK_SECRET.encode(), body, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def is_webhook_fresh(payload: dict) -> bool:
+    if LINEAR_WEBHOOK_TOLERANCE <= 0:
+        return True
+    timestamp: Optional[int] = payload.get("webhookTimestamp")  # Epoch milliseconds
+    return (
+        timestamp is not None
+        and abs(time.time() * 1000 - timestamp) <= LINEAR_WEBHOOK_TOLERANCE * 1000
+    )
+
+
+async def apply_webhook(payload: dict) -> bool:
+    """Applies a Linear webhook event to the mirror. Returns False if the mirror does not track the type of the event"""
+    organization_id: str = payload["organizationId"]
+    action: str = payload["action"]
+    event_type: str = payload["type"]
+    data: dict = payload["data"]
+    _metrics["linear_mirror_webhooks_total"] += 1
+
+    if event_type == "Issue":
+        if action == "remove":
+            await _delete_issues(
+                organization_id=organization_id, issue_ids=[data["id"]]
+            )
+        else:
+            await _get_orm().upsert(
+                orm_model=LinearIssueORM,
+                data=[
+                    await _issue_row_from_webhook(
+                        organization_id=organization_id, data=data
+                    )
+                ],
+                index_elements=["organization_id", "id"],
+                where=NOT_OLDER_THAN_STORED,
+            )
+        return True
+
+    if event_type == "Comment":
+        # Edited and removed comments are reconciled by the next sync
+        if action == "create":
+            await _append_comment(organization_id=organization_id, data=data)
+        return True
+
+    if event_type in ENTITY_KINDS:
+        await _apply_entity_event(
+            organization_id=organization_id,
+            kind=ENTITY_KINDS[event_type],
+            action=action,
+            data=data,
+        )
+        return True
+
+    return False
+
+
+async def _issue_row_from_webhook(organization_id: str, data: dict) -> dict:
+    """Builds an issue row from the entity of an Issue event. Names missing from the payload are resolved from the mirrored entities by id"""
+    names: dict[tuple[str, str], str] = await _get_entity_names(
+        organization_id=organization_id,
+        ids=[
+            data.get("stateId"),
+            data.get("assigneeId"),
+            data.get("creatorId"),
+            data.get("projectId"),
+            data.get("cycleId"),
+            *(data.get("labelIds") or []),
+        ],
+    )
+
+    def name_of(field: str, kind: str) -> Optional[str]:
+        return (data.get(field) or {}).get("name") or names.get(
+            (kind, data.get(f"{field}Id"))
+        )
+
+    cycle_number: Optional[str] = (data.get("cycle") or {}).get("number") or names.get(
+        ("cycle", data.get("cycleId"))
+    )
+    labels: list[str] = [label["name"] for label in data.get("labels") or []] or [
+        names[("label", label_id)]
+        for label_id in data.get("labelIds") or []
+        if ("label", label_id) in names
+    ]
+    # Comments are left out so that the upsert keeps the mirrored ones
+    return {
+        "organization_id": organization_id,
+        "id": data["id"],
+        "team_id": data.get("teamId") or (data.get("team") or {}).get("id"),
+        "number": data.get("number"),
+        "title": data.get("title"),
+        "description": data.get("description"),
+        "priority": data.get("priority"),
+        "estimate": data.get("estimate"),
+        "state": name_of("state", "state"),
+        "assignee": name_of("assignee", "user"),
+        "creator": name_of("creator", "user"),
+        "labels": labels,
+        "cycle": int(cycle_number) if cycle_number is not None else None,
+        "project": name_of("project", "project"),
+        "url": data.get("url"),
+        "due_date": data.get("dueDate"),
+        "created_at": data.get("createdAt"),
+        "updated_at": data.get("updatedAt"),
+    }
+
+
+async def _get_entity_names(
+    organization_id: str, ids: list[Optional[str]]
+) -> dict[tuple[str, str], str]:
+    ids = [entity_id for entity_id in ids if entity_id]
+    if not ids:
+        return {}
+    statement = select(LinearEntityORM).where(
+        LinearEntityORM.organization_id == organization_id,
+        LinearEntityORM.id.in_(ids),
+    )
+    async with _get_orm().session() as session:
+        rows = (await session.execute(statement)).scalars().all()
+    return {(row.kind, row.id): row.name for row in rows}
+
+
+async def _append_comment(organization_id: str, data: dict):
+    user: Optional[str] = (data.get("user") or {}).get("name")
+    if user is None and data.get("userId"):
+        user = (
+            await _get_entity_names(
+                organization_id=organization_id, ids=[data["userId"]]
+            )
+        ).get(("user", data["userId"]))
+    comment: list[dict] = [{"message": data.get("body"), "user": user}]
+    statement = (
+        update(LinearIssueORM)
+        .where(
+            LinearIssueORM.organization_id == organization_id,
+            LinearIssueORM.id == data["issueId"],
+        )
+        .values(
+            comments=func.coalesce(LinearIssueORM.comments, cast([], JSONB)).op("||")(
+                cast(comment, JSONB)
+            )
+        )
+    )
+    async with _get_orm().session() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def _apply_entity_event(organization_id: str, kind: str, action: str, data: dict):
+    orm: Orm = _get_orm()
+    if action == "remove":
+        await orm.delete(
+            orm_model=LinearEntityORM,
+            filters={
+                "boolean_clause": "AND",
+                "conditions": [
+                    {
+                        "column": "organization_id",
+                        "operator": "=",
+                        "value": organization_id,
+                    },
+                    {"column": "kind", "operator": "=", "value": kind},
+                    {"column": "id", "operator": "=", "value": data["id"]},
+                ],
+            },
+        )
+        return
+
+    name: str = str(data["number"] if kind == "cycle" else data["name"])
+    previous_name: Optional[str] = (
+        await _get_entity_names(organization_id=organization_id, ids=[data["id"]])
+    ).get((kind, data["id"]))
+    await orm.upsert(
+        orm_model=LinearEntityORM,
+        data=[
+            {
+                "organization_id": organization_id,
+                "kind": kind,
+                "id": data["id"],
+                "name": name,
+            }
+        ],
+        index_elements=["organization_id", "kind", "id"],
+    )
+    if previous_name is None or previous_name == name:
+        return
+
+    # Issues store entity names, so a rename is applied to every issue that refers to the entity
+    statements: list = [
+        update(LinearIssueORM)
+        .where(
+            LinearIssueORM.organization_id == organization_id,
+            getattr(LinearIssueORM, column) == previous_name,
+        )
+        .values({column: name})
+        for column in ENTITY_ISSUE_COLUMNS.get(kind, [])
+    ]
+    if kind == "label":
+        statements.append(
+            update(LinearIssueORM)
+            .where(
+                LinearIssueORM.organization_id == organization_id,
+                LinearIssueORM.labels.contains([previous_name]),
+            )
+            .values(
+                labels=func.array_replace(LinearIssueORM.labels, previous_name, name)
+            )
+        )
+    async with orm.session() as session:
+        for statement in statements:
+            await session.execute(statement)
+        await session.commit()
+
+
+async def _delete_issues(organization_id: str, issue_ids: list[str]):
+    await _get_orm().delete(
+        orm_model=LinearIssueORM,
+        filters={
+            "boolean_clause": "AND",
+            "conditions": [
+                {
+                    "column": "organization_id",
+                    "operator": "=",
+                    "value": organization_id,
+                },
+                {"column": "id", "operator": "IN", "value": issue_ids},
+            ],
+        },
+    )
+
+
+def get_linear_mirror_metrics() -> dict[str, float]:
+    return dict(_metrics)
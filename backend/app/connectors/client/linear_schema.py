@@ -0,0 +1,138 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+from graphql import (
+    GraphQLSchema,
+    build_client_schema,
+    build_schema,
+    get_introspection_query,
+)
+
+from app.connectors.http import get_httpx_client
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+# A vendored snapshot (SDL or introspection JSON) takes precedence and is never refreshed
+LINEAR_SCHEMA_PATH = os.environ.get("LINEAR_SCHEMA_PATH")
+LINEAR_SCHEMA_CACHE_PATH = os.environ.get(
+    "LINEAR_SCHEMA_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "linear_schema.json"),
+)
+LINEAR_SCHEMA_CACHE_TTL = float(os.environ.get("LINEAR_SCHEMA_CACHE_TTL", 86400))
+
+_schema: Optional[GraphQLSchema] = None
+_schema_loaded_at: float = 0.0
+_schema_lock: Optional[asyncio.Lock] = None
+
+
+async def get_linear_schema(url: str, headers: dict[str, str]) -> GraphQLSchema:
+    """Returns the Linear schema shared by every LinearClient in the process, so that queries are validated locally without an introspection round trip per client.
+
+    The schema is loaded from the vendored snapshot if configured, otherwise from the on-disk cache, and only fetched from Linear when the cache is missing or older than the ttl.
+    Parsing and building the schema take hundreds of milliseconds, so they run in a worker thread rather than on the event loop.
+    """
+    global _schema, _schema_loaded_at, _schema_lock
+    if _schema is not None and not _is_expired(_schema_loaded_at):
+        return _schema
+
+    if _schema_lock is None:
+        _schema_lock = asyncio.Lock()
+    async with _schema_lock:
+        # Another coroutine may have loaded the schema while this one was waiting
+        if _schema is not None and not _is_expired(_schema_loaded_at):
+            return _schema
+
+        if LINEAR_SCHEMA_PATH:
+            _schema = await asyncio.to_thread(_load_vendored_schema, LINEAR_SCHEMA_PATH)
+            _schema_loaded_at = float("inf")
+            return _schema
+
+        cached_at: Optional[float] = _get_cache_mtime()
+        if cached_at is not None and not _is_expired(cached_at):
+            _schema = await asyncio.to_thread(
+                _load_introspection, LINEAR_SCHEMA_CACHE_PATH
+            )
+            _schema_loaded_at = cached_at
+            return _schema
+
+        try:
+            introspection: dict = await _fetch_introspection(url=url, headers=headers)
+        except Exception as e:
+            if cached_at is None:
+                raise
+            log.warning(
+                f"Error refreshing the Linear schema, using the stale cache: {e}"
+            )
+            _schema = await asyncio.to_thread(
+                _load_introspection, LINEAR_SCHEMA_CACHE_PATH
+            )
+            _schema_loaded_at = time.time()
+            return _schema
+
+        await asyncio.to_thread(_write_cache, introspection)
+        _schema = await asyncio.to_thread(build_client_schema, introspection)
+        _schema_loaded_at = time.time()
+        return _schema
+
+
+def clear_linear_schema_cache(remove_file: bool = False):
+    global _schema, _schema_loaded_at
+    _schema = None
+    _schema_loaded_at = 0.0
+    if remove_file and os.path.exists(LINEAR_SCHEMA_CACHE_PATH):
+        os.remove(LINEAR_SCHEMA_CACHE_PATH)
+
+
+def _is_expired(loaded_at: float) -> bool:
+    return time.time() - loaded_at > LINEAR_SCHEMA_CACHE_TTL
+
+
+def _get_cache_mtime() -> Optional[float]:
+    try:
+        return os.path.getmtime(LINEAR_SCHEMA_CACHE_PATH)
+    except OSError:
+        return None
+
+
+def _load_vendored_schema(path: str) -> GraphQLSchema:
+    if path.endswith(".json"):
+        return _load_introspection(path)
+    with open(path) as f:
+        return build_schema(f.read())
+
+
+def _load_introspection(path: str) -> GraphQLSchema:
+    with open(path) as f:
+        introspection: dict = json.load(f)
+    # Accept both a raw introspection result and a full GraphQL response
+    return build_client_schema(introspection.get("data", introspection))
+
+
+async def _fetch_introspection(url: str, headers: dict[str, str]) -> dict:
+    log.info("Fetching the Linear schema via introspection")
+    response = await get_httpx_client().post(
+        url, json={"query": get_introspection_query()}, headers=headers
+    )
+    result: dict = response.json()
+    if "errors" in result:
+        raise Exception(result["errors"])
+    return result["data"]
+
+
+def _write_cache(introspection: dict):
+    # Write to a temporary file first so that concurrent workers never read a partial cache
+    try:
+        directory: str = os.path.dirname(LINEAR_SCHEMA_CACHE_PATH) or "."
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, delete=False, suffix=".tmp"
+        ) as f:
+            json.dump(introspection, f)
+        os.replace(f.name, LINEAR_SCHEMA_CACHE_PATH)
+    except OSError as e:
+        log.warning(f"Error writing the Linear schema cache: {e}")
@@ -1,28 +1,34 @@
+from functools import cached_property
+
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import Resource
 
+from app.connectors.google import build_google_service
 from app.models.integrations.sheets import SheetsGetRequest
+from app.utils.tracing import traced_client
 
 TOKEN_URI = "https://oauth2.googleapis.com/token"
 
 
+@traced_client
 class GoogleSheetsClient:
 
     def __init__(
         self, access_token: str, refresh_token: str, client_id: str, client_secret: str
     ):
-        self.service = build(
-            "sheets",
-            "v4",
-            credentials=Credentials(
-                token=access_token,
-                refresh_token=refresh_token,
-                client_id=client_id,
-                client_secret=client_secret,
-                token_uri=TOKEN_URI,
-            ),
+        self.credentials = Credentials(
+            token=access_token,
+            refresh_token=refresh_token,
+            client_id=client_id,
+            client_secret=client_secret,
+            token_uri=TOKEN_URI,
         )
 
+    @cached_property
+    def service(self) -> Resource:
+        """Built on first use rather than in __init__"""
+        return build_google_service("sheets", "v4", credentials=self.credentials)
+
     def read_sheet(self, request: SheetsGetRequest):
         sheet = self.service.spreadsheets()
         result = (
@@ -1,4 +1,5 @@
 import logging
+import os
 from typing import Any
 
 from slack_sdk.web.async_client import AsyncWebClient
@@ -7,12 +8,20 @@ from app.models.integrations.slack import (
     SlackGetChannelIdRequest,
     SlackSendMessageRequest,
 )
+from app.utils.levenshtein import MATCH_THRESHOLDS, FuzzyIndex, MatchEntity
+from app.utils.tracing import traced_client
 
 logging.basicConfig(level=logging.INFO)
 
 log = logging.getLogger(__name__)
 
+# Off by default: the repaired channel ids are used to send messages, so a misspelled name could otherwise post to a different channel
+SLACK_CHANNEL_REPAIR_ENABLED = (
+    os.environ.get("SLACK_CHANNEL_REPAIR_ENABLED", "false").lower() == "true"
+)
+
 
+@traced_client
 class SlackClient:
     def __init__(self, access_token: str):
         self.client = AsyncWebClient(token=access_token)
@@ -25,6 +34,26 @@ class SlackClient:
         request_channel_names_set: set[str] = {
             name.lower() for name in request.channel_names
         }
+        channel_ids: dict[str, str] = {}
+        for channel in channels:
+            channel_ids.setdefault(channel["name"].lower(), channel["id"])
+
+        # When enabled, misspelled names are repaired to the most similar channel, so that a typo does not cost another agent round
+        unmatched_names: list[str] = [
+            name for name in request_channel_names_set if name not in channel_ids
+        ]
+        if SLACK_CHANNEL_REPAIR_ENABLED and unmatched_names:
+            matcher = FuzzyIndex(
+                channel_ids, threshold=MATCH_THRESHOLDS[MatchEntity.SLACK_CHANNEL]
+            )
+            for name, best_match in zip(
+                unmatched_names, matcher.best_match_many(unmatched_names)
+            ):
+                if best_match is None:
+                    continue
+                log.info(f"Repaired Slack channel name {name} to {best_match}")
+                request_channel_names_set.add(best_match)
+
         channel_info = [
             {"channel_name": channel["name"], "channel_id": channel["id"]}
             for channel in channels
@@ -4,8 +4,10 @@ from functools import partial
 import tweepy
 
 from app.models.integrations.x import Tweet, XSendTweetRequest
+from app.utils.tracing import traced_client
 
 
+@traced_client
 class XClient:
     def __init__(self, access_token: str):
         self.client = tweepy.Client(bearer_token=access_token)
@@ -0,0 +1,37 @@
+import logging
+from functools import cache
+from typing import Optional
+
+from google.oauth2.credentials import Credentials
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import Resource, build, build_from_document
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+
+@cache
+def get_discovery_document(service_name: str, version: str) -> Optional[str]:
+    """Returns the discovery document bundled with google-api-python-client, read from disk at most once per process, or None if the installed version does not bundle it.
+
+    The document is kept as JSON text rather than a parsed dict, because build_from_document modifies the dict it builds from and services are built concurrently from executor threads.
+    """
+    content: Optional[str] = discovery_cache.get_static_doc(service_name, version)
+    if content is None:
+        log.warning(
+            f"No bundled discovery document for {service_name} {version}, it will be fetched on every build"
+        )
+    return content
+
+
+def build_google_service(
+    service_name: str, version: str, credentials: Credentials
+) -> Resource:
+    """Builds a googleapiclient service object from the process-wide discovery document, without any network call or disk read on the hot path"""
+    document: Optional[str] = get_discovery_document(service_name, version)
+    if document is None:
+        return build(
+            service_name, version, credentials=credentials, static_discovery=False
+        )
+    # Every build parses its own copy, so that no two services share mutable state
+    return build_from_document(document, credentials=credentials)
@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+import logging
+import os
+from typing import Optional
+
+import aiohttp
+import httpx
+from gql.transport.aiohttp import AIOHTTPTransport
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get("HTTP_MAX_CONNECTIONS_PER_HOST", 20))
+HTTP_KEEPALIVE_TIMEOUT = float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", 60))
+HTTP_DNS_CACHE_TTL = int(os.environ.get("HTTP_DNS_CACHE_TTL", 300))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 30))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "true").lower() == "true"
+
+# App-lifetime clients shared by every connector, so that each agent hop reuses warm keep-alive connections instead of paying for new TCP/TLS handshakes.
+# They are bound to the event loop they were created on and are recreated if that loop has gone away (e.g. between scripts calling asyncio.run).
+_aiohttp_connector: Optional[aiohttp.TCPConnector] = None
+_aiohttp_session: Optional[aiohttp.ClientSession] = None
+_httpx_client: Optional[httpx.AsyncClient] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _ensure_current_loop():
+    global _aiohttp_connector, _aiohttp_session, _httpx_client, _loop
+    loop = asyncio.get_running_loop()
+    if loop is _loop:
+        return
+    _aiohttp_connector = None
+    _aiohttp_session = None
+    _httpx_client = None
+    _loop = loop
+
+
+def get_aiohttp_connector() -> aiohttp.TCPConnector:
+    """Returns the shared aiohttp connection pool. Must be called from within a running event loop"""
+    global _aiohttp_connector
+    _ensure_current_loop()
+    if _aiohttp_connector is None or _aiohttp_connector.closed:
+        _aiohttp_connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+        log.info(
+            f"Created shared aiohttp connector with limit={HTTP_MAX_CONNECTIONS}, limit_per_host={HTTP_MAX_CONNECTIONS_PER_HOST}"
+        )
+    return _aiohttp_connector
+
+
+def get_aiohttp_session() -> aiohttp.ClientSession:
+    """Returns the shared aiohttp session. Callers pass their own headers per request and must not close it"""
+    global _aiohttp_session
+    _ensure_current_loop()
+    if _aiohttp_session is None or _aiohttp_session.closed:
+        _aiohttp_session = aiohttp.ClientSession(
+            connector=get_aiohttp_connector(),
+            connector_owner=False,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        )
+    return _aiohttp_session
+
+
+def get_httpx_client() -> httpx.AsyncClient:
+    """Returns the shared httpx client, which negotiates HTTP/2 unless HTTP2_ENABLED is false. Callers must not close it"""
+    global _httpx_client
+    _ensure_current_loop()
+    if _httpx_client is None or _httpx_client.is_closed:
+        _httpx_client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                keepalive_expiry=HTTP_KEEPALIVE_TIMEOUT,
+            ),
+        )
+        log.info(f"Created shared httpx client with http2={HTTP2_ENABLED}")
+    return _httpx_client
+
+
+async def close_http_clients():
+    """Closes the shared clients. Called once when the application shuts down"""
+    global _aiohttp_connector, _aiohttp_session, _httpx_client
+    if _aiohttp_session is not None:
+        await _aiohttp_session.close()
+    if _aiohttp_connector is not None:
+        await _aiohttp_connector.close()
+    if _httpx_client is not None:
+        await _httpx_client.aclose()
+    _aiohttp_connector = None
+    _aiohttp_session = None
+    _httpx_client = None
+
+
+# Set by a caller of SharedConnectorAIOHTTPTransport to collect the (case-insensitive) headers of its own responses. Concurrent requests run in separate
+# tasks, each with its own context, so they never see each other's headers, unlike the transport's response_headers attribute, which the last response wins
+response_headers_context: contextvars.ContextVar[Optional[list]] = (
+    contextvars.ContextVar("response_headers", default=None)
+)
+
+
+async def _capture_response_headers(
+    session: aiohttp.ClientSession,
+    trace_config_ctx,
+    params: aiohttp.TraceRequestEndParams,
+):
+    response_headers: Optional[list] = response_headers_context.get()
+    if response_headers is not None:
+        response_headers.append(params.response.headers)
+
+
+class SharedConnectorAIOHTTPTransport(AIOHTTPTransport):
+    """gql transport whose per-connection sessions borrow the shared aiohttp connection pool instead of opening their own"""
+
+    def __init__(self, **kwargs):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(_capture_response_headers)
+        super().__init__(
+            client_session_args={
+                "connector": get_aiohttp_connector(),
+                "connector_owner": False,
+                "trace_configs": [trace_config],
+            },
+            **kwargs,
+        )
+
+    async def close(self):
+        # Closing a session that does not own its connector leaves the pooled connections open for the next request
+        if self.session is not None:
+            await self.session.close()
+        self.session = None
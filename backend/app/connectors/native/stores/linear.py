@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, Integer, String, Text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+class LinearIssueORM(Base):
+    __tablename__ = "linear_issue"
+
+    organization_id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True)
+    team_id = Column(String, nullable=True)
+    number = Column(Integer, nullable=True)
+    title = Column(String, nullable=True)
+    description = Column(String, nullable=True)
+    priority = Column(Integer, nullable=True)
+    estimate = Column(Integer, nullable=True)
+    state = Column(String, nullable=True)
+    assignee = Column(String, nullable=True)
+    creator = Column(String, nullable=True)
+    labels = Column(ARRAY(Text), nullable=False, default=list)
+    cycle = Column(Integer, nullable=True)
+    project = Column(String, nullable=True)
+    comments = Column(JSONB, nullable=True)
+    url = Column(String, nullable=True)
+    due_date = Column(String, nullable=True)
+    created_at = Column(String, nullable=True)  # ISO 8601, as returned by Linear
+    updated_at = Column(String, nullable=True)  # ISO 8601, as returned by Linear
+
+
+class LinearEntityORM(Base):
+    __tablename__ = "linear_entity"
+
+    organization_id = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)
+    id = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+
+
+class LinearSyncStateORM(Base):
+    __tablename__ = "linear_sync_state"
+
+    workspace = Column(String, primary_key=True)
+    organization_id = Column(String, nullable=False)
+    team_ids = Column(ARRAY(Text), nullable=False, default=list)
+    synced_until = Column(String, nullable=True)
+    synced_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class LinearSyncState(BaseModel):
+    """Incremental sync cursor of the mirror for one access token"""
+
+    workspace: str
+    organization_id: str
+    team_ids: list[str]
+    synced_until: Optional[str] = None
+    synced_at: Optional[datetime] = None
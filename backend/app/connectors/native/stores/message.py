@@ -4,7 +4,8 @@ from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel
-from sqlalchemy import ARRAY, JSON, UUID, Column, DateTime, Integer, String
+from sqlalchemy import ARRAY, JSON, UUID, Boolean, Column, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
 
@@ -82,3 +83,33 @@ class Message(BaseModel):
                 dict=kwargs, key="updated_at", type=datetime
             ),
         )
+
+
+class MessageEventORM(Base):
+    __tablename__ = "message_event"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    instance = Column(UUID, nullable=False)
+    content = Column(JSONB, nullable=False)
+    error = Column(Boolean, nullable=False, default=False)
+    created_at = Column(
+        DateTime, nullable=False, default=func.now()
+    )  # Automatically use the current timestamp of the database server upon creation
+
+
+class MessageEvent(BaseModel):
+    """A single turn of a conversation. Turns are only ever appended, so a conversation is rebuilt by reading its events in id order"""
+
+    id: Optional[int] = None
+    instance: str
+    content: dict
+    error: bool = False
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def local(cls, instance: str, content: dict):
+        return MessageEvent(
+            instance=instance,
+            content=content,
+            error=bool(content.get("error")),
+        )
@@ -1,7 +1,11 @@
 import logging
 import os
-from typing import Any, Optional, Type
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional, Type
 
+import asyncpg
 from asyncpg.pgproto.pgproto import UUID as AsyncpgUUID
 from dotenv import find_dotenv, load_dotenv
 from pydantic import BaseModel
@@ -11,12 +15,17 @@ from sqlalchemy import (
     and_,
     column,
     delete,
+    func,
+    literal,
     or_,
     select,
     true,
+    tuple_,
+    union_all,
     update,
 )
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 from sqlalchemy.sql import text
@@ -26,17 +35,103 @@ log = logging.getLogger(__name__)
 
 load_dotenv(find_dotenv(filename=".env"))
 DATABASE_URL = os.environ.get("DATABASE_URL")
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 5))
+DATABASE_MAX_OVERFLOW = int(os.environ.get("DATABASE_MAX_OVERFLOW", 10))
+DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", 30))
+DATABASE_POOL_RECYCLE = int(os.environ.get("DATABASE_POOL_RECYCLE", 1800))
+DATABASE_POOL_PRE_PING = (
+    os.environ.get("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+)
 
 
-class Orm:
+class PoolMetrics:
+    """Accumulates the time spent waiting for a connection to be checked out of the shared pool"""
+
     def __init__(self):
-        self.engine = create_async_engine(
-            url=DATABASE_URL,
+        self.acquire_count: int = 0
+        self.acquire_wait_seconds_sum: float = 0.0
+        self.acquire_wait_seconds_max: float = 0.0
+
+    def record_wait(self, seconds: float):
+        self.acquire_count += 1
+        self.acquire_wait_seconds_sum += seconds
+        self.acquire_wait_seconds_max = max(self.acquire_wait_seconds_max, seconds)
+
+
+# Process-wide registry so that every service shares one warm pool per database url
+_engines: dict[str, AsyncEngine] = {}
+_sessionmakers: dict[str, sessionmaker] = {}
+pool_metrics = PoolMetrics()
+
+
+def get_engine(url: Optional[str] = None) -> AsyncEngine:
+    """Returns the shared engine for the database url, creating it on first use"""
+    url = url or DATABASE_URL
+    if url not in _engines:
+        _engines[url] = create_async_engine(
+            url=url,
             echo=False,
+            pool_size=DATABASE_POOL_SIZE,
+            max_overflow=DATABASE_MAX_OVERFLOW,
+            pool_timeout=DATABASE_POOL_TIMEOUT,
+            pool_recycle=DATABASE_POOL_RECYCLE,
+            pool_pre_ping=DATABASE_POOL_PRE_PING,
+        )
+        _sessionmakers[url] = sessionmaker(
+            bind=_engines[url], class_=AsyncSession, expire_on_commit=False
         )
-        self.sessionmaker = sessionmaker(
-            bind=self.engine, class_=AsyncSession, expire_on_commit=False
+        log.info(
+            f"Created database engine with pool_size={DATABASE_POOL_SIZE}, max_overflow={DATABASE_MAX_OVERFLOW}"
         )
+    return _engines[url]
+
+
+async def dispose_engines():
+    """Closes every pooled connection. Called once when the application shuts down"""
+    for engine in _engines.values():
+        await engine.dispose()
+    # Disposed engines must not be handed out again, a later get_engine creates a fresh one
+    _engines.clear()
+    _sessionmakers.clear()
+    log.info("Disposed all database engines")
+
+
+def get_pool_metrics() -> dict[str, float]:
+    """Returns a snapshot of the connection pool usage across all registered engines"""
+    checked_out: int = 0
+    checked_in: int = 0
+    size: int = 0
+    overflow: int = 0
+    for engine in _engines.values():
+        pool = engine.sync_engine.pool
+        checked_out += pool.checkedout()
+        checked_in += pool.checkedin()
+        size += pool.size()
+        overflow += max(pool.overflow(), 0)
+    return {
+        "db_pool_size": size,
+        "db_pool_checked_out_connections": checked_out,
+        "db_pool_checked_in_connections": checked_in,
+        "db_pool_overflow_connections": overflow,
+        "db_pool_acquire_total": pool_metrics.acquire_count,
+        "db_pool_acquire_wait_seconds_total": pool_metrics.acquire_wait_seconds_sum,
+        "db_pool_acquire_wait_seconds_max": pool_metrics.acquire_wait_seconds_max,
+    }
+
+
+class Orm:
+    def __init__(self, url: Optional[str] = None):
+        self.engine = get_engine(url=url)
+        self.sessionmaker = _sessionmakers[url or DATABASE_URL]
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Yields a session whose connection has already been checked out of the shared pool, recording the time spent waiting for it"""
+        async with self.sessionmaker() as session:
+            start: float = time.perf_counter()
+            await session.connection()
+            pool_metrics.record_wait(time.perf_counter() - start)
+            yield session
 
     async def get(
         self,
@@ -56,34 +151,161 @@ class Orm:
             list: A list of objects that match the filters.
         """
         results = []
-        offset = 0
-        async with self.sessionmaker() as session:
-            while True:
-                query = select(orm_model)
-                filter_expression, params = _build_filter(orm_model, filters)
-                query = query.filter(filter_expression)
-                query = query.limit(batch_size).offset(offset)
+        async for batch in self.stream(
+            orm_model=orm_model,
+            pydantic_model=pydantic_model,
+            filters=filters,
+            batch_size=batch_size,
+        ):
+            results.extend(batch)
+        return results
+
+    async def stream(
+        self,
+        orm_model: Type[DeclarativeMeta],
+        pydantic_model: Type[BaseModel],
+        filters: dict[str, Any],
+        batch_size: int = 6500,
+    ) -> AsyncIterator[list]:
+        """Yields entries from the specified table batch by batch, paginating on the primary key instead of an OFFSET.
+
+        Args:
+            orm_model (Type[DeclarativeMeta]): The SQLAlchemy ORM model to fetch data of.
+            pydantic_model (Type[BaseModel]): The pydantic model to validate the ORM model to.
+            filters (dict[str, Any]): The filters to apply to the query.
+            batch_size (int): The maximum number of rows fetched per round trip.
+
+        Yields:
+            list: The validated objects of the next batch, ordered by the full primary key.
+        """
+        # Composite primary keys are compared as a whole, so that rows sharing the leading key column of the last row are not skipped
+        primary_key: tuple = tuple(orm_model.__mapper__.primary_key)
+        attributes: list[str] = [
+            orm_model.__mapper__.get_property_by_column(column).key
+            for column in primary_key
+        ]
+        filter_expression, params = _build_filter(orm_model, filters)
+        last_key: Optional[tuple] = None
+        while True:
+            query = select(orm_model).filter(filter_expression)
+            if last_key is not None:
+                query = query.filter(tuple_(*primary_key) > tuple_(*last_key))
+            query = query.order_by(*primary_key).limit(batch_size)
+            # A session per batch, so that a slow or abandoned consumer does not hold a pooled connection between batches
+            async with self.session() as session:
                 batch_results = await session.execute(query, params)
                 batch_results = batch_results.scalars().all()
-                if not batch_results:
-                    break
+            log.info(
+                f"Fetched {len(batch_results)} rows from {orm_model.__tablename__}"
+            )
+            if batch_results:
+                last_key = tuple(
+                    getattr(batch_results[-1], attribute) for attribute in attributes
+                )
+                yield [
+                    _to_pydantic_model(result, pydantic_model)
+                    for result in batch_results
+                ]
+            # A partial batch means there is nothing left to fetch, which saves the empty round trip
+            if len(batch_results) < batch_size:
+                break
+
+    async def get_one(
+        self,
+        orm_model: Type[DeclarativeMeta],
+        pydantic_model: Type[BaseModel],
+        filters: dict[str, Any],
+    ) -> Optional[BaseModel]:
+        """Fetches at most one entry from the specified table based on the filters provided.
+
+        Args:
+            orm_model (Type[DeclarativeMeta]): The SQLAlchemy ORM model to fetch data of.
+            pydantic_model (Type[BaseModel]): The pydantic model to validate the ORM model to.
+            filters (dict[str, Any]): The filters to apply to the query.
 
-                results.extend(batch_results)
-                offset += batch_size
-                log.info(f"Fetching {results} from database")
+        Returns:
+            Optional[BaseModel]: The object that matches the filters, or None if there is no match.
+
+        Raises:
+            MultipleResultsFound: If more than one entry matches the filters.
+        """
+        filter_expression, params = _build_filter(orm_model, filters)
+        # Only two rows are needed to tell a unique match apart from a duplicate
+        query = select(orm_model).filter(filter_expression).limit(2)
+        async with self.session() as session:
+            result = await session.execute(query, params)
+            result = result.scalars().one_or_none()
+        if result is None:
+            return None
+        return _to_pydantic_model(result, pydantic_model)
 
-        if not results:
-            return []
+    async def count(
+        self, orm_model: Type[DeclarativeMeta], filters: dict[str, Any]
+    ) -> int:
+        """Counts the entries in the specified table that match the filters provided.
 
-        stringified_results = []
-        for result in results:
-            result_dict = result.__dict__
-            for key, value in result_dict.items():
-                if isinstance(value, (UUID, AsyncpgUUID)):
-                    result_dict[key] = str(value)
-            stringified_results.append(result_dict)
+        Args:
+            orm_model (Type[DeclarativeMeta]): The SQLAlchemy ORM model to count entries of.
+            filters (dict[str, Any]): The filters to apply to the query.
 
-        return [pydantic_model.model_validate(result) for result in stringified_results]
+        Returns:
+            int: The number of matching entries.
+        """
+        filter_expression, params = _build_filter(orm_model, filters)
+        query = select(func.count()).select_from(orm_model).filter(filter_expression)
+        async with self.session() as session:
+            result = await session.execute(query, params)
+            return result.scalar_one()
+
+    async def get_union(
+        self,
+        orm_models: list[Type[DeclarativeMeta]],
+        pydantic_model: Type[BaseModel],
+        filters: dict[str, Any],
+    ) -> dict[str, list]:
+        """Fetches entries from several tables sharing the same columns in a single UNION ALL round trip.
+
+        Args:
+            orm_models (list[Type[DeclarativeMeta]]): The SQLAlchemy ORM models to fetch data of. Their tables must have identical columns.
+            pydantic_model (Type[BaseModel]): The pydantic model to validate each row to.
+            filters (dict[str, Any]): The filters to apply to every table.
+
+        Returns:
+            dict[str, list]: A map from table name to the objects in that table that match the filters.
+        """
+        if not orm_models:
+            return {}
+
+        TABLE_NAME_LABEL = "_table_name"
+        queries = []
+        params: dict[str, Any] = {}
+        for orm_model in orm_models:
+            filter_expression, params = _build_filter(orm_model, filters)
+            queries.append(
+                select(
+                    *orm_model.__table__.columns,
+                    literal(orm_model.__tablename__).label(TABLE_NAME_LABEL),
+                ).filter(filter_expression)
+            )
+
+        async with self.session() as session:
+            rows = await session.execute(union_all(*queries), params)
+            rows = rows.mappings().all()
+        log.info(
+            f"Fetched {len(rows)} rows from {len(orm_models)} tables in one round trip"
+        )
+
+        results: dict[str, list] = {
+            orm_model.__tablename__: [] for orm_model in orm_models
+        }
+        for row in rows:
+            row_dict = dict(row)
+            table_name: str = row_dict.pop(TABLE_NAME_LABEL)
+            for key, value in row_dict.items():
+                if isinstance(value, (UUID, AsyncpgUUID, uuid.UUID)):
+                    row_dict[key] = str(value)
+            results[table_name].append(pydantic_model.model_validate(row_dict))
+        return results
 
     async def post(
         self, orm_model: Type[DeclarativeMeta], data: list[dict[str, Any]]
@@ -98,7 +320,7 @@ class Orm:
             list[dict[str, Any]]: The data that was inserted
         """
         orm_instances = [orm_model(**item) for item in data]
-        async with self.sessionmaker() as session:
+        async with self.session() as session:
             session.add_all(orm_instances)
             await session.flush()
             await session.commit()
@@ -119,7 +341,7 @@ class Orm:
             filters (dict): The filters to apply to the query.
             updated_data (dict): The updates to apply to the target rows.
         """
-        async with self.sessionmaker() as session:
+        async with self.session() as session:
             filter_expression, params = _build_filter(orm_model, filters)
 
             update_stmt = update(orm_model).where(filter_expression)
@@ -136,6 +358,109 @@ class Orm:
             await session.commit()
             log.info(f"Updated rows in {orm_model.__tablename__}")
 
+    async def upsert(
+        self,
+        orm_model: Type[DeclarativeMeta],
+        data: list[dict[str, Any]],
+        index_elements: list[str],
+        where: Optional[BinaryExpression] = None,
+    ):
+        """Inserts entries into the specified table, updating the existing entries that conflict on the index elements.
+
+        Args:
+            orm_model (Type[DeclarativeMeta]): The SQLAlchemy ORM model to upsert data into.
+            data (list[dict[str, Any]]): The data to upsert. Only the columns present in the data are updated on conflict.
+            index_elements (list[str]): The columns of the unique index that identifies an entry.
+            where (Optional[BinaryExpression]): Only update conflicting entries matching this condition, e.g. to skip updates older than the stored entry.
+        """
+        if not data:
+            return
+        insert_stmt = insert(orm_model).values(data)
+        update_columns: list[str] = [
+            key for key in data[0] if key not in index_elements
+        ]
+        upsert_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={key: insert_stmt.excluded[key] for key in update_columns},
+            where=where,
+        )
+        async with self.session() as session:
+            await session.execute(upsert_stmt)
+            await session.commit()
+            log.info(f"Upserted {len(data)} rows into {orm_model.__tablename__}")
+
+    async def delete(self, orm_model: Type[DeclarativeMeta], filters: dict[str, Any]):
+        """Deletes entries from the specified table based on the filters provided.
+
+        Args:
+            orm_model (Type[DeclarativeMeta]): The SQLAlchemy ORM model to delete data of.
+            filters (dict[str, Any]): The filters to apply to the query.
+        """
+        filter_expression, params = _build_filter(orm_model, filters)
+        async with self.session() as session:
+            await session.execute(delete(orm_model).where(filter_expression), params)
+            await session.commit()
+            log.info(f"Deleted rows from {orm_model.__tablename__}")
+
+    async def notify(self, channel: str, payload: str):
+        """Publishes the payload on a Postgres NOTIFY channel. Delivered to listeners once the transaction commits"""
+        async with self.session() as session:
+            await session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": channel, "payload": payload},
+            )
+            await session.commit()
+
+
+class PostgresListener:
+    """Holds a dedicated connection that LISTENs on a Postgres channel and forwards every payload to the callback.
+
+    LISTEN needs a session-level connection, so this does not go through the shared pool (nor through a transaction-mode pooler).
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        callback: Callable[[str], None],
+        url: Optional[str] = None,
+    ):
+        self.channel = channel
+        self.callback = callback
+        # asyncpg expects a plain postgres dsn without the SQLAlchemy driver suffix
+        self.dsn = (url or DATABASE_URL).replace(
+            "postgresql+asyncpg://", "postgresql://"
+        )
+        self.connection: Optional[asyncpg.Connection] = None
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            self.callback(payload)
+        except Exception as e:
+            log.error(f"Error handling notification on {channel}: {e}")
+
+    async def start(self):
+        self.connection = await asyncpg.connect(dsn=self.dsn)
+        await self.connection.add_listener(self.channel, self._on_notification)
+        log.info(f"Listening for notifications on {self.channel}")
+
+    async def stop(self):
+        if not self.connection:
+            return
+        await self.connection.remove_listener(self.channel, self._on_notification)
+        await self.connection.close()
+        self.connection = None
+
+
+def _to_pydantic_model(
+    result: DeclarativeMeta, pydantic_model: Type[BaseModel]
+) -> BaseModel:
+    """Validates an ORM instance into the pydantic model, stringifying any UUID columns"""
+    result_dict = result.__dict__
+    for key, value in result_dict.items():
+        if isinstance(value, (UUID, AsyncpgUUID)):
+            result_dict[key] = str(value)
+    return pydantic_model.model_validate(result_dict)
+
 
 def _build_filter(
     model: Type[DeclarativeMeta], filter_dict: dict[str, Any], param_prefix: str = "p"
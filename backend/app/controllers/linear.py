@@ -0,0 +1,45 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from app.exceptions.exception import UnauthorizedAccess
+from app.services.linear import LinearService
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class LinearController:
+
+    def __init__(self, service: LinearService):
+        self.router = APIRouter()
+        self.service = service
+        self.setup_routes()
+
+    def setup_routes(self):
+
+        router = self.router
+
+        @router.post("/webhook")
+        async def webhook(
+            request: Request,
+            linear_signature: Optional[str] = Header(default=None),
+        ) -> JSONResponse:
+            try:
+                # The signature covers the raw body, so it is read before any parsing
+                applied: bool = await self.service.handle_webhook(
+                    body=await request.body(), signature=linear_signature
+                )
+                return JSONResponse(status_code=200, content={"applied": applied})
+            except UnauthorizedAccess as e:
+                log.error("Unauthorized Linear webhook: %s", e.detail)
+                raise e
+            except Exception as e:
+                log.error("Unexpected error in linear controller.py: %s", str(e))
+                raise HTTPException(
+                    status_code=500, detail="An unexpected error occurred"
+                ) from e
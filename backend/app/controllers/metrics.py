@@ -0,0 +1,37 @@
+import logging
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.services.metrics import MetricsService
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class MetricsController:
+
+    def __init__(self, service: MetricsService):
+        self.router = APIRouter()
+        self.service = service
+        self.setup_routes()
+
+    def setup_routes(self):
+
+        router = self.router
+
+        @router.get("")
+        async def scrape() -> PlainTextResponse:
+            try:
+                return PlainTextResponse(
+                    status_code=200,
+                    content=self.service.export(),
+                    media_type="text/plain; version=0.0.4",
+                )
+            except Exception as e:
+                log.error("Unexpected error in metrics controller.py: %s", str(e))
+                raise HTTPException(
+                    status_code=500, detail="An unexpected error occurred"
+                ) from e
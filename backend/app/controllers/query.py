@@ -1,10 +1,16 @@
 import logging
+from typing import AsyncIterator
 
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import ValidationError
 
-from app.models.query.base import QueryRequest, QueryResponse
+from app.models.query.base import (
+    QueryRequest,
+    QueryResponse,
+    QueryStreamEvent,
+    QueryStreamEventType,
+)
 from app.models.query.confirm import ConfirmRequest
 from app.services.query import QueryService
 
@@ -57,6 +63,47 @@ class QueryController:
                     detail="An unexpected error occurred in query controller for general query endpoint",
                 ) from e
 
+        @router.post("/stream")
+        async def query_stream(request: Request) -> StreamingResponse:
+            try:
+                input = QueryRequest.model_validate(await request.json())
+            except ValidationError as e:
+                log.error(
+                    "Validation error in query controller for /stream endpoint: %s",
+                    str(e),
+                )
+                raise HTTPException(status_code=422, detail="Validation error") from e
+
+            async def event_stream() -> AsyncIterator[str]:
+                try:
+                    async for event in self.service.query_stream(
+                        message=input.message,
+                        chat_history=input.chat_history,
+                        api_key=input.api_key,
+                        integrations=input.integrations,
+                        instance=input.instance,
+                        enable_verification=input.enable_verification,
+                    ):
+                        yield _format_server_sent_event(event)
+                except Exception as e:
+                    # The status code has already been sent, so errors are reported in-band
+                    log.error(
+                        "Unexpected error in query controller for /stream endpoint: %s",
+                        str(e),
+                    )
+                    yield _format_server_sent_event(
+                        QueryStreamEvent(
+                            type=QueryStreamEventType.ERROR,
+                            error="An unexpected error occurred in query controller for /stream endpoint",
+                        )
+                    )
+
+            return StreamingResponse(
+                event_stream(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         @router.post("/confirm")
         async def confirm(input: ConfirmRequest) -> JSONResponse:
             try:
@@ -88,3 +135,7 @@ class QueryController:
                     status_code=500,
                     detail="An unexpected error occurred in query controller for /confirm endpoint",
                 ) from e
+
+
+def _format_server_sent_event(event: QueryStreamEvent) -> str:
+    return f"event: {event.type}\ndata: {event.model_dump_json(exclude_none=True)}\n\n"
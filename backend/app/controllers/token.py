@@ -36,6 +36,7 @@ class TokenController:
                 if result:
                     await self.service.update(
                         id=result.id,
+                        api_key=input.api_key,
                         access_token=input.access_token,
                         refresh_token=input.refresh_token,
                         client_id=input.client_id,
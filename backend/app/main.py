@@ -1,22 +1,43 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.connectors.http import close_http_clients
+from app.connectors.orm import dispose_engines
 from app.controllers.feedback import FeedbackController
+from app.controllers.linear import LinearController
+from app.controllers.metrics import MetricsController
 from app.controllers.query import QueryController
 from app.controllers.token import TokenController
 from app.controllers.user import UserController
 from app.middleware import LimitRequestSizeMiddleware
 from app.services.feedback import FeedbackService
+from app.services.linear import LinearService
+from app.services.metrics import MetricsService
 from app.services.query import QueryService
-from app.services.token import TokenService
+from app.services.token import (
+    TokenService,
+    start_token_cache_listener,
+    stop_token_cache_listener,
+)
 from app.services.user import UserService
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_token_cache_listener()
+    yield
+    await stop_token_cache_listener()
+    await dispose_engines()
+    await close_http_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -49,12 +70,26 @@ def get_feedback_controller_router():
     return FeedbackController(service=service).router
 
 
+def get_linear_controller_router():
+    service = LinearService()
+    return LinearController(service=service).router
+
+
+def get_metrics_controller_router():
+    service = MetricsService()
+    return MetricsController(service=service).router
+
+
 app.include_router(get_user_controller_router(), tags=["user"], prefix="/api/user")
 app.include_router(get_query_controller_router(), tags=["query"], prefix="/api/query")
 app.include_router(get_token_controller_router(), tags=["token"], prefix="/api/token")
 app.include_router(
     get_feedback_controller_router(), tags=["feedback"], prefix="/api/feedback"
 )
+app.include_router(
+    get_linear_controller_router(), tags=["linear"], prefix="/api/linear"
+)
+app.include_router(get_metrics_controller_router(), tags=["metrics"], prefix="/metrics")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,22 +1,15 @@
 import logging
-import os
-from typing import Optional
-
-from dotenv import load_dotenv
-from openai import OpenAI
+from typing import AsyncIterator, Optional
 
 from app.config import OPENAI_GPT4O_MINI
-from app.models.agents.base.template import Agent, AgentResponse
+from app.models.agents.base.template import Agent, AgentResponse, openai_client
 from app.models.integrations.base import Integration
 from app.models.query.base import Message, Role
+from app.utils.tracing import record_llm_usage
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-load_dotenv()
-
-openai_client = OpenAI()
-
 
 class SummaryAgent(Agent):
 
@@ -33,9 +26,10 @@ class SummaryAgent(Agent):
         # No need for tools in this agent (for now)
         message_lst: list = [{"role": "system", "content": self.system_prompt}]
         message_lst.extend(chat_history)
-        response = openai_client.chat.completions.create(
+        response = await openai_client.chat.completions.create(
             model=self.model, messages=message_lst
         )
+        record_llm_usage(response, model=self.model)
         return AgentResponse(
             agent=None,
             message=Message(
@@ -44,6 +38,22 @@ class SummaryAgent(Agent):
             function_to_verify=None,
         )
 
+    async def stream(self, chat_history: list[dict]) -> AsyncIterator[str]:
+        """Yields the summary chunk by chunk as the LLM generates it"""
+        message_lst: list = [{"role": "system", "content": self.system_prompt}]
+        message_lst.extend(chat_history)
+        response = await openai_client.chat.completions.create(
+            model=self.model,
+            messages=message_lst,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in response:
+            # The final chunk carries the token usage of the whole completion and no choices
+            record_llm_usage(chunk, model=self.model)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
 
 SUMMARY_AGENT = SummaryAgent(
     name="Summary Agent",
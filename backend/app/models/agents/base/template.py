@@ -8,12 +8,14 @@ from pydantic import BaseModel
 
 from app.models.integrations.base import Integration
 from app.models.query.base import Message
+from app.utils.tracing import record_llm_usage
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
+# Shared by every agent hop (request, triage and summary agents) so that no LLM call blocks the event loop
 openai_client = AsyncOpenAI()
 
 
@@ -49,6 +51,7 @@ class Agent(BaseModel, ABC):
             tools=self.tools,
             tool_choice="required",
         )
+        record_llm_usage(response, model=self.model)
 
         if not response.choices[0].message.tool_calls:
             log.info("No tool calls")
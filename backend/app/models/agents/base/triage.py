@@ -1,23 +1,16 @@
 import logging
-import os
 from typing import Optional
 
-from dotenv import load_dotenv
-from openai import OpenAI
-
 from app.models.agents.base.summary import transfer_to_summary_agent
-from app.models.agents.base.template import Agent, AgentResponse
+from app.models.agents.base.template import Agent, AgentResponse, openai_client
 from app.models.integrations.base import Integration
 from app.models.query.base import Message, Role
 from app.utils.tools import execute_tool_call, function_to_schema
+from app.utils.tracing import record_llm_usage
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-load_dotenv()
-
-openai_client = OpenAI()
-
 
 class TriageAgent(Agent):
 
@@ -41,12 +34,13 @@ class TriageAgent(Agent):
         tool_schemas = [function_to_schema(tool) for tool in self.tools]
         tools = {tool.__name__: tool for tool in self.tools}
 
-        response = openai_client.chat.completions.create(
+        response = await openai_client.chat.completions.create(
             model=self.model,
             messages=message_lst,
             tools=tool_schemas,
             tool_choice="required",
         )
+        record_llm_usage(response, model=self.model)
 
         tool_call = response.choices[0].message.tool_calls[0]
         message_content: str = f"Triage Agent invokes {tool_call.function.name}"
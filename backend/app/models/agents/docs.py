@@ -1,7 +1,6 @@
 import logging
 
 import openai
-from openai import OpenAI
 
 from app.config import OPENAI_GPT4O_MINI
 from app.connectors.client.docs import GoogleDocsClient
@@ -23,7 +22,6 @@ logging.basicConfig(level=logging.INFO)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 log = logging.getLogger(__name__)
-openai_client = OpenAI()
 
 
 class DocsCreateRequestAgent(Agent):
@@ -179,7 +179,8 @@ async def mark_as_read(
         message=Message(
             role=Role.ASSISTANT,
             content=f"Here are the emails marked as read",
-            data=[email.model_dump() for email in updated_emails],
+            # Only the headers are fetched, so an empty body would wrongly suggest that the emails are empty
+            data=[email.model_dump(exclude={"body"}) for email in updated_emails],
         ),
         function_to_verify=None,
     )
@@ -4,7 +4,6 @@ from typing import Optional
 
 import openai
 from httpx import request
-from openai import OpenAI
 from pydantic import BaseModel
 
 from app.config import OPENAI_GPT4O_MINI
@@ -23,6 +22,7 @@ from app.models.integrations.linear import (
     LinearGetIssuesRequest,
     LinearIssue,
     LinearIssueQuery,
+    LinearIssueUpdateResult,
     LinearUpdateIssuesAssigneeRequest,
     LinearUpdateIssuesCycleRequest,
     LinearUpdateIssuesDescriptionRequest,
@@ -42,7 +42,6 @@ logging.basicConfig(level=logging.INFO)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 log = logging.getLogger(__name__)
-openai_client = OpenAI()
 
 
 class LinearPostRequestAgent(Agent):
@@ -367,12 +366,12 @@ async def update_issues(
     linear_client = LinearClient(
         access_token=access_token,
     )
-    updated_issues: list[LinearIssue] = await linear_client.update_issues(
+    results: list[LinearIssueUpdateResult] = await linear_client.update_issues(
         request=request
     )
     await linear_client.close()
 
-    if not updated_issues:
+    if not results:
         return AgentResponse(
             agent=SUMMARY_AGENT,
             message=Message(
@@ -381,11 +380,31 @@ async def update_issues(
                 error=True,
             ),
         )
+    updated_issues: list[LinearIssue] = [
+        result.issue for result in results if result.success
+    ]
+    failures: str = ", ".join(
+        f"{result.issue_id} ({result.error})"
+        for result in results
+        if not result.success
+    )
+    if not updated_issues:
+        return AgentResponse(
+            agent=SUMMARY_AGENT,
+            message=Message(
+                role=Role.ASSISTANT,
+                content=f"None of the matching Linear issues could be updated: {failures}. Please advise the user on what might be the cause of the problem.",
+                error=True,
+            ),
+        )
+    content: str = "The following Linear issues have their state successfully updated"
+    if failures:
+        content += f". The following Linear issues could not be updated: {failures}"
     return AgentResponse(
         agent=MAIN_TRIAGE_AGENT,
         message=Message(
             role=Role.ASSISTANT,
-            content=f"The following Linear issues have their state successfully updated",
+            content=content,
             data=[issue.model_dump() for issue in updated_issues],
         ),
     )
@@ -70,6 +70,13 @@ class LinearIssue(BaseModel):
     url: Optional[str]
 
 
+class LinearIssueUpdateResult(BaseModel):
+    issue_id: str
+    success: bool
+    issue: Optional[LinearIssue] = None
+    error: Optional[str] = None
+
+
 class LinearCreateIssueRequest(BaseModel):
     title: Optional[str]
     description: Optional[str]
@@ -1,7 +1,7 @@
 from enum import StrEnum
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 from app.models.integrations.base import Integration
 
@@ -20,14 +20,39 @@ class Message(BaseModel):
 
 class QueryRequest(BaseModel):
     message: Message
-    chat_history: list[Message]
+    chat_history: Optional[list[Message]] = Field(
+        default=None,
+        description="Full conversation so far. Omit to let the server load the history of the instance",
+    )
     api_key: str
     enable_verification: bool
     integrations: list[Integration]
     instance: Optional[str] = None
 
+    @model_validator(mode="after")
+    def check_history_source(self):
+        if self.chat_history is None and not self.instance:
+            raise ValueError("instance must be provided when chat_history is omitted")
+
+        return self
+
 
 class QueryResponse(BaseModel):
     chat_history: list[Message]
     instance: Optional[str]
     function_to_verify: Optional[str]
+
+
+class QueryStreamEventType(StrEnum):
+    MESSAGE = "message"  # A message recorded in the chat history
+    TOKEN = "token"  # A chunk of the summary as it is generated
+    RESPONSE = "response"  # The final response, identical to the non-streaming endpoint
+    ERROR = "error"
+
+
+class QueryStreamEvent(BaseModel):
+    type: QueryStreamEventType
+    message: Optional[Message] = None
+    token: Optional[str] = None
+    response: Optional[QueryResponse] = None
+    error: Optional[str] = None
@@ -1,15 +1,25 @@
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 from app.models.integrations.base import Integration
 from app.models.query.base import Message
 
 
 class ConfirmRequest(BaseModel):
-    chat_history: list[Message]
+    chat_history: Optional[list[Message]] = Field(
+        default=None,
+        description="Full conversation so far, ending with the confirmation request. May be omitted only while the worker that returned the confirmation request still holds it for the instance",
+    )
     api_key: str
     enable_verification: bool
     integrations: list[Integration]
     function_to_verify: str
     instance: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_history_source(self):
+        if self.chat_history is None and not self.instance:
+            raise ValueError("instance must be provided when chat_history is omitted")
+
+        return self
@@ -0,0 +1,123 @@
+"""Offline benchmark of fuzzy matching against large candidate sets: the previous linear scan versus a FuzzyIndex built once per candidate set,
+looked up one target at a time and in a single vectorised batched pass.
+
+Candidates are synthetic issue titles. Targets are candidates with a few typos, plus some strings that match nothing, and both matchers must return the same results.
+
+Run with: python -m app.sandbox.benchmarks.fuzzy_match
+"""
+
+import random
+import time
+from typing import Optional
+
+from Levenshtein import distance, ratio
+
+from app.utils.levenshtein import THRESHOLD, FuzzyIndex, _process_string
+
+CANDIDATE_COUNTS = [10_000, 30_000, 100_000]
+TARGETS = 20
+SEED = 42
+
+WORDS = [
+    "fix",
+    "add",
+    "remove",
+    "update",
+    "login",
+    "page",
+    "crash",
+    "on",
+    "startup",
+    "billing",
+    "invoice",
+    "export",
+    "dashboard",
+    "slow",
+    "query",
+    "api",
+    "timeout",
+    "mobile",
+    "dark",
+    "mode",
+    "search",
+    "results",
+    "sync",
+    "calendar",
+    "email",
+    "notifications",
+    "settings",
+    "onboarding",
+    "flow",
+    "broken",
+]
+
+
+def _linear_scan(target: str, candidates: list[str]) -> Optional[str]:
+    """The previous get_most_similar_string"""
+    most_similar: str = min(
+        candidates,
+        key=lambda candidate: distance(
+            _process_string(candidate), _process_string(target)
+        ),
+    )
+    if ratio(most_similar, target) < THRESHOLD:
+        return None
+    return most_similar
+
+
+def _synthetic_titles(rng: random.Random, count: int) -> list[str]:
+    return [
+        " ".join(rng.choices(WORDS, k=rng.randint(3, 8))) + f" #{i}"
+        for i in range(count)
+    ]
+
+
+def _with_typos(rng: random.Random, title: str, typos: int) -> str:
+    characters: list[str] = list(title)
+    for _ in range(typos):
+        position: int = rng.randrange(len(characters))
+        characters[position] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(characters)
+
+
+def main():
+    rng = random.Random(SEED)
+    for count in CANDIDATE_COUNTS:
+        candidates: list[str] = _synthetic_titles(rng, count)
+        targets: list[str] = [
+            _with_typos(rng, rng.choice(candidates), typos=rng.randint(1, 3))
+            for _ in range(TARGETS - 2)
+        ] + ["zzzz", "completely unrelated text that matches nothing"]
+
+        start: float = time.perf_counter()
+        expected: list[Optional[str]] = [
+            _linear_scan(target, candidates) for target in targets
+        ]
+        scan_seconds: float = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = FuzzyIndex(candidates)
+        build_seconds: float = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matches: list[Optional[str]] = [index.best_match(target) for target in targets]
+        lookup_seconds: float = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched_matches: list[Optional[str]] = index.best_match_many(targets)
+        batched_seconds: float = time.perf_counter() - start
+
+        assert matches == expected, "FuzzyIndex results differ from the linear scan"
+        assert (
+            batched_matches == expected
+        ), "Batched results differ from the linear scan"
+        print(
+            f"{count} candidates: linear scan {scan_seconds / TARGETS * 1000:.1f}ms/target, "
+            f"index build {build_seconds * 1000:.1f}ms, lookup {lookup_seconds / TARGETS * 1000:.2f}ms/target "
+            f"({scan_seconds / lookup_seconds:.0f}x), batched {batched_seconds / TARGETS * 1000:.2f}ms/target "
+            f"({scan_seconds / batched_seconds:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
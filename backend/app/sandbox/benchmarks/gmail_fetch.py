@@ -0,0 +1,504 @@
+"""Offline benchmark of GmailClient.get_emails: one GET messages/{id} per message with full payloads (the previous behaviour) versus the batch endpoint
+with field masks and a bounded number of batches in flight, of paged queries listed in full before fetching versus streamed by iterate_emails, and of
+mark_as_read with full fetches and one modify call per message versus a metadata fetch and messages/batchModify, and of repeated reads served by the per-account message cache.
+
+Gmail is replaced by a local aiohttp stand-in that serves synthetic messages after a simulated round trip, honours format=metadata and field masks
+roughly like Gmail does, and rate limits one part of the first batch to exercise the retry path.
+
+Run with: python -m app.sandbox.benchmarks.gmail_fetch
+"""
+
+import asyncio
+import base64
+import json
+import time
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from aiohttp import web
+from multidict import MultiDict
+
+from app.connectors import http
+from app.connectors.client import gmail
+from app.connectors.client.gmail import GmailClient, _get_message_body
+from app.connectors.client.gmail_cache import gmail_message_cache
+from app.models.integrations.gmail import (
+    Gmail,
+    GmailGetEmailsRequest,
+    GmailMarkAsReadRequest,
+    GmailSendEmailRequest,
+)
+
+ROUND_TRIP_SECONDS = 0.02
+# Server-side time to list a page, and to load a message. The parts of a batch are loaded in parallel
+LIST_SECONDS = 0.05
+PER_MESSAGE_SECONDS = 0.002
+MESSAGES = 100
+SMALL_PAGE_SIZE = 20
+HOST = "127.0.0.1"
+PORT = 8767
+BATCH_BOUNDARY = "batch_stand_in"
+
+
+class GmailStandIn:
+    def __init__(self):
+        self.messages: dict[str, dict] = {
+            f"m{index}": _synthetic_message(index) for index in range(MESSAGES)
+        }
+        self.requests: int = 0
+        self.response_bytes: int = 0
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+        self.rate_limit_next_batch: bool = False
+        self.history_id: int = 1000
+        self.history: list[tuple[int, str]] = []
+
+    def reset(self):
+        self.requests = 0
+        self.response_bytes = 0
+        self.max_in_flight = 0
+
+    async def _round_trip(self, server_seconds: float):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(ROUND_TRIP_SECONDS + server_seconds)
+        self.in_flight -= 1
+
+    def _respond(self, body: bytes, content_type: str) -> web.Response:
+        self.response_bytes += len(body)
+        return web.Response(body=body, headers={"Content-Type": content_type})
+
+    async def list_messages(self, request: web.Request) -> web.Response:
+        await self._round_trip(LIST_SECONDS)
+        message_ids: list[str] = list(self.messages)
+        offset: int = int(request.query.get("pageToken", 0))
+        end: int = offset + int(request.query.get("maxResults", 100))
+        body: dict = {
+            "messages": [{"id": message_id} for message_id in message_ids[offset:end]],
+            "resultSizeEstimate": len(message_ids),
+        }
+        if end < len(message_ids):
+            body["nextPageToken"] = str(end)
+        return self._respond(json.dumps(body).encode(), "application/json")
+
+    async def get_message(self, request: web.Request) -> web.Response:
+        await self._round_trip(PER_MESSAGE_SECONDS)
+        status, message = self._message(request.match_info["message_id"], request.query)
+        return self._respond(json.dumps(message).encode(), "application/json")
+
+    async def batch(self, request: web.Request) -> web.Response:
+        reader = await request.multipart()
+        parts: list[str] = []
+        while (part := await reader.next()) is not None:
+            content_id: str = part.headers["Content-ID"].strip("<>")
+            request_line: str = (await part.text()).strip().splitlines()[0]
+            path: str = request_line.split()[1]
+            message_id: str = path.split("?")[0].rsplit("/", 1)[1]
+            status, message = self._message(message_id, _query(path))
+            if self.rate_limit_next_batch:
+                self.rate_limit_next_batch = False
+                status, message = 429, {
+                    "error": {"code": 429, "message": "Too many concurrent requests"}
+                }
+            parts.append(
+                f"--{BATCH_BOUNDARY}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(message)}\r\n"
+            )
+        await self._round_trip(PER_MESSAGE_SECONDS)
+        body: str = "".join(parts) + f"--{BATCH_BOUNDARY}--\r\n"
+        return self._respond(
+            body.encode(), f"multipart/mixed; boundary={BATCH_BOUNDARY}"
+        )
+
+    async def modify_message(self, request: web.Request) -> web.Response:
+        await self._round_trip(PER_MESSAGE_SECONDS)
+        message: dict = self.messages[request.match_info["message_id"]]
+        self._modify_labels(message, await request.json())
+        return self._respond(json.dumps(message).encode(), "application/json")
+
+    async def batch_modify(self, request: web.Request) -> web.Response:
+        await self._round_trip(PER_MESSAGE_SECONDS)
+        body: dict = await request.json()
+        for message_id in body["ids"]:
+            self._modify_labels(self.messages[message_id], body)
+        return web.Response(status=204)
+
+    async def profile(self, request: web.Request) -> web.Response:
+        await self._round_trip(0)
+        body: dict = {
+            "emailAddress": "me@example.com",
+            "historyId": str(self.history_id),
+        }
+        return self._respond(json.dumps(body).encode(), "application/json")
+
+    async def list_history(self, request: web.Request) -> web.Response:
+        await self._round_trip(0)
+        start_history_id: int = int(request.query["startHistoryId"])
+        body: dict = {"historyId": str(self.history_id)}
+        records: list[dict] = [
+            {"id": str(history_id), "messages": [{"id": message_id}]}
+            for history_id, message_id in self.history
+            if history_id > start_history_id
+        ]
+        if records:
+            body["history"] = records
+        return self._respond(json.dumps(body).encode(), "application/json")
+
+    async def send(self, request: web.Request) -> web.Response:
+        await self._round_trip(PER_MESSAGE_SECONDS)
+        message_id: str = f"m{len(self.messages)}"
+        self.messages[message_id] = _synthetic_message(len(self.messages))
+        self.messages[message_id]["labelIds"] = ["SENT"]
+        self._record_change(message_id)
+        body: dict = {"id": message_id, "threadId": message_id, "labelIds": ["SENT"]}
+        return self._respond(json.dumps(body).encode(), "application/json")
+
+    def change_elsewhere(self, message_id: str):
+        """A change made by another Gmail client, which only the history reveals"""
+        self.messages[message_id]["labelIds"].append("STARRED")
+        self._record_change(message_id)
+
+    def _record_change(self, message_id: str):
+        self.history_id += 1
+        self.history.append((self.history_id, message_id))
+
+    def _modify_labels(self, message: dict, body: dict):
+        self._record_change(message["id"])
+        message["labelIds"] = [
+            label
+            for label in message["labelIds"]
+            if label not in body.get("removeLabelIds", [])
+        ] + [
+            label
+            for label in body.get("addLabelIds", [])
+            if label not in message["labelIds"]
+        ]
+
+    def unread(self) -> int:
+        return sum(
+            "UNREAD" in message["labelIds"] for message in self.messages.values()
+        )
+
+    def _message(self, message_id: str, query: MultiDict) -> tuple[int, dict]:
+        message: Optional[dict] = self.messages.get(message_id)
+        if message is None:
+            return 404, {
+                "error": {"code": 404, "message": "Requested entity was not found."}
+            }
+        if query.get("format") == "metadata":
+            headers: list[str] = query.getall("metadataHeaders", [])
+            return 200, {
+                "id": message["id"],
+                "labelIds": message["labelIds"],
+                "payload": {
+                    "headers": [
+                        header
+                        for header in message["payload"]["headers"]
+                        if header["name"] in headers
+                    ]
+                },
+            }
+        if "fields" in query:
+            return 200, {
+                "id": message["id"],
+                "labelIds": message["labelIds"],
+                "payload": _masked_part(message["payload"]),
+            }
+        return 200, message
+
+
+def _query(path: str) -> MultiDict:
+    return MultiDict(parse_qsl(path.split("?", 1)[1] if "?" in path else ""))
+
+
+def _masked_part(part: dict) -> dict:
+    masked: dict = {
+        "mimeType": part["mimeType"],
+        "headers": part.get("headers", []),
+        "body": {"data": part["body"]["data"]} if "data" in part["body"] else {},
+    }
+    if "parts" in part:
+        masked["parts"] = [_masked_part(child) for child in part["parts"]]
+    return masked
+
+
+def _encode(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+def _synthetic_message(index: int) -> dict:
+    text: str = f"Hello from message {index}. " * 80
+    html: str = f"<html><body><p>{text}</p>{'<div>tracking</div>' * 200}</body></html>"
+    headers: list[dict] = [
+        {"name": "Received", "value": f"from relay{hop}.example.com by mx.google.com"}
+        for hop in range(12)
+    ] + [
+        {"name": "DKIM-Signature", "value": "v=1; a=rsa-sha256; " + "x" * 400},
+        {"name": "From", "value": f"Sender {index} <sender{index}@example.com>"},
+        {"name": "Subject", "value": f"Synthetic message {index}"},
+    ]
+    return {
+        "id": f"m{index}",
+        "threadId": f"t{index}",
+        "labelIds": ["INBOX", "UNREAD"],
+        "snippet": text[:200],
+        "historyId": str(1000 + index),
+        "internalDate": "1700000000000",
+        "sizeEstimate": len(text) + len(html),
+        "payload": {
+            "partId": "",
+            "mimeType": "multipart/alternative",
+            "filename": "",
+            "headers": headers,
+            "body": {"size": 0},
+            "parts": [
+                {
+                    "partId": "0",
+                    "mimeType": "text/plain",
+                    "filename": "",
+                    "headers": [{"name": "Content-Type", "value": "text/plain"}],
+                    "body": {"size": len(text), "data": _encode(text)},
+                },
+                {
+                    "partId": "1",
+                    "mimeType": "text/html",
+                    "filename": "",
+                    "headers": [{"name": "Content-Type", "value": "text/html"}],
+                    "body": {"size": len(html), "data": _encode(html)},
+                },
+            ],
+        },
+    }
+
+
+async def _previous_behaviour(
+    client: GmailClient, message_ids: list[str]
+) -> list[Gmail]:
+    """One full GET per message, all in parallel"""
+    responses: list[dict] = await asyncio.gather(
+        *[
+            client.fetch_message(client.session, f"{client.base_url}/{message_id}")
+            for message_id in message_ids
+        ]
+    )
+    return [
+        Gmail(
+            id=message["id"],
+            labelIds=message["labelIds"],
+            sender=next(
+                header["value"]
+                for header in message["payload"]["headers"]
+                if header["name"].lower() == "from"
+            ),
+            subject=next(
+                header["value"]
+                for header in message["payload"]["headers"]
+                if header["name"].lower() == "subject"
+            ),
+            body=_get_message_body(message["payload"]),
+        )
+        for message in responses
+    ]
+
+
+async def main():
+    stand_in = GmailStandIn()
+    app = web.Application()
+    app.router.add_get("/gmail/v1/users/me/messages", stand_in.list_messages)
+    app.router.add_get("/gmail/v1/users/me/messages/{message_id}", stand_in.get_message)
+    app.router.add_post("/batch/gmail/v1", stand_in.batch)
+    app.router.add_get("/gmail/v1/users/me/profile", stand_in.profile)
+    app.router.add_get("/gmail/v1/users/me/history", stand_in.list_history)
+    app.router.add_post("/gmail/v1/users/me/messages/send", stand_in.send)
+    app.router.add_post(
+        "/gmail/v1/users/me/messages/batchModify", stand_in.batch_modify
+    )
+    app.router.add_post(
+        "/gmail/v1/users/me/messages/{message_id}/modify", stand_in.modify_message
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+
+    gmail.GMAIL_RETRY_BACKOFF = ROUND_TRIP_SECONDS
+    client = GmailClient(
+        access_token="access-token",
+        refresh_token="refresh-token",
+        client_id="client-id",
+        client_secret="client-secret",
+    )
+    client.users_url = f"http://{HOST}:{PORT}{gmail.GMAIL_USERS_PATH}"
+    client.base_url = f"http://{HOST}:{PORT}{gmail.GMAIL_MESSAGES_PATH}"
+    client.batch_url = f"http://{HOST}:{PORT}{gmail.GMAIL_BATCH_PATH}"
+    message_ids: list[str] = list(stand_in.messages)
+
+    def reset(cold_cache: bool = True):
+        stand_in.reset()
+        if cold_cache:
+            gmail_message_cache.clear()
+
+    def report(label: str, elapsed: float):
+        print(
+            f"{label:<40} {elapsed * 1000:>7.1f}ms  requests={stand_in.requests:<4} "
+            f"max in flight={stand_in.max_in_flight:<4} response bytes={stand_in.response_bytes}"
+        )
+
+    print(
+        f"{MESSAGES} messages, {ROUND_TRIP_SECONDS * 1000:.0f}ms simulated round trip, {LIST_SECONDS * 1000:.0f}ms per list page, {PER_MESSAGE_SECONDS * 1000:.0f}ms per message load"
+    )
+    print(
+        "Unless stated otherwise, each run starts from a cold message cache, which costs one users/me/profile request"
+    )
+
+    reset()
+    start: float = time.perf_counter()
+    previous: list[Gmail] = await _previous_behaviour(client, message_ids)
+    report("GET per message, full payload", time.perf_counter() - start)
+
+    reset()
+    stand_in.rate_limit_next_batch = True
+    start = time.perf_counter()
+    batched: list[Gmail] = await client.get_emails(
+        GmailGetEmailsRequest(message_ids=message_ids, query=None)
+    )
+    report("batch, field mask (one 429 retried)", time.perf_counter() - start)
+    assert batched == previous, "batched emails differ from per-message emails"
+
+    reset()
+    start = time.perf_counter()
+    headers_only: list[Gmail] = await client.get_emails(
+        GmailGetEmailsRequest(message_ids=message_ids, query=None),
+        include_body=False,
+    )
+    report("batch, metadata only", time.perf_counter() - start)
+    assert [(email.id, email.sender, email.subject) for email in headers_only] == [
+        (email.id, email.sender, email.subject) for email in previous
+    ]
+
+    reset()
+    start = time.perf_counter()
+    queried: list[Gmail] = await client.get_emails(
+        GmailGetEmailsRequest(message_ids=None, query="is:unread")
+    )
+    report("query, one page, then batch", time.perf_counter() - start)
+    assert queried == previous
+
+    # Listing every page before fetching anything, which is what a non-streaming implementation does
+    reset()
+    start = time.perf_counter()
+    listed_ids: list[str] = [
+        message_id
+        async for page in client._iterate_message_ids(
+            query="is:unread", page_size=SMALL_PAGE_SIZE, limit=None
+        )
+        for message_id in page
+    ]
+    await client._fetch_messages(message_ids=listed_ids, include_body=True)
+    elapsed: float = time.perf_counter() - start
+    report(f"query, pages of {SMALL_PAGE_SIZE}, list then fetch", elapsed)
+    print(f"{'':<40} first email after {elapsed * 1000:.1f}ms")
+
+    reset()
+    start = time.perf_counter()
+    first_email: Optional[float] = None
+    streamed: list[Gmail] = []
+    async for email in client.iterate_emails(
+        query="is:unread", page_size=SMALL_PAGE_SIZE, limit=None
+    ):
+        first_email = first_email or time.perf_counter() - start
+        streamed.append(email)
+    report(f"query, pages of {SMALL_PAGE_SIZE}, streamed", time.perf_counter() - start)
+    print(f"{'':<40} first email after {first_email * 1000:.1f}ms")
+    assert streamed == previous
+
+    reset()
+    capped: list[Gmail] = [
+        email
+        async for email in client.iterate_emails(
+            query="is:unread", page_size=SMALL_PAGE_SIZE, limit=SMALL_PAGE_SIZE + 5
+        )
+    ]
+    assert capped == previous[: SMALL_PAGE_SIZE + 5]
+
+    # The previous mark_as_read fetched every email in full, then sent one modify call at a time
+    reset()
+    start = time.perf_counter()
+    for email in await _previous_behaviour(client, message_ids):
+        async with client.session.post(
+            f"{client.base_url}/{email.id}/modify",
+            headers=client.headers,
+            json={"removeLabelIds": ["UNREAD"]},
+        ) as response:
+            await response.json()
+    report("mark as read, modify per message", time.perf_counter() - start)
+    assert stand_in.unread() == 0
+
+    for message in stand_in.messages.values():
+        message["labelIds"].append("UNREAD")
+    reset()
+    start = time.perf_counter()
+    marked: list[Gmail] = await client.mark_as_read(
+        GmailMarkAsReadRequest(message_ids=message_ids, query=None)
+    )
+    report("mark by id, metadata + batchModify", time.perf_counter() - start)
+    assert [(email.id, email.sender, email.subject) for email in marked] == [
+        (email.id, email.sender, email.subject) for email in previous
+    ]
+    assert all("UNREAD" not in email.labelIds for email in marked)
+    assert stand_in.unread() == 0
+
+    for message in stand_in.messages.values():
+        message["labelIds"].append("UNREAD")
+    reset()
+    start = time.perf_counter()
+    await client.mark_as_read(
+        GmailMarkAsReadRequest(message_ids=None, query="is:unread")
+    )
+    report("mark by query, metadata + batchModify", time.perf_counter() - start)
+    assert stand_in.unread() == 0
+
+    reset()
+    request = GmailGetEmailsRequest(message_ids=message_ids, query=None)
+    expected: list[Gmail] = await client.get_emails(request)
+    reset(cold_cache=False)
+    start = time.perf_counter()
+    cached: list[Gmail] = await client.get_emails(request)
+    report("repeated get, warm cache", time.perf_counter() - start)
+    assert cached == expected
+
+    # Once the validation interval has passed, only the emails changed elsewhere are fetched again
+    for message_id in message_ids[:3]:
+        stand_in.change_elsewhere(message_id)
+    for cache in gmail_message_cache.values():
+        cache.validated_at = 0.0
+    reset(cold_cache=False)
+    start = time.perf_counter()
+    revalidated: list[Gmail] = await client.get_emails(request)
+    report("repeated get, 3 changed elsewhere", time.perf_counter() - start)
+    assert [email.labelIds for email in revalidated[:3]] == [
+        stand_in.messages[message_id]["labelIds"] for message_id in message_ids[:3]
+    ]
+    assert revalidated[3:] == expected[3:]
+
+    reset(cold_cache=False)
+    start = time.perf_counter()
+    sent: Gmail = await client.send_email(
+        GmailSendEmailRequest(recipient="you@example.com", subject="Hi", body="Hello")
+    )
+    echoed: list[Gmail] = await client.get_emails(
+        GmailGetEmailsRequest(message_ids=[sent.id], query=None)
+    )
+    report("send, then get the sent email", time.perf_counter() - start)
+    assert echoed == [sent] and sent.sender == "me@example.com"
+
+    await runner.cleanup()
+    await http.close_http_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
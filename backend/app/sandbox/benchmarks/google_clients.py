@@ -0,0 +1,91 @@
+"""Offline benchmark of Google client construction: building every service in __init__ from the discovery document (the previous behaviour) versus
+lazily built services over process-wide copies of the bundled discovery documents.
+
+No network access is needed: the previous behaviour is measured with static_discovery=True, which is the cheapest it could be, and the new clients
+never touch the network before their first request.
+
+Run with: python -m app.sandbox.benchmarks.google_clients
+"""
+
+import asyncio
+import statistics
+import time
+from typing import Callable
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from app.connectors import google, http
+from app.connectors.client.calendar import GoogleCalendarClient
+from app.connectors.client.docs import GoogleDocsClient
+from app.connectors.client.gmail import GmailClient
+from app.connectors.client.sheets import GoogleSheetsClient
+
+ITERATIONS = 20
+CLIENTS: list[tuple[type, str, str]] = [
+    (GmailClient, "gmail", "v1"),
+    (GoogleCalendarClient, "calendar", "v3"),
+    (GoogleDocsClient, "docs", "v1"),
+    (GoogleSheetsClient, "sheets", "v4"),
+]
+CLIENT_ARGS: dict[str, str] = {
+    "access_token": "access-token",
+    "refresh_token": "refresh-token",
+    "client_id": "client-id",
+    "client_secret": "client-secret",
+}
+
+
+def _credentials() -> Credentials:
+    return Credentials(
+        token=CLIENT_ARGS["access_token"],
+        refresh_token=CLIENT_ARGS["refresh_token"],
+        client_id=CLIENT_ARGS["client_id"],
+        client_secret=CLIENT_ARGS["client_secret"],
+        token_uri="https://oauth2.googleapis.com/token",
+    )
+
+
+def _time(fn: Callable[[], object]) -> list[float]:
+    latencies: list[float] = []
+    for _ in range(ITERATIONS):
+        start: float = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _summary(latencies: list[float]) -> str:
+    return f"mean={statistics.mean(latencies) * 1000:.2f}ms, max={max(latencies) * 1000:.2f}ms"
+
+
+async def main():
+    print(f"{ITERATIONS} iterations per measurement")
+    for client_cls, service_name, version in CLIENTS:
+        previous: list[float] = _time(
+            lambda: build(
+                service_name,
+                version,
+                credentials=_credentials(),
+                static_discovery=True,
+            )
+        )
+        construction: list[float] = _time(lambda: client_cls(**CLIENT_ARGS))
+
+        google.get_discovery_document.cache_clear()
+        start: float = time.perf_counter()
+        _ = client_cls(**CLIENT_ARGS).service
+        cold_service: float = time.perf_counter() - start
+        warm_service: list[float] = _time(lambda: client_cls(**CLIENT_ARGS).service)
+
+        print(f"\n{client_cls.__name__} ({service_name} {version})")
+        print(f"  build() in __init__:             {_summary(previous)}")
+        print(f"  construction, service unused:    {_summary(construction)}")
+        print(f"  first service use, cold process: {cold_service * 1000:.2f}ms")
+        print(f"  first service use, warm process: {_summary(warm_service)}")
+
+    await http.close_http_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
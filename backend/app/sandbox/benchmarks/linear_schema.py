@@ -0,0 +1,131 @@
+"""Offline benchmark of LinearClient schema loading: introspecting per client (the previous behaviour) versus the shared schema cache.
+
+The Linear API is replaced by a mocked httpx transport that serves the introspection result of a synthetic schema of a size comparable to Linear's,
+after a simulated network round trip.
+
+Run with: python -m app.sandbox.benchmarks.linear_schema
+"""
+
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from graphql import build_client_schema, build_schema, graphql_sync, parse, validate
+
+from app.connectors import http
+from app.connectors.client import linear_schema
+from app.connectors.client.linear import LINEAR_API_URL
+
+ROUND_TRIP_SECONDS = 0.15
+SYNTHETIC_TYPES = 150
+SYNTHETIC_FIELDS_PER_TYPE = 25
+CLIENTS = 20
+
+QUERY = parse(
+    """
+    query {
+        type0(id: "1") {
+            field0
+            link { field1 }
+        }
+    }
+    """
+)
+
+
+def _synthetic_schema_sdl() -> str:
+    types: list[str] = []
+    for i in range(SYNTHETIC_TYPES):
+        fields: str = "\n".join(
+            (
+                f'  field{j}(filter: String, first: Int = 50): String @deprecated(reason: "benchmark")'
+                if j % 7 == 6
+                else f"  field{j}(filter: String, first: Int = 50): String"
+            )
+            for j in range(SYNTHETIC_FIELDS_PER_TYPE)
+        )
+        types.append(
+            f'"""Synthetic type {i}"""\ntype Type{i} {{\n{fields}\n  link: Type{(i + 1) % SYNTHETIC_TYPES}\n}}'
+        )
+    query_fields: str = "\n".join(
+        f"  type{i}(id: String!): Type{i}" for i in range(SYNTHETIC_TYPES)
+    )
+    return "\n\n".join(types) + f"\n\ntype Query {{\n{query_fields}\n}}"
+
+
+def _install_mock_transport(introspection_response: dict) -> list[int]:
+    requests: list[int] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(1)
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+        return httpx.Response(200, json=introspection_response)
+
+    http._ensure_current_loop()
+    http._httpx_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return requests
+
+
+async def _previous_behaviour() -> float:
+    """Every client introspects and parses the schema before validating its first query"""
+    start: float = time.perf_counter()
+    introspection: dict = await linear_schema._fetch_introspection(
+        url=LINEAR_API_URL, headers={}
+    )
+    schema = build_client_schema(introspection)
+    validate(schema, QUERY)
+    return time.perf_counter() - start
+
+
+async def _shared_schema() -> float:
+    start: float = time.perf_counter()
+    schema = await linear_schema.get_linear_schema(url=LINEAR_API_URL, headers={})
+    validate(schema, QUERY)
+    return time.perf_counter() - start
+
+
+def _summary(latencies: list[float]) -> str:
+    return f"mean={statistics.mean(latencies) * 1000:.1f}ms, max={max(latencies) * 1000:.1f}ms"
+
+
+async def main():
+    sdl_schema = build_schema(_synthetic_schema_sdl())
+    introspection_response: dict = graphql_sync(
+        sdl_schema, linear_schema.get_introspection_query()
+    ).formatted
+    requests: list[int] = _install_mock_transport(introspection_response)
+
+    with tempfile.TemporaryDirectory() as directory:
+        linear_schema.LINEAR_SCHEMA_CACHE_PATH = os.path.join(
+            directory, "linear_schema.json"
+        )
+        linear_schema.clear_linear_schema_cache()
+
+        previous: list[float] = [await _previous_behaviour() for _ in range(CLIENTS)]
+        print(
+            f"introspection per client: {_summary(previous)}, introspection requests={len(requests)}"
+        )
+
+        requests.clear()
+        cold: float = await _shared_schema()
+        warm: list[float] = [await _shared_schema() for _ in range(CLIENTS - 1)]
+        print(
+            f"shared schema: cold={cold * 1000:.1f}ms, warm {_summary(warm)}, introspection requests={len(requests)}"
+        )
+
+        # A new worker process starts with an empty memory cache but finds the schema on disk
+        linear_schema.clear_linear_schema_cache()
+        requests.clear()
+        disk: float = await _shared_schema()
+        print(
+            f"new process with on-disk cache: {disk * 1000:.1f}ms, introspection requests={len(requests)}"
+        )
+
+    await http.close_http_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""Offline benchmark of event-loop lag and p99 latency for concurrent triage agent hops.
+
+The "blocking" run reproduces the previous behaviour (a synchronous OpenAI call inside an async def) by sleeping on the event loop thread,
+while the "non-blocking" run awaits the simulated LLM round trip the way the shared AsyncOpenAI client does.
+
+Run with: python -m app.sandbox.benchmarks.llm_concurrency
+"""
+
+import asyncio
+import json
+import statistics
+import time
+from types import SimpleNamespace
+
+from app.models.agents.base import triage
+from app.models.agents.main import MAIN_TRIAGE_AGENT
+from app.models.integrations.base import Integration
+
+LLM_LATENCY_SECONDS = 0.2
+CONCURRENT_REQUESTS = 20
+LAG_PROBE_INTERVAL_SECONDS = 0.01
+
+
+def _fake_completion() -> SimpleNamespace:
+    tool_call = SimpleNamespace(
+        function=SimpleNamespace(
+            name="transfer_to_summary_agent", arguments=json.dumps({})
+        )
+    )
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[tool_call]))]
+    )
+
+
+class _Completions:
+    def __init__(self, blocking: bool):
+        self.blocking = blocking
+
+    async def create(self, **kwargs) -> SimpleNamespace:
+        if self.blocking:
+            time.sleep(LLM_LATENCY_SECONDS)
+        else:
+            await asyncio.sleep(LLM_LATENCY_SECONDS)
+        return _fake_completion()
+
+
+def _fake_client(blocking: bool) -> SimpleNamespace:
+    return SimpleNamespace(chat=SimpleNamespace(completions=_Completions(blocking)))
+
+
+async def _monitor_loop_lag(lags: list[float], stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_PROBE_INTERVAL_SECONDS)
+        lags.append(time.perf_counter() - start - LAG_PROBE_INTERVAL_SECONDS)
+
+
+async def _timed_query(arrival: float) -> float:
+    """Returns the latency of a single query measured from the moment all the concurrent requests arrived"""
+    await MAIN_TRIAGE_AGENT.query(
+        chat_history=[{"role": "user", "content": "Summarise my unread emails"}],
+        access_token="",
+        integrations=[Integration.GMAIL],
+    )
+    return time.perf_counter() - arrival
+
+
+async def _run(blocking: bool) -> dict[str, float]:
+    triage.openai_client = _fake_client(blocking=blocking)
+    lags: list[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor_loop_lag(lags=lags, stop=stop))
+    await asyncio.sleep(0)
+
+    arrival: float = time.perf_counter()
+    latencies: list[float] = await asyncio.gather(
+        *[_timed_query(arrival=arrival) for _ in range(CONCURRENT_REQUESTS)]
+    )
+
+    stop.set()
+    await monitor
+    return {
+        "max_loop_lag_ms": max(lags) * 1000,
+        "p50_latency_ms": statistics.median(latencies) * 1000,
+        "p99_latency_ms": statistics.quantiles(latencies, n=100)[98] * 1000,
+    }
+
+
+async def main():
+    original_client = triage.openai_client
+    try:
+        for label, blocking in (("blocking", True), ("non-blocking", False)):
+            result = await _run(blocking=blocking)
+            print(
+                f"{label:>12}: "
+                + ", ".join(f"{key}={value:.1f}" for key, value in result.items())
+            )
+    finally:
+        triage.openai_client = original_client
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
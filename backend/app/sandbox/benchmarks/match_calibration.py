@@ -0,0 +1,240 @@
+"""Offline calibration of the per-entity fuzzy match thresholds in app/utils/levenshtein.py.
+
+Replays a labelled corpus of misspellings against the candidates of each entity type and reports, for every threshold:
+- precision: the share of repairs that picked the expected candidate
+- recall: the share of repairable values that were repaired to the expected candidate
+- wasted hops: the share of values whose repair differs from the expected one (a wrong repair, or no repair when one was expected),
+  each of which costs another round of main triage -> integration triage -> request agent
+- cost: the average repair latency plus the wasted hop rate times the cost of an agent round, which the recommended threshold minimises
+
+The corpus is a JSON file of the form
+    {
+        "candidates": {"user": ["Alice Smith", ...], "label": [...], ...},
+        "cases": [{"entity": "user", "target": "alice smth", "expected": "Alice Smith"}, {"entity": "user", "target": "Zed", "expected": null}, ...]
+    }
+where entities are MatchEntity values and expected is null when no candidate should match. Without a corpus, a synthetic one is generated.
+
+Run with: python -m app.sandbox.benchmarks.match_calibration [--corpus corpus.json] [--hop-cost-ms 4000]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Optional
+
+from Levenshtein import ratio
+
+from app.utils.levenshtein import MATCH_THRESHOLDS, FuzzyIndex, MatchEntity
+
+DEFAULT_THRESHOLDS = [round(0.1 * step, 1) for step in range(1, 10)]
+# Rough latency of main triage -> integration triage -> request agent
+DEFAULT_HOP_COST_MS = 4000.0
+SEED = 42
+SYNTHETIC_CASES_PER_ENTITY = 200
+SYNTHETIC_UNMATCHABLE_SHARE = 0.3
+
+TITLE_WORDS = [
+    "fix",
+    "add",
+    "remove",
+    "update",
+    "login",
+    "page",
+    "crash",
+    "startup",
+    "billing",
+    "invoice",
+    "export",
+    "dashboard",
+    "slow",
+    "query",
+    "timeout",
+    "mobile",
+    "search",
+    "sync",
+    "calendar",
+    "notifications",
+]
+UNMATCHABLE_TITLE_WORDS = ["quantum", "llama", "orchard", "violin", "glacier"]
+FIRST_NAMES = ["Alice", "Bob", "Carol", "David", "Erin", "Frank", "Grace", "Heidi"]
+LAST_NAMES = ["Smith", "Jones", "Nguyen", "Garcia", "Tan", "Muller", "Kowalski"]
+UNMATCHABLE_NAMES = ["Zoltan Vex", "Quincy Oduya", "Ysolde Park", "Xi"]
+PROJECT_NAMES = ["Mobile App", "Billing v2", "Onboarding", "Search Revamp", "Infra"]
+UNMATCHABLE_PROJECTS = ["Marketing Site", "Hiring", "Q3 Offsite"]
+LABELS = ["bug", "feature", "improvement", "design", "backend", "frontend", "docs"]
+UNMATCHABLE_LABELS = ["legal", "sales", "urgent"]
+CHANNEL_TEAMS = ["eng", "design", "product", "sales", "support"]
+CHANNEL_TOPICS = ["general", "backend", "frontend", "alerts", "standup", "random"]
+UNMATCHABLE_CHANNELS = ["book-club", "pets", "music"]
+
+
+def _with_typos(rng: random.Random, value: str) -> str:
+    characters: list[str] = list(value)
+    for _ in range(rng.randint(1, max(1, len(value) // 6))):
+        position: int = rng.randrange(len(characters))
+        match rng.choice(["substitute", "delete", "insert", "transpose"]):
+            case "substitute":
+                characters[position] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+            case "delete" if len(characters) > 2:
+                characters.pop(position)
+            case "insert":
+                characters.insert(position, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+            case "transpose" if position + 1 < len(characters):
+                characters[position], characters[position + 1] = (
+                    characters[position + 1],
+                    characters[position],
+                )
+    typo: str = "".join(characters)
+    return typo.lower() if rng.random() < 0.5 else typo
+
+
+def _synthetic_corpus(rng: random.Random) -> dict:
+    candidates: dict[str, list[str]] = {
+        MatchEntity.TITLE: [
+            " ".join(rng.choices(TITLE_WORDS, k=rng.randint(3, 7))) for _ in range(2000)
+        ],
+        MatchEntity.USER: [
+            f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES
+        ],
+        MatchEntity.PROJECT: PROJECT_NAMES,
+        MatchEntity.LABEL: LABELS,
+        MatchEntity.SLACK_CHANNEL: [
+            f"{team}-{topic}" for team in CHANNEL_TEAMS for topic in CHANNEL_TOPICS
+        ]
+        + ["general", "random"],
+    }
+    unmatchable: dict[str, list[str]] = {
+        MatchEntity.TITLE: [
+            " ".join(rng.choices(UNMATCHABLE_TITLE_WORDS, k=rng.randint(2, 4)))
+            for _ in range(50)
+        ],
+        MatchEntity.USER: UNMATCHABLE_NAMES,
+        MatchEntity.PROJECT: UNMATCHABLE_PROJECTS,
+        MatchEntity.LABEL: UNMATCHABLE_LABELS,
+        MatchEntity.SLACK_CHANNEL: UNMATCHABLE_CHANNELS,
+    }
+    cases: list[dict] = []
+    for entity, values in candidates.items():
+        for _ in range(SYNTHETIC_CASES_PER_ENTITY):
+            if rng.random() < SYNTHETIC_UNMATCHABLE_SHARE:
+                target: str = _with_typos(rng, rng.choice(unmatchable[entity]))
+                cases.append({"entity": entity, "target": target, "expected": None})
+                continue
+            expected: str = rng.choice(values)
+            cases.append(
+                {
+                    "entity": entity,
+                    "target": _with_typos(rng, expected),
+                    "expected": expected,
+                }
+            )
+    return {"candidates": candidates, "cases": cases}
+
+
+def _replay(matcher: FuzzyIndex, cases: list[dict]) -> tuple[list[tuple], float]:
+    """Returns the (best candidate, similarity, expected) of every case, and the mean repair latency in milliseconds"""
+    outcomes: list[tuple[str, float, Optional[str]]] = []
+    latencies: list[float] = []
+    for case in cases:
+        start: float = time.perf_counter()
+        best_match: str = matcher.best_match(case["target"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        outcomes.append(
+            (best_match, ratio(best_match, case["target"]), case["expected"])
+        )
+    return outcomes, statistics.mean(latencies)
+
+
+def _score(
+    outcomes: list[tuple], threshold: float, latency_ms: float, hop_cost_ms: float
+) -> dict[str, float]:
+    repaired: int = 0
+    correct: int = 0
+    wasted: int = 0
+    for best_match, similarity, expected in outcomes:
+        prediction: Optional[str] = best_match if similarity >= threshold else None
+        repaired += prediction is not None
+        correct += prediction is not None and prediction == expected
+        wasted += prediction != expected
+    repairable: int = sum(expected is not None for _, _, expected in outcomes)
+    wasted_rate: float = wasted / len(outcomes)
+    return {
+        "precision": correct / repaired if repaired else 1.0,
+        "recall": correct / repairable if repairable else 1.0,
+        "wasted": wasted_rate,
+        "cost": latency_ms + wasted_rate * hop_cost_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--corpus", help="Path to a labelled JSON corpus")
+    parser.add_argument(
+        "--hop-cost-ms",
+        type=float,
+        default=DEFAULT_HOP_COST_MS,
+        help="Latency of the extra agent round caused by a wrong or missed repair",
+    )
+    parser.add_argument(
+        "--thresholds",
+        default=",".join(str(threshold) for threshold in DEFAULT_THRESHOLDS),
+        help="Comma separated thresholds to evaluate",
+    )
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus) as f:
+            corpus: dict = json.load(f)
+    else:
+        corpus = _synthetic_corpus(random.Random(SEED))
+        print("No corpus given, using a synthetic corpus")
+    thresholds: list[float] = [
+        float(threshold) for threshold in args.thresholds.split(",")
+    ]
+
+    recommendations: dict[MatchEntity, float] = {}
+    for entity in MatchEntity:
+        cases: list[dict] = [
+            case for case in corpus["cases"] if case["entity"] == entity
+        ]
+        candidates: list[str] = corpus["candidates"].get(entity, [])
+        if not cases or not candidates:
+            continue
+        # The threshold is applied below, so the matcher always returns its best candidate
+        matcher = FuzzyIndex(candidates, threshold=0.0)
+        outcomes, latency_ms = _replay(matcher=matcher, cases=cases)
+
+        print(
+            f"\n{entity}: {len(cases)} cases, {len(candidates)} candidates, "
+            f"repair latency {latency_ms:.3f}ms, current threshold {MATCH_THRESHOLDS[entity]}"
+        )
+        print(
+            f"{'threshold':>10} {'precision':>10} {'recall':>8} {'wasted':>8} {'cost':>10}"
+        )
+        scores: dict[float, dict[str, float]] = {
+            threshold: _score(
+                outcomes=outcomes,
+                threshold=threshold,
+                latency_ms=latency_ms,
+                hop_cost_ms=args.hop_cost_ms,
+            )
+            for threshold in thresholds
+        }
+        for threshold, score in scores.items():
+            print(
+                f"{threshold:>10} {score['precision']:>10.3f} {score['recall']:>8.3f} "
+                f"{score['wasted']:>8.3f} {score['cost']:>8.1f}ms"
+            )
+        recommendations[entity] = min(
+            scores, key=lambda threshold: scores[threshold]["cost"]
+        )
+
+    print("\nRecommended thresholds:")
+    for entity, threshold in recommendations.items():
+        print(f"MATCH_THRESHOLD_{entity.upper()}={threshold}")
+
+
+if __name__ == "__main__":
+    main()
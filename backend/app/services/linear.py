@@ -0,0 +1,34 @@
+import json
+import logging
+from typing import Optional
+
+from app.connectors.client.linear_mirror import (
+    LINEAR_MIRROR_ENABLED,
+    apply_webhook,
+    is_webhook_fresh,
+    verify_webhook_signature,
+)
+from app.exceptions.exception import UnauthorizedAccess
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+
+class LinearService:
+    async def handle_webhook(self, body: bytes, signature: Optional[str]) -> bool:
+        """Verifies a Linear webhook delivery and applies it to the local issue mirror. Returns whether the event was applied"""
+        if not verify_webhook_signature(body=body, signature=signature):
+            raise UnauthorizedAccess("Invalid Linear webhook signature")
+        payload: dict = json.loads(body)
+        if not is_webhook_fresh(payload):
+            raise UnauthorizedAccess(
+                "Linear webhook timestamp is outside the tolerance"
+            )
+        if not LINEAR_MIRROR_ENABLED:
+            log.info("Ignoring Linear webhook because the mirror is disabled")
+            return False
+        applied: bool = await apply_webhook(payload)
+        log.info(
+            f"Linear webhook {payload['type']} {payload['action']} {'applied' if applied else 'ignored'}"
+        )
+        return applied
@@ -1,15 +1,40 @@
 import logging
+import os
 from typing import Optional
 
-from app.connectors.native.stores.message import Message, MessageORM
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.connectors.native.stores.message import (
+    Message,
+    MessageEvent,
+    MessageEventORM,
+    MessageORM,
+)
 from app.connectors.orm import Orm
-from app.exceptions.exception import DatabaseError
+from app.exceptions.exception import DatabaseError, PipelineError
 from app.models.integrations.base import Integration
+from app.models.query.base import Message as QueryMessage
+from app.utils.cache import TTLCache
 
 orm = Orm()
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
+CONVERSATION_CACHE_MAX_SIZE = int(os.environ.get("CONVERSATION_CACHE_MAX_SIZE", 256))
+CONVERSATION_CACHE_TTL = float(os.environ.get("CONVERSATION_CACHE_TTL", 1800))
+
+# Keyed by (api_key, instance). Holds the number of stored turns the entry was built on and the chat history exactly as last returned to the client,
+# including a pending confirmation request. Other workers append turns without invalidating it, so the count is checked against the database on every read
+conversation_cache = TTLCache(
+    max_size=CONVERSATION_CACHE_MAX_SIZE, ttl=CONVERSATION_CACHE_TTL
+)
+# Keyed by (api_key, instance). Holds the function awaiting confirmation and the chat history ending with its confirmation request. Confirmation requests are
+# never persisted, so a confirmation without a chat history can only be resumed from this process
+pending_confirmation_cache = TTLCache(
+    max_size=CONVERSATION_CACHE_MAX_SIZE, ttl=CONVERSATION_CACHE_TTL
+)
+
 
 class MessageService:
     async def post(
@@ -19,40 +44,190 @@ class MessageService:
         integrations: list[Integration],
         instance: Optional[str],
     ) -> str:
-        # This method logs the user chat history and returns the instance uuid
-        data = Message.local(
-            chat_history=[msg.model_dump() for msg in chat_history],
-            api_key=api_key,
-            integrations=integrations,
-            instance=instance,
-        ).model_dump()
-        if not instance:
-            log.info("No message entry for this instance. Creating new entry.")
-            entry: list[Message] = await orm.post(
-                orm_model=MessageORM,
-                data=[data],
-            )
-            log.info(f"Message entry posted: {entry}")
-            if len(entry) != 1:
-                raise DatabaseError(
-                    "Error creating message: More/Fewer than one message returned"
+        """Appends the turns of the chat history that are not stored yet and returns the instance uuid.
+
+        The delta is computed and inserted in one transaction that holds a lock on the message row, so that concurrent posts to the same instance
+        never store the same turns twice.
+        """
+        async with orm.session() as session:
+            if not instance:
+                log.info("No message entry for this instance. Creating new entry.")
+                entry = Message.local(
+                    chat_history=[],
+                    api_key=api_key,
+                    integrations=integrations,
+                    instance=instance,
                 )
-            instance = Message.model_validate(entry[0]).instance
-            return instance
+                session.add(
+                    MessageORM(
+                        **entry.model_dump(exclude={"id", "created_at", "updated_at"})
+                    )
+                )
+                # The events reference the message row through a foreign key, so it is inserted first
+                await session.flush()
+                instance = entry.instance
+                new_turns: list[Message] = chat_history
+            else:
+                log.info("Update message entry for this instance.")
+                header: Optional[MessageORM] = (
+                    await session.execute(
+                        select(MessageORM)
+                        .where(
+                            MessageORM.instance == instance,
+                            MessageORM.api_key == api_key,
+                        )
+                        .with_for_update()
+                    )
+                ).scalar_one_or_none()
+                if header is None:
+                    raise DatabaseError(
+                        f"No message entry found for instance {instance}"
+                    )
+                persisted: int = await _count_persisted_turns(
+                    session=session, instance=instance
+                )
+                if len(chat_history) < persisted:
+                    # The client edited or truncated its history, so there is no way to tell which of its turns are new
+                    log.warning(
+                        f"Chat history of instance {instance} has {len(chat_history)} turns but {persisted} are stored. No turns appended."
+                    )
+                new_turns: list[Message] = chat_history[persisted:]
+                header.integrations = integrations
+
+            session.add_all(
+                MessageEventORM(
+                    **MessageEvent.local(
+                        instance=instance, content=msg.model_dump()
+                    ).model_dump(exclude={"id", "created_at"})
+                )
+                for msg in new_turns
+            )
+            await session.commit()
+        log.info(f"Appended {len(new_turns)} turns to instance {instance}")
+        return instance
+
+    def cache_chat_history(
+        self, api_key: str, instance: str, chat_history: list[QueryMessage]
+    ):
+        """Caches the chat history returned to the client right after it was posted, so every one of its turns is stored"""
+        conversation_cache.set(
+            (api_key, instance), (len(chat_history), list(chat_history))
+        )
+        pending_confirmation_cache.invalidate((api_key, instance))
+
+    async def cache_pending_confirmation(
+        self,
+        api_key: str,
+        instance: str,
+        chat_history: list[QueryMessage],
+        function_to_verify: str,
+    ):
+        async with orm.session() as session:
+            persisted: int = await _count_owned_turns(
+                session=session, api_key=api_key, instance=instance
+            )
+        conversation_cache.set((api_key, instance), (persisted, list(chat_history)))
+        pending_confirmation_cache.set(
+            (api_key, instance), (function_to_verify, list(chat_history))
+        )
+
+    def invalidate_chat_history(self, api_key: str, instance: str):
+        conversation_cache.invalidate((api_key, instance))
+        pending_confirmation_cache.invalidate((api_key, instance))
+
+    def take_pending_confirmation(
+        self, api_key: str, instance: str, function_to_verify: str
+    ) -> list[QueryMessage]:
+        """Returns the chat history ending with the confirmation request of the instance and forgets it, so that it is confirmed at most once.
 
-        log.info("Update message entry for this instance.")
-        await orm.update(
-            orm_model=MessageORM,
+        The history stored in the database never holds the confirmation request, so it cannot be rebuilt from there after a cache miss. Entries are only
+        cached after the instance was checked to belong to the api key, and are keyed by it.
+        """
+        pending: Optional[tuple[str, list[QueryMessage]]] = (
+            pending_confirmation_cache.get((api_key, instance))
+        )
+        if pending is None or pending[0] != function_to_verify:
+            raise PipelineError(
+                f"No pending confirmation of {function_to_verify} found for instance {instance}. Please send the chat history along with the confirmation."
+            )
+        pending_confirmation_cache.invalidate((api_key, instance))
+        return list(pending[1])
+
+    async def load_chat_history(
+        self, api_key: str, instance: str
+    ) -> list[QueryMessage]:
+        """Returns the chat history the client last saw for the instance, so that clients do not need to upload it every turn.
+
+        The cached history is only returned while the number of stored turns it was built on is still current. Otherwise another worker appended turns
+        since, and the history is rebuilt from the database.
+        """
+        async with orm.session() as session:
+            persisted: int = await _count_owned_turns(
+                session=session, api_key=api_key, instance=instance
+            )
+        cached: Optional[tuple[int, list[QueryMessage]]] = conversation_cache.get(
+            (api_key, instance)
+        )
+        if cached is not None and cached[0] == persisted:
+            return list(cached[1])
+
+        log.info(
+            f"Conversation {instance} not cached or stale. Rebuilding from the database."
+        )
+        pending_confirmation_cache.invalidate((api_key, instance))
+        chat_history: list[QueryMessage] = [
+            QueryMessage.model_validate(turn)
+            for turn in await self.get_chat_history(instance=instance)
+            if not turn.get("error")
+        ]
+        conversation_cache.set(
+            (api_key, instance), (len(chat_history), list(chat_history))
+        )
+        return chat_history
+
+    async def get_chat_history(self, instance: str) -> list[dict]:
+        """Rebuilds the full conversation of the instance from its appended turns"""
+        chat_history: list[dict] = []
+        async for batch in orm.stream(
+            orm_model=MessageEventORM,
+            pydantic_model=MessageEvent,
             filters={
                 "boolean_clause": "AND",
                 "conditions": [
                     {"column": "instance", "operator": "=", "value": instance}
                 ],
             },
-            updated_data={
-                "chat_history": data["chat_history"],
-                "integrations": data["integrations"],
-            },
-            increment_field=None,
+        ):
+            chat_history.extend(event.content for event in batch)
+        return chat_history
+
+
+async def _count_persisted_turns(session: AsyncSession, instance: str) -> int:
+    """Returns the number of stored turns the client has already seen.
+
+    Error turns are stored but filtered out of every response, so the chat history the client sends back starts with exactly the stored non-error turns.
+    """
+    return (
+        await session.execute(
+            select(func.count())
+            .select_from(MessageEventORM)
+            .where(
+                MessageEventORM.instance == instance,
+                MessageEventORM.error.is_(False),
+            )
         )
-        return instance
+    ).scalar_one()
+
+
+async def _count_owned_turns(session: AsyncSession, api_key: str, instance: str) -> int:
+    """Returns the number of stored turns the client has already seen, after checking that the instance belongs to the api key"""
+    owned: Optional[int] = (
+        await session.execute(
+            select(MessageORM.id).where(
+                MessageORM.instance == instance, MessageORM.api_key == api_key
+            )
+        )
+    ).scalar_one_or_none()
+    if owned is None:
+        raise DatabaseError(f"No message entry found for instance {instance}")
+    return await _count_persisted_turns(session=session, instance=instance)
@@ -0,0 +1,36 @@
+from app.connectors.client.gmail_cache import get_gmail_cache_metrics
+from app.connectors.client.linear_metadata import get_workspace_metadata_metrics
+from app.connectors.client.linear_mirror import get_linear_mirror_metrics
+from app.connectors.orm import get_pool_metrics
+from app.services.token import get_token_cache_metrics
+from app.utils.tracing import get_tracing_metrics
+
+
+class MetricsService:
+
+    def export(self) -> str:
+        """Renders the collected metrics in the Prometheus text exposition format"""
+        lines: list[str] = []
+        metrics: dict[str, float] = {
+            **get_pool_metrics(),
+            **get_token_cache_metrics(),
+            **get_workspace_metadata_metrics(),
+            **get_linear_mirror_metrics(),
+            **get_gmail_cache_metrics(),
+            **get_tracing_metrics(),
+        }
+        typed_names: set[str] = set()
+        for name, value in metrics.items():
+            # Labelled series such as span_errors_total{span="agent.query"} share a single TYPE line
+            base_name: str = name.split("{", 1)[0]
+            if base_name not in typed_names:
+                typed_names.add(base_name)
+                lines.append(f"# TYPE {base_name} {_metric_type(base_name)}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_type(name: str) -> str:
+    if name.endswith("_total"):
+        return "counter"
+    return "gauge"
@@ -1,9 +1,10 @@
 import asyncio
 import logging
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from app.connectors.native.stores.token import Token
 from app.exceptions.exception import DatabaseError, PipelineError
+from app.models.agents.base.summary import SummaryAgent
 from app.models.agents.base.template import Agent, AgentResponse
 from app.models.agents.base.triage import TriageAgent
 from app.models.agents.calendar import (
@@ -43,10 +44,17 @@ from app.models.integrations.linear import (
 )
 from app.models.integrations.slack import SlackSendMessageRequest
 from app.models.integrations.x import XSendTweetRequest
-from app.models.query.base import Message, QueryResponse, Role
+from app.models.query.base import (
+    Message,
+    QueryResponse,
+    QueryStreamEvent,
+    QueryStreamEventType,
+    Role,
+)
 from app.services.message import MessageService
 from app.services.token import TokenService
 from app.services.user import UserService
+from app.utils.tracing import tracer
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -57,14 +65,17 @@ class QueryService:
     async def query(
         self,
         message: Message,
-        chat_history: list[Message],
+        chat_history: Optional[list[Message]],
         api_key: str,
         integrations: list[Integration],
         instance: Optional[str],
         enable_verification: bool,
     ) -> QueryResponse:
-        tokens: dict[str, Token] = await _construct_tokens_map(
-            integrations=integrations, api_key=api_key
+        tokens, chat_history = await asyncio.gather(
+            _construct_tokens_map(integrations=integrations, api_key=api_key),
+            _resolve_chat_history(
+                chat_history=chat_history, api_key=api_key, instance=instance
+            ),
         )
 
         chat_history.append(message)
@@ -81,9 +92,40 @@ class QueryService:
 
         return response
 
+    async def query_stream(
+        self,
+        message: Message,
+        chat_history: Optional[list[Message]],
+        api_key: str,
+        integrations: list[Integration],
+        instance: Optional[str],
+        enable_verification: bool,
+    ) -> AsyncIterator[QueryStreamEvent]:
+        """Same as query, but yields every message as soon as it is recorded and the summary as it is generated"""
+        tokens, chat_history = await asyncio.gather(
+            _construct_tokens_map(integrations=integrations, api_key=api_key),
+            _resolve_chat_history(
+                chat_history=chat_history, api_key=api_key, instance=instance
+            ),
+        )
+
+        chat_history.append(message)
+
+        async for event in _infer_stream(
+            tokens=tokens,
+            message=message,
+            chat_history=chat_history,
+            api_key=api_key,
+            integrations=integrations,
+            instance=instance,
+            enable_verification=enable_verification,
+            stream_summary=True,
+        ):
+            yield event
+
     async def confirm(
         self,
-        chat_history: list[Message],
+        chat_history: Optional[list[Message]],
         api_key: str,
         enable_verification: bool,
         integrations: list[Integration],
@@ -93,6 +135,16 @@ class QueryService:
         tokens: dict[str, Token] = await _construct_tokens_map(
             integrations=integrations, api_key=api_key
         )
+        if chat_history is None:
+            chat_history = MessageService().take_pending_confirmation(
+                api_key=api_key,
+                instance=instance,
+                function_to_verify=function_to_verify,
+            )
+        if not chat_history or not chat_history[-1].data:
+            raise PipelineError(
+                f"No pending confirmation found for instance {instance}. Please send the chat history along with the confirmation."
+            )
         client_argument = chat_history[-1].data[0]
 
         match function_to_verify:
@@ -280,104 +332,211 @@ async def _infer(
     enable_verification: bool,
 ) -> QueryResponse:
     """This function is responsible for managing the main inference loop"""
+    response: Optional[QueryResponse] = None
+    async for event in _infer_stream(
+        tokens=tokens,
+        message=message,
+        chat_history=chat_history,
+        api_key=api_key,
+        integrations=integrations,
+        instance=instance,
+        enable_verification=enable_verification,
+        stream_summary=False,
+    ):
+        # Drain the generator rather than returning early so that its spans are closed in this context
+        if event.type == QueryStreamEventType.RESPONSE:
+            response = event.response
+    if response is None:
+        raise PipelineError("Inference loop ended without a response")
+    return response
 
-    agent_chat_history: list[Message] = _construct_agent_chat_history(
-        chat_history=chat_history
-    )
-    response = AgentResponse(
-        agent=MAIN_TRIAGE_AGENT, message=message, verification_needed=False
-    )
-    while response.agent:
-        prev_agent: Agent = response.agent
-        integration_group: Integration = response.agent.integration_group
-        try:
-            if integration_group == Integration.NONE:  # Main triage agent/summary agent
-                response = await response.agent.query(
-                    chat_history=agent_chat_history,
-                    access_token="",
-                    refresh_token="",
-                    client_id="",
-                    client_secret="",
-                    enable_verification=False,
-                    integrations=integrations,
+
+async def _infer_stream(
+    tokens: dict[str, Token],
+    message: Message,
+    chat_history: list[Message],
+    api_key: str,
+    integrations: list[Integration],
+    instance: Optional[str],
+    enable_verification: bool,
+    stream_summary: bool,
+) -> AsyncIterator[QueryStreamEvent]:
+    """Runs the main inference loop, yielding each message as it is appended to the chat history and ending with the final response"""
+
+    with tracer.start_as_current_span(
+        "query.infer",
+        {
+            "query.instance": instance,
+            "query.integrations": [str(i) for i in integrations],
+        },
+    ) as root_span:
+        agent_chat_history: list[Message] = _construct_agent_chat_history(
+            chat_history=chat_history
+        )
+        response = AgentResponse(
+            agent=MAIN_TRIAGE_AGENT, message=message, verification_needed=False
+        )
+        hop: int = 0
+        while response.agent:
+            hop += 1
+            root_span.set_attribute("query.hops", hop)
+            prev_agent: Agent = response.agent
+            integration_group: Integration = response.agent.integration_group
+            try:
+                with tracer.start_as_current_span(
+                    "agent.query",
+                    {
+                        "agent.name": prev_agent.name,
+                        "agent.integration_group": str(integration_group),
+                        "agent.model": prev_agent.model,
+                        "agent.hop": hop,
+                    },
+                ):
+                    if stream_summary and isinstance(response.agent, SummaryAgent):
+                        summary_chunks: list[str] = []
+                        async for chunk in response.agent.stream(
+                            chat_history=agent_chat_history
+                        ):
+                            summary_chunks.append(chunk)
+                            yield QueryStreamEvent(
+                                type=QueryStreamEventType.TOKEN, token=chunk
+                            )
+                        response = AgentResponse(
+                            agent=None,
+                            message=Message(
+                                role=Role.ASSISTANT, content="".join(summary_chunks)
+                            ),
+                            function_to_verify=None,
+                        )
+                    elif integration_group == Integration.NONE:  # Main triage agent
+                        response = await response.agent.query(
+                            chat_history=agent_chat_history,
+                            access_token="",
+                            refresh_token="",
+                            client_id="",
+                            client_secret="",
+                            enable_verification=False,
+                            integrations=integrations,
+                        )
+                    else:  # Integration agent
+                        response = await response.agent.query(
+                            chat_history=agent_chat_history,
+                            access_token=tokens[integration_group].access_token,
+                            refresh_token=tokens[integration_group].refresh_token,
+                            client_id=tokens[integration_group].client_id,
+                            client_secret=tokens[integration_group].client_secret,
+                            enable_verification=enable_verification,
+                        )
+            # TODO: Better error handling
+            except Exception as e:
+                log.error("Unexpected error during inference: %s", str(e))
+                successful_messages: list[Message] = [
+                    msg for msg in chat_history if not msg.error
+                ]
+                successful_messages.append(
+                    Message(
+                        role=Role.ASSISTANT,
+                        content="Sorry, I encountered an error. Please help me to improve by reporting the error in the feedback channel (top right hand corner) and trying again later.",
+                        instance=instance,
+                        data=None,
+                    )
+                )
+                if instance:
+                    MessageService().invalidate_chat_history(
+                        api_key=api_key, instance=instance
+                    )
+                yield QueryStreamEvent(
+                    type=QueryStreamEventType.RESPONSE,
+                    response=QueryResponse(
+                        chat_history=successful_messages,
+                        instance=instance,
+                        function_to_verify=None,
+                    ),
                 )
-            else:  # Integration agent
-                response = await response.agent.query(
-                    chat_history=agent_chat_history,
-                    access_token=tokens[integration_group].access_token,
-                    refresh_token=tokens[integration_group].refresh_token,
-                    client_id=tokens[integration_group].client_id,
-                    client_secret=tokens[integration_group].client_secret,
-                    enable_verification=enable_verification,
+                return
+            if isinstance(prev_agent, TriageAgent):
+                continue
+            chat_history, agent_chat_history = _append_chat_history(
+                response=response,
+                chat_history=chat_history,
+                agent_chat_history=agent_chat_history,
+            )
+            if not chat_history[-1].error:
+                yield QueryStreamEvent(
+                    type=QueryStreamEventType.MESSAGE, message=chat_history[-1]
                 )
-        # TODO: Better error handling
-        except Exception as e:
-            log.error("Unexpected error during inference: %s", str(e))
+            if not response.function_to_verify:
+                continue
             successful_messages: list[Message] = [
                 msg for msg in chat_history if not msg.error
             ]
-            successful_messages.append(
-                Message(
-                    role=Role.ASSISTANT,
-                    content="Sorry, I encountered an error. Please help me to improve by reporting the error in the feedback channel (top right hand corner) and trying again later.",
+            if instance:
+                await MessageService().cache_pending_confirmation(
+                    api_key=api_key,
                     instance=instance,
-                    data=None,
+                    chat_history=successful_messages,
+                    function_to_verify=response.function_to_verify,
                 )
+            yield QueryStreamEvent(
+                type=QueryStreamEventType.RESPONSE,
+                response=QueryResponse(
+                    chat_history=successful_messages,
+                    instance=instance,
+                    function_to_verify=response.function_to_verify,
+                ),
             )
-            return QueryResponse(
-                chat_history=successful_messages,
+            return
+
+        results = await asyncio.gather(
+            UserService().increment_usage(api_key=api_key),
+            MessageService().post(
+                chat_history=chat_history,
+                api_key=api_key,
+                integrations=integrations,
                 instance=instance,
-                function_to_verify=None,
-            )
-        if isinstance(prev_agent, TriageAgent):
-            continue
-        chat_history, agent_chat_history = _append_chat_history(
-            response=response,
-            chat_history=chat_history,
-            agent_chat_history=agent_chat_history,
-        )
-        if not response.function_to_verify:
-            continue
-        return QueryResponse(
-            chat_history=[msg for msg in chat_history if not msg.error],
-            instance=instance,
-            function_to_verify=response.function_to_verify,
+            ),
         )
 
-    results = await asyncio.gather(
-        UserService().increment_usage(api_key=api_key),
-        MessageService().post(
-            chat_history=chat_history,
-            api_key=api_key,
-            integrations=integrations,
-            instance=instance,
-        ),
-    )
-
-    return QueryResponse(
-        chat_history=[msg for msg in chat_history if not msg.error],
-        instance=results[1],
-        function_to_verify=None,
-    )
+        successful_messages: list[Message] = [
+            msg for msg in chat_history if not msg.error
+        ]
+        MessageService().cache_chat_history(
+            api_key=api_key, instance=results[1], chat_history=successful_messages
+        )
+        yield QueryStreamEvent(
+            type=QueryStreamEventType.RESPONSE,
+            response=QueryResponse(
+                chat_history=successful_messages,
+                instance=results[1],
+                function_to_verify=None,
+            ),
+        )
 
 
 async def _construct_tokens_map(
     integrations: Integration, api_key: str
 ) -> dict[str, Token]:
     """Returns a map where the key is the integration name and value is a Token object containing all the necessary credentials of the user"""
-    tokens: dict[str, Token] = {}
-    for integration in integrations:
-        token: Optional[Token] = await TokenService().get(
-            api_key=api_key, table_name=integration
-        )
+    tokens: dict[str, Optional[Token]] = await TokenService().get_many(
+        api_key=api_key, table_names=integrations
+    )
+    for integration, token in tokens.items():
         if not token:
             raise DatabaseError(
                 f"User has not authenticated with the {integration} table. Please authenticate before trying again."
             )
-        tokens[integration] = token
     return tokens
 
 
+async def _resolve_chat_history(
+    chat_history: Optional[list[Message]], api_key: str, instance: Optional[str]
+) -> list[Message]:
+    """Returns the chat history sent by the client, or the server-side history of the instance when the client omitted it"""
+    if chat_history is not None:
+        return chat_history
+    return await MessageService().load_chat_history(api_key=api_key, instance=instance)
+
+
 def _construct_agent_chat_history(chat_history: list[Message]) -> list[Message]:
     """Modifies the chat history such that the information in the data attribute is appended behind the content attribute. The observation is that LLMs are performing significantly worse when the data is not appended immediately behind the message content. However, we want to preserve the data attribute for ease of content display in frontend and consumption via REST endpoints in the future"""
     agent_chat_history: list[Message] = []
@@ -1,19 +1,33 @@
+import json
 import logging
+import os
 from typing import Optional
 
+from sqlalchemy.exc import MultipleResultsFound
+
 from app.connectors.native.stores.token import (
     Token,
     TokenORMBase,
     create_integration_orm,
 )
-from app.connectors.orm import Orm
+from app.connectors.orm import Orm, PostgresListener
 from app.exceptions.exception import DatabaseError
+from app.utils.cache import TTLCache
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
 orm = Orm()
 
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get("TOKEN_CACHE_MAX_SIZE", 1024))
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", 300))
+# Set to share invalidations between workers through Postgres LISTEN/NOTIFY
+TOKEN_CACHE_INVALIDATION_CHANNEL = os.environ.get("TOKEN_CACHE_INVALIDATION_CHANNEL")
+
+# Keyed by (api_key, table_name). Tokens only change when the user re-authenticates via TokenService.post/update
+token_cache = TTLCache(max_size=TOKEN_CACHE_MAX_SIZE, ttl=TOKEN_CACHE_TTL)
+token_cache_listener: Optional[PostgresListener] = None
+
 
 class TokenService:
 
@@ -40,12 +54,68 @@ class TokenService:
                 ).model_dump()
             ],
         )
+        await _invalidate_token_cache(api_key=api_key, table_name=table_name)
 
     async def get(self, api_key: str, table_name: str) -> Optional[Token]:
+        cached_token: Optional[Token] = token_cache.get(
+            _token_cache_key(api_key=api_key, table_name=table_name)
+        )
+        if cached_token:
+            return cached_token
+
         TokenORM = create_integration_orm(table_name=table_name)
 
-        result: list[Token] = await orm.get(
-            orm_model=TokenORM,
+        try:
+            result: Optional[Token] = await orm.get_one(
+                orm_model=TokenORM,
+                pydantic_model=Token,
+                filters={
+                    "boolean_clause": "AND",
+                    "conditions": [
+                        {"column": "api_key", "operator": "=", "value": api_key}
+                    ],
+                },
+            )
+        except MultipleResultsFound:
+            raise DatabaseError(
+                f"User with api key {api_key} has more than one set of tokens in the {table_name} table"
+            )
+        if not result:
+            log.info(
+                f"User with api key {api_key} not found in the {table_name} token table"
+            )
+            return None
+
+        token_cache.set(
+            _token_cache_key(api_key=api_key, table_name=table_name), result
+        )
+        return result
+
+    async def get_many(
+        self, api_key: str, table_names: list[str]
+    ) -> dict[str, Optional[Token]]:
+        """Returns the tokens of the user for every table in a single database round trip. Tables without tokens map to None"""
+        tokens: dict[str, Optional[Token]] = {}
+        for table_name in table_names:
+            cached_token: Optional[Token] = token_cache.get(
+                _token_cache_key(api_key=api_key, table_name=table_name)
+            )
+            if cached_token:
+                tokens[table_name] = cached_token
+
+        uncached_table_names: list[str] = [
+            table_name for table_name in table_names if table_name not in tokens
+        ]
+        if not uncached_table_names:
+            return tokens
+
+        TokenORMs = [
+            create_integration_orm(table_name=table_name)
+            for table_name in uncached_table_names
+        ]
+
+        results: dict[str, list[Token]] = await orm.get_union(
+            orm_models=TokenORMs,
             pydantic_model=Token,
             filters={
                 "boolean_clause": "AND",
@@ -54,21 +124,25 @@ class TokenService:
                 ],
             },
         )
-        if len(result) > 1:
-            raise DatabaseError(
-                f"User with api key {api_key} has more than one set of tokens in the {table_name} table"
-            )
-        elif len(result) == 0:
-            log.info(
-                f"User with api key {api_key} not found in the {table_name} token table"
-            )
-            return None
 
-        return result[0]
+        for table_name in uncached_table_names:
+            result: list[Token] = results[table_name]
+            if len(result) > 1:
+                raise DatabaseError(
+                    f"User with api key {api_key} has more than one set of tokens in the {table_name} table"
+                )
+            tokens[table_name] = result[0] if result else None
+            if result:
+                token_cache.set(
+                    _token_cache_key(api_key=api_key, table_name=table_name),
+                    result[0],
+                )
+        return {table_name: tokens[table_name] for table_name in table_names}
 
     async def update(
         self,
         id: str,
+        api_key: str,
         access_token: str,
         refresh_token: str,
         client_id: str,
@@ -90,3 +164,52 @@ class TokenService:
             },
             increment_field=None,
         )
+        await _invalidate_token_cache(api_key=api_key, table_name=table_name)
+
+
+def _token_cache_key(api_key: str, table_name: str) -> tuple[str, str]:
+    return str(api_key), str(table_name)
+
+
+async def _invalidate_token_cache(api_key: str, table_name: str):
+    """Drops the cached token of this worker and, if enabled, tells the other workers to do the same"""
+    token_cache.invalidate(_token_cache_key(api_key=api_key, table_name=table_name))
+    if TOKEN_CACHE_INVALIDATION_CHANNEL:
+        await orm.notify(
+            channel=TOKEN_CACHE_INVALIDATION_CHANNEL,
+            payload=json.dumps({"api_key": str(api_key), "table_name": table_name}),
+        )
+
+
+def _on_token_invalidation(payload: str):
+    message: dict = json.loads(payload)
+    token_cache.invalidate(
+        _token_cache_key(api_key=message["api_key"], table_name=message["table_name"])
+    )
+
+
+async def start_token_cache_listener():
+    """Subscribes this worker to token invalidations published by the other workers. No-op unless TOKEN_CACHE_INVALIDATION_CHANNEL is set"""
+    global token_cache_listener
+    if not TOKEN_CACHE_INVALIDATION_CHANNEL or token_cache_listener:
+        return
+    token_cache_listener = PostgresListener(
+        channel=TOKEN_CACHE_INVALIDATION_CHANNEL, callback=_on_token_invalidation
+    )
+    await token_cache_listener.start()
+
+
+async def stop_token_cache_listener():
+    global token_cache_listener
+    if not token_cache_listener:
+        return
+    await token_cache_listener.stop()
+    token_cache_listener = None
+
+
+def get_token_cache_metrics() -> dict[str, float]:
+    return {
+        "token_cache_hits_total": token_cache.hits,
+        "token_cache_misses_total": token_cache.misses,
+        "token_cache_entries": len(token_cache),
+    }
@@ -1,6 +1,8 @@
 import logging
 from typing import Any, Optional
 
+from sqlalchemy.exc import MultipleResultsFound
+
 from app.connectors.native.stores.user import User, UserORM
 from app.connectors.orm import Orm
 from app.exceptions.exception import DatabaseError
@@ -14,7 +16,7 @@ orm = Orm()
 class UserService:
 
     async def login(self, id: str, name: str, email: str) -> User:
-        result: list[User] = await orm.get(
+        result: Optional[User] = await orm.get_one(
             orm_model=UserORM,
             pydantic_model=User,
             filters={
@@ -22,7 +24,7 @@ class UserService:
                 "conditions": [{"column": "id", "operator": "=", "value": id}],
             },
         )
-        if len(result) < 1:
+        if not result:
             log.info(
                 f"User with Clerk ID {id} not found...initiating storage in database"
             )
@@ -41,24 +43,25 @@ class UserService:
                 raise DatabaseError("Error creating user: More than one user returned")
             return User.model_validate(created_user[0])
 
-        return result[0]
+        return result
 
     async def get(self, api_key: str) -> User:
-        result: list[User] = await orm.get(
-            orm_model=UserORM,
-            pydantic_model=User,
-            filters={
-                "boolean_clause": "AND",
-                "conditions": [
-                    {"column": "api_key", "operator": "=", "value": api_key}
-                ],
-            },
-        )
-        if len(result) < 1:
-            raise ValueError("Invalid Controller API key")
-        elif len(result) > 1:
+        try:
+            result: Optional[User] = await orm.get_one(
+                orm_model=UserORM,
+                pydantic_model=User,
+                filters={
+                    "boolean_clause": "AND",
+                    "conditions": [
+                        {"column": "api_key", "operator": "=", "value": api_key}
+                    ],
+                },
+            )
+        except MultipleResultsFound:
             raise ValueError("Multiple users found with the same API key")
-        return result[0]
+        if not result:
+            raise ValueError("Invalid Controller API key")
+        return result
 
     async def increment_usage(self, api_key: str):
         await orm.update(
@@ -1,9 +1,33 @@
-import string
+import bisect
+import os
+from collections import defaultdict
+from enum import StrEnum
+from typing import Iterable, Iterator, Optional
 
+import numpy as np
 from Levenshtein import distance, ratio
+from rapidfuzz.distance import Levenshtein as RapidfuzzLevenshtein
+from rapidfuzz.process import cdist
 
-# TODO: We can make this threshold specific to each integration
 THRESHOLD = 0.4  # For more strict matching, set the threshold HIGHER
+# Upper bound on the size of a single targets x candidates distance matrix, to bound its memory
+MAX_MATRIX_CELLS = 16_000_000
+
+
+class MatchEntity(StrEnum):
+    TITLE = "title"
+    USER = "user"
+    PROJECT = "project"
+    LABEL = "label"
+    SLACK_CHANNEL = "slack_channel"
+
+
+# A wrong repair costs an extra agent round trip, so each entity type can be tuned separately with app/sandbox/benchmarks/match_calibration.py,
+# e.g. MATCH_THRESHOLD_SLACK_CHANNEL=0.6. Entities without an override use THRESHOLD
+MATCH_THRESHOLDS: dict[MatchEntity, float] = {
+    entity: float(os.environ.get(f"MATCH_THRESHOLD_{entity.upper()}", THRESHOLD))
+    for entity in MatchEntity
+}
 
 
 def _process_string(input: str) -> str:
@@ -18,15 +42,125 @@ def _process_string(input: str) -> str:
     return input
 
 
-def get_most_similar_string(target: str, candidates: list[str]) -> str:
-    """Returns the most similar string from the candidates list to the target"""
-    most_similar: str = min(
-        candidates,
-        key=lambda candidate: distance(
-            _process_string(candidate), _process_string(target)
-        ),
-    )
+class FuzzyIndex:
+    """Finds the most similar candidate to a target, built once per candidate set and reused across lookups.
+
+    Candidates are normalised once and bucketed by length. The edit distance between two strings is at least the difference of their lengths,
+    so a lookup visits the buckets closest in length first and stops once the length difference alone exceeds the best distance found so far.
+    Every comparison is also capped at that distance, which lets the distance computation exit early on poor candidates.
+    """
+
+    def __init__(self, candidates: Iterable[str], threshold: float = THRESHOLD):
+        self.threshold = threshold
+        self._candidates: list[str] = []
+        self._normalised: list[str] = []
+        self._buckets: dict[int, list[tuple[int, str]]] = defaultdict(list)
+        seen: set[str] = set()
+        for candidate in candidates:
+            normalised: str = _process_string(candidate)
+            # Candidates that normalise to the same string always tie, and the first one wins
+            if normalised in seen:
+                continue
+            seen.add(normalised)
+            self._buckets[len(normalised)].append((len(self._candidates), normalised))
+            self._candidates.append(candidate)
+            self._normalised.append(normalised)
+        self._lengths: list[int] = sorted(self._buckets)
+
+    def __len__(self) -> int:
+        return len(self._candidates)
+
+    def best_match(self, target: str) -> Optional[str]:
+        """Returns the most similar candidate to the target, or None if there are no candidates or the best one is below the similarity threshold.
+
+        Ties are broken in favour of the candidate that came first, so the result is the same as a linear scan with min().
+        """
+        if not self._candidates:
+            return None
+        normalised_target: str = _process_string(target)
+        best_distance: Optional[int] = None
+        best_position: int = len(self._candidates)
+        for length in self._lengths_by_proximity(len(normalised_target)):
+            if (
+                best_distance is not None
+                and abs(length - len(normalised_target)) > best_distance
+            ):
+                break
+            for position, normalised in self._buckets[length]:
+                candidate_distance: int = distance(
+                    normalised, normalised_target, score_cutoff=best_distance
+                )
+                if (
+                    best_distance is None
+                    or candidate_distance < best_distance
+                    or (
+                        candidate_distance == best_distance and position < best_position
+                    )
+                ):
+                    best_distance = candidate_distance
+                    best_position = position
+
+        return self._check_threshold(target=target, position=best_position)
+
+    def best_match_many(self, targets: Iterable[str]) -> list[Optional[str]]:
+        """Returns the best match of each target, in order. Repeated targets are only looked up once.
+
+        The distances of every target to every candidate are computed in a single C-level pass and the best candidate of each target is its row's argmin.
+        A single target is looked up on its own, which prunes candidates by length.
+        """
+        targets = list(targets)
+        unique_targets: list[str] = list(dict.fromkeys(targets))
+        if not self._candidates:
+            matches: dict[str, Optional[str]] = dict.fromkeys(unique_targets)
+        elif len(unique_targets) > 1:
+            matches = self._best_matches_vectorised(unique_targets)
+        else:
+            matches = {target: self.best_match(target) for target in unique_targets}
+        return [matches[target] for target in targets]
+
+    def _best_matches_vectorised(self, targets: list[str]) -> dict[str, Optional[str]]:
+        matches: dict[str, Optional[str]] = {}
+        rows_per_chunk: int = max(1, MAX_MATRIX_CELLS // len(self._normalised))
+        for start in range(0, len(targets), rows_per_chunk):
+            chunk: list[str] = targets[start : start + rows_per_chunk]
+            distances = cdist(
+                [_process_string(target) for target in chunk],
+                self._normalised,
+                scorer=RapidfuzzLevenshtein.distance,
+                dtype=np.int32,
+                workers=-1,
+            )
+            # argmin returns the first of equal distances, which is the candidate that came first
+            for target, position in zip(chunk, distances.argmin(axis=1)):
+                matches[target] = self._check_threshold(
+                    target=target, position=int(position)
+                )
+        return matches
+
+    def _check_threshold(self, target: str, position: int) -> Optional[str]:
+        most_similar: str = self._candidates[position]
+        if ratio(most_similar, target) < self.threshold:
+            return None
+        return most_similar
+
+    def _lengths_by_proximity(self, length: int) -> Iterator[int]:
+        """Yields the candidate lengths in order of increasing difference to the given length"""
+        right: int = bisect.bisect_left(self._lengths, length)
+        left: int = right - 1
+        while left >= 0 or right < len(self._lengths):
+            if right >= len(self._lengths) or (
+                left >= 0
+                and length - self._lengths[left] <= self._lengths[right] - length
+            ):
+                yield self._lengths[left]
+                left -= 1
+            else:
+                yield self._lengths[right]
+                right += 1
+
 
-    if ratio(most_similar, target) < THRESHOLD:
-        return None
-    return most_similar
+def get_most_similar_string(
+    target: str, candidates: list[str], threshold: float = THRESHOLD
+) -> str:
+    """Returns the most similar string from the candidates list to the target. Build a FuzzyIndex instead when matching repeatedly against the same candidates"""
+    return FuzzyIndex(candidates, threshold=threshold).best_match(target)
@@ -0,0 +1,230 @@
+"""Lightweight tracing for the agent loop and the connector clients.
+
+Spans follow the OpenTelemetry data model (trace id, parent span id, attributes, start/end time in nanoseconds and status)
+and every finished span is handed to the registered exporters. When the opentelemetry-api package is installed, each span is
+mirrored onto the globally configured OpenTelemetry tracer, so a deployment that configures an OTLP exporter receives the
+same spans without further changes. Everything works offline: the default exporter only aggregates metrics in memory.
+"""
+
+import contextvars
+import functools
+import inspect
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Protocol
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover - optional dependency
+    otel_trace = None
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional["Span"]):
+        self.name = name
+        self.trace_id: str = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id: str = uuid.uuid4().hex[:16]
+        self.parent: Optional[Span] = parent
+        self.parent_span_id: Optional[str] = parent.span_id if parent else None
+        self.attributes: dict[str, Any] = {}
+        self.start_time_ns: int = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self.status: str = "OK"
+        self.error: Optional[str] = None
+        self._otel_span = None
+
+    @property
+    def duration_seconds(self) -> float:
+        if self.end_time_ns is None:
+            return 0.0
+        return (self.end_time_ns - self.start_time_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        if value is None:
+            return
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+    def add_to_attribute(self, key: str, value: float):
+        self.set_attribute(key, self.attributes.get(key, 0) + value)
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span): ...
+
+
+class InMemorySpanExporter:
+    """Keeps every finished span in memory. Intended for tests and offline benchmarks"""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def get_finished_spans(self, name: Optional[str] = None) -> list[Span]:
+        return [span for span in self.spans if name is None or span.name == name]
+
+    def clear(self):
+        self.spans.clear()
+
+
+class SpanMetricsExporter:
+    """Aggregates finished spans into per span name and agent counters that are exposed on /metrics"""
+
+    def __init__(self):
+        self._metrics: dict[tuple[str, str], dict[str, float]] = {}
+
+    def export(self, span: Span):
+        key = (span.name, str(span.attributes.get("agent.name", "")))
+        metrics = self._metrics.setdefault(
+            key,
+            {
+                "count": 0,
+                "errors": 0,
+                "duration_seconds_sum": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            },
+        )
+        metrics["count"] += 1
+        metrics["errors"] += span.status == "ERROR"
+        metrics["duration_seconds_sum"] += span.duration_seconds
+        metrics["prompt_tokens"] += span.attributes.get("llm.usage.prompt_tokens", 0)
+        metrics["completion_tokens"] += span.attributes.get(
+            "llm.usage.completion_tokens", 0
+        )
+
+    def snapshot(self) -> dict[str, float]:
+        # Series are grouped by metric family, as the Prometheus text format requires
+        families: dict[str, str] = {
+            "span_calls_total": "count",
+            "span_duration_seconds_total": "duration_seconds_sum",
+            "span_errors_total": "errors",
+            "llm_prompt_tokens_total": "prompt_tokens",
+            "llm_completion_tokens_total": "completion_tokens",
+        }
+        snapshot: dict[str, float] = {}
+        for family, field in families.items():
+            for (span_name, agent_name), metrics in self._metrics.items():
+                labels: str = f'span="{span_name}"'
+                if agent_name:
+                    labels += f',agent="{agent_name}"'
+                snapshot[f"{family}{{{labels}}}"] = metrics[field]
+        return snapshot
+
+
+class Tracer:
+    def __init__(self, exporters: list[SpanExporter]):
+        self.exporters = exporters
+        self._current_span: contextvars.ContextVar[Optional[Span]] = (
+            contextvars.ContextVar("current_span", default=None)
+        )
+
+    def add_exporter(self, exporter: SpanExporter):
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter: SpanExporter):
+        self.exporters.remove(exporter)
+
+    def get_current_span(self) -> Optional[Span]:
+        return self._current_span.get()
+
+    @contextmanager
+    def start_as_current_span(
+        self, name: str, attributes: Optional[dict[str, Any]] = None
+    ) -> Iterator[Span]:
+        span = Span(name=name, parent=self._current_span.get())
+        context_token = self._current_span.set(span)
+        otel_context = (
+            otel_trace.get_tracer(__name__).start_as_current_span(
+                name, record_exception=False, set_status_on_exception=False
+            )
+            if otel_trace
+            else None
+        )
+        if otel_context is not None:
+            span._otel_span = otel_context.__enter__()
+        for key, value in (attributes or {}).items():
+            span.set_attribute(key, value)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "ERROR"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_time_ns = time.time_ns()
+            if otel_context is not None:
+                otel_context.__exit__(None, None, None)
+            try:
+                self._current_span.reset(context_token)
+            except ValueError:
+                # A streaming generator that is closed from another task cannot restore the context it started in
+                self._current_span.set(span.parent)
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception as e:
+                    log.error(f"Error exporting span {span.name}: {e}")
+
+
+span_metrics = SpanMetricsExporter()
+tracer = Tracer(exporters=[span_metrics])
+
+
+def record_llm_usage(response: Any, model: Optional[str] = None):
+    """Adds the token usage reported by an OpenAI completion (or the final chunk of a streamed one) to the current span"""
+    span: Optional[Span] = tracer.get_current_span()
+    usage = getattr(response, "usage", None)
+    if span is None or usage is None:
+        return
+    span.set_attribute("llm.model", model)
+    span.add_to_attribute(
+        "llm.usage.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0
+    )
+    span.add_to_attribute(
+        "llm.usage.completion_tokens", getattr(usage, "completion_tokens", 0) or 0
+    )
+
+
+def traced_client(cls: type) -> type:
+    """Class decorator that wraps every public method of a connector client in a span named <Client>.<method>"""
+    for attribute_name, method in list(vars(cls).items()):
+        if attribute_name.startswith("_") or attribute_name == "close":
+            continue
+        # Async generators are skipped, since a span around the call would end before the first item is produced
+        if not inspect.isfunction(method) or inspect.isasyncgenfunction(method):
+            continue
+        setattr(cls, attribute_name, _traced_method(cls.__name__, method))
+    return cls
+
+
+def _traced_method(client_name: str, method):
+    span_name: str = f"{client_name}.{method.__name__}"
+
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name, {"client.name": client_name}):
+                return await method(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with tracer.start_as_current_span(span_name, {"client.name": client_name}):
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def get_tracing_metrics() -> dict[str, float]:
+    return span_metrics.snapshot()
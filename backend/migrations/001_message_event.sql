@@ -0,0 +1,43 @@
+-- Moves chat history out of the message.chat_history jsonb[] column into the append-only message_event table.
+-- Safe to re-run: conversations that already have events are skipped by the backfill.
+--
+-- Run with: psql "<DATABASE URI>" -f ./migrations/001_message_event.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.message_event (
+    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    instance uuid NOT NULL REFERENCES public.message(instance) ON UPDATE CASCADE ON DELETE CASCADE,
+    content jsonb NOT NULL,
+    error boolean DEFAULT false NOT NULL,
+    created_at timestamp with time zone DEFAULT now() NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS message_event_instance_id_idx ON public.message_event USING btree (instance, id);
+
+ALTER TABLE public.message_event ENABLE ROW LEVEL SECURITY;
+
+GRANT ALL ON TABLE public.message_event TO anon;
+GRANT ALL ON TABLE public.message_event TO authenticated;
+GRANT ALL ON TABLE public.message_event TO service_role;
+GRANT ALL ON SEQUENCE public.message_event_id_seq TO anon;
+GRANT ALL ON SEQUENCE public.message_event_id_seq TO authenticated;
+GRANT ALL ON SEQUENCE public.message_event_id_seq TO service_role;
+
+-- Backfill one event per turn, preserving the order of the original array
+INSERT INTO public.message_event (instance, content, error, created_at)
+SELECT
+    message.instance,
+    turn.content,
+    COALESCE((turn.content ->> 'error')::boolean, false),
+    message.updated_at
+FROM public.message
+CROSS JOIN LATERAL unnest(message.chat_history) WITH ORDINALITY AS turn(content, position)
+WHERE NOT EXISTS (
+    SELECT 1 FROM public.message_event WHERE message_event.instance = message.instance
+)
+ORDER BY message.id, turn.position;
+
+-- message.chat_history is left untouched so that the migration can be rolled back. New conversations store an empty array there
+
+COMMIT;
@@ -0,0 +1,79 @@
+-- Creates the optional local mirror of Linear issues and of the workspace entities (states, labels, users, projects, cycles) they refer to.
+-- Only needed when LINEAR_MIRROR_ENABLED=true. Safe to re-run.
+--
+-- Run with: psql "<DATABASE URI>" -f ./migrations/002_linear_mirror.sql
+
+BEGIN;
+
+-- Issues are shared by every token of a Linear organization. Reads are restricted to the teams the token can access through linear_sync_state.team_ids
+CREATE TABLE IF NOT EXISTS public.linear_issue (
+    organization_id text NOT NULL,
+    id text NOT NULL,
+    team_id text,
+    number integer,
+    title text,
+    description text,
+    priority integer,
+    estimate integer,
+    state text,
+    assignee text,
+    creator text,
+    labels text[] DEFAULT '{}'::text[] NOT NULL,
+    cycle integer,
+    project text,
+    comments jsonb,
+    url text,
+    due_date text,
+    -- ISO 8601 strings exactly as returned by Linear, which sort chronologically
+    created_at text,
+    updated_at text,
+    PRIMARY KEY (organization_id, id)
+);
+
+CREATE INDEX IF NOT EXISTS linear_issue_number_idx ON public.linear_issue USING btree (organization_id, number);
+CREATE INDEX IF NOT EXISTS linear_issue_state_idx ON public.linear_issue USING btree (organization_id, state);
+CREATE INDEX IF NOT EXISTS linear_issue_assignee_idx ON public.linear_issue USING btree (organization_id, assignee);
+CREATE INDEX IF NOT EXISTS linear_issue_creator_idx ON public.linear_issue USING btree (organization_id, creator);
+CREATE INDEX IF NOT EXISTS linear_issue_project_idx ON public.linear_issue USING btree (organization_id, project);
+CREATE INDEX IF NOT EXISTS linear_issue_cycle_idx ON public.linear_issue USING btree (organization_id, cycle);
+CREATE INDEX IF NOT EXISTS linear_issue_estimate_idx ON public.linear_issue USING btree (organization_id, estimate);
+CREATE INDEX IF NOT EXISTS linear_issue_updated_at_idx ON public.linear_issue USING btree (organization_id, updated_at DESC);
+CREATE INDEX IF NOT EXISTS linear_issue_labels_idx ON public.linear_issue USING gin (labels);
+
+-- Speeds up the title substring filter. pg_trgm ships with Supabase but not with every Postgres build, so it is skipped when unavailable
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS linear_issue_title_trgm_idx ON public.linear_issue USING gin (title gin_trgm_ops);
+    END IF;
+END
+$$;
+
+-- kind is one of state, label, user, project, cycle. Cycles are named by their number
+CREATE TABLE IF NOT EXISTS public.linear_entity (
+    organization_id text NOT NULL,
+    kind text NOT NULL,
+    id text NOT NULL,
+    name text NOT NULL,
+    PRIMARY KEY (organization_id, kind, id)
+);
+
+-- One row per access token (keyed by its sha256), holding the incremental sync cursor
+CREATE TABLE IF NOT EXISTS public.linear_sync_state (
+    workspace text PRIMARY KEY,
+    organization_id text NOT NULL,
+    team_ids text[] DEFAULT '{}'::text[] NOT NULL,
+    synced_until text,
+    synced_at timestamp with time zone
+);
+
+ALTER TABLE public.linear_issue ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.linear_entity ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.linear_sync_state ENABLE ROW LEVEL SECURITY;
+
+GRANT ALL ON TABLE public.linear_issue TO service_role;
+GRANT ALL ON TABLE public.linear_entity TO service_role;
+GRANT ALL ON TABLE public.linear_sync_state TO service_role;
+
+COMMIT;
@@ -2359,6 +2359,35 @@ ALTER TABLE public.message ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY
 );
 
 
+--
+-- Name: message_event; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.message_event (
+    id bigint NOT NULL,
+    instance uuid NOT NULL,
+    content jsonb NOT NULL,
+    error boolean DEFAULT false NOT NULL,
+    created_at timestamp with time zone DEFAULT now() NOT NULL
+);
+
+
+ALTER TABLE public.message_event OWNER TO postgres;
+
+--
+-- Name: message_event_id_seq; Type: SEQUENCE; Schema: public; Owner: postgres
+--
+
+ALTER TABLE public.message_event ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (
+    SEQUENCE NAME public.message_event_id_seq
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1
+);
+
+
 --
 -- Name: outlook; Type: TABLE; Schema: public; Owner: postgres
 --
@@ -3012,6 +3041,14 @@ ALTER TABLE ONLY public.message
     ADD CONSTRAINT message_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: message_event message_event_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.message_event
+    ADD CONSTRAINT message_event_pkey PRIMARY KEY (id);
+
+
 --
 -- Name: outlook outlook_api_key_key; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -3476,6 +3513,13 @@ CREATE INDEX users_instance_id_idx ON auth.users USING btree (instance_id);
 CREATE INDEX users_is_anonymous_idx ON auth.users USING btree (is_anonymous);
 
 
+--
+-- Name: message_event_instance_id_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX message_event_instance_id_idx ON public.message_event USING btree (instance, id);
+
+
 --
 -- Name: ix_realtime_subscription_entity; Type: INDEX; Schema: realtime; Owner: supabase_admin
 --
@@ -3682,6 +3726,14 @@ ALTER TABLE ONLY public.message
     ADD CONSTRAINT message_api_key_fkey FOREIGN KEY (api_key) REFERENCES public."user"(api_key) ON UPDATE CASCADE ON DELETE CASCADE;
 
 
+--
+-- Name: message_event message_event_instance_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.message_event
+    ADD CONSTRAINT message_event_instance_fkey FOREIGN KEY (instance) REFERENCES public.message(instance) ON UPDATE CASCADE ON DELETE CASCADE;
+
+
 --
 -- Name: outlook outlook_api_key_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -3878,6 +3930,12 @@ ALTER TABLE public.linear ENABLE ROW LEVEL SECURITY;
 
 ALTER TABLE public.message ENABLE ROW LEVEL SECURITY;
 
+--
+-- Name: message_event; Type: ROW SECURITY; Schema: public; Owner: postgres
+--
+
+ALTER TABLE public.message_event ENABLE ROW LEVEL SECURITY;
+
 --
 -- Name: outlook; Type: ROW SECURITY; Schema: public; Owner: postgres
 --
@@ -5122,6 +5180,24 @@ GRANT ALL ON SEQUENCE public.message_id_seq TO authenticated;
 GRANT ALL ON SEQUENCE public.message_id_seq TO service_role;
 
 
+--
+-- Name: TABLE message_event; Type: ACL; Schema: public; Owner: postgres
+--
+
+GRANT ALL ON TABLE public.message_event TO anon;
+GRANT ALL ON TABLE public.message_event TO authenticated;
+GRANT ALL ON TABLE public.message_event TO service_role;
+
+
+--
+-- Name: SEQUENCE message_event_id_seq; Type: ACL; Schema: public; Owner: postgres
+--
+
+GRANT ALL ON SEQUENCE public.message_event_id_seq TO anon;
+GRANT ALL ON SEQUENCE public.message_event_id_seq TO authenticated;
+GRANT ALL ON SEQUENCE public.message_event_id_seq TO service_role;
+
+
 --
 -- Name: TABLE outlook; Type: ACL; Schema: public; Owner: postgres
 --